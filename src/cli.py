@@ -0,0 +1,76 @@
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import importlib
+import sys
+
+import src.utils
+
+# subcommand -> (module with main(argv), help); a module is imported only when its command runs
+COMMANDS = {
+    "ingest": ("src.data.load_dataset", "merge overlapping train snapshots, write the merged CSV and the change set"),
+    "features": ("src.features.main", "run feature extraction and save the features CSV"),
+    "train": ("src.models.train_model", "train the model selected in config and evaluate it"),
+    "predict": ("src.models.inference", "batch inference, writes the submission file"),
+    "serve": ("src.serving.server", "local forecast HTTP service"),
+    "bench": ("src.models.oblivious_trees", "CatBoost vs NumPy evaluator latency on a saved model"),
+    "backtest": ("src.models.backtest", "rolling-origin backtest"),
+    "select": ("src.models.feature_selection", "rank feature columns after training, write the pruned feature manifest"),
+    "scenarios": ("src.models.scenarios", "batched what-if forecasts over static features"),
+    "quantiles": ("src.models.probabilistic", "probabilistic forecasts: quantiles of Monte Carlo paths"),
+    "evaluate": ("src.models.evaluation", "compare saved evaluation tables"),
+    "registry": ("src.models.registry", "list registered model versions, move aliases"),
+}
+
+# heavy libraries worth reporting when a command ends up importing them
+BACKENDS = ["catboost", "lightgbm", "xgboost", "sklearn", "geopy", "scipy"]
+
+
+def _report(timings: dict):
+    loaded = [name for name in BACKENDS if name in sys.modules]
+    print("\n[timings]", file=sys.stderr)
+    for name, sec in timings.items():
+        print(f"  {name:<18}{sec * 1000:>10.1f} ms", file=sys.stderr)
+    print(f"  backends loaded: {', '.join(loaded) or 'none'}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Single entry point; run `python -m src.cli <command> -h` for the options of a command",
+    )
+    parser.add_argument("--config", type=str, default=None, help="Path to config YAML (default: config/config.yaml)")
+    parser.add_argument("--timings", action="store_true", help="Report import and startup time of the command")
+    parser.add_argument(
+        "command", choices=COMMANDS,
+        help="; ".join(f"{name}: {help_}" for name, (_, help_) in COMMANDS.items())
+    )
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the command")
+    args = parser.parse_args(argv)
+
+    if args.config is not None:
+        src.utils.CONFIG_PATH = args.config
+
+    timings = {"cli startup": time.perf_counter() - _START}
+    start = time.perf_counter()
+    src.utils.load_config()   # parsed once, the command reuses the cached config
+    timings["config parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    module = importlib.import_module(COMMANDS[args.command][0])
+    timings["command import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        module.main(args.args)
+    finally:
+        timings["command run"] = time.perf_counter() - start
+        timings["total"] = time.perf_counter() - _START
+        if args.timings:
+            _report(timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,81 @@
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Dict, List, Tuple
+
+from src.features.manifest import load_feature_manifest
+
+LABEL_COLS = ["LogNewConfirmedCases", "LogNewFatalities"]
+DROP_COLS = [
+    "Id", "ForecastId", "ConfirmedCases", "LogNewConfirmedCases",
+    "Fatalities", "LogNewFatalities", "Date"
+]
+
+
+def date_offsets(dates) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (order, days, offsets): rows order[offsets[i]:offsets[i + 1]] are the rows of days[i]
+    """
+    values = np.asarray(dates, dtype="datetime64[ns]")
+    order = np.argsort(values, kind="stable")
+    days = np.unique(values)
+    offsets = np.searchsorted(values[order], days, side="left")
+    return order, days, np.append(offsets, len(values))
+
+
+class DateIndexedFrame:
+    """
+    Frame sorted once by date and location, with row offsets of every date.
+    Date ranges are contiguous row ranges, so slices, feature matrices and labels are
+    positional views of one preprocessed frame (categories are cast once for all splits).
+    """
+    def __init__(
+        self, df: pd.DataFrame, cat_features: List[str], location_columns=["Country/Region", "Province/State"],
+        feature_names: List[str] | None = None
+    ):
+        if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            df = df.assign(Date=pd.to_datetime(df["Date"]))
+        self.df = df.sort_values(["Date"] + location_columns, kind="stable")
+        self.dates = self.df["Date"].to_numpy()
+        self.days = np.unique(self.dates)
+        self.offsets = np.append(np.searchsorted(self.dates, self.days, side="left"), len(self.dates))
+
+        self.features = self.df.drop(columns=DROP_COLS, errors="ignore")
+        if feature_names is not None:
+            # model input columns of a pruned feature manifest
+            self.features = self.features[feature_names]
+        self.categories: Dict[str, pd.CategoricalDtype] = {}
+        for c in cat_features:
+            if c in self.features.columns:
+                self.categories[c] = pd.CategoricalDtype(pd.unique(self.features[c]))
+                self.features[c] = self.features[c].astype(self.categories[c])
+        self.labels = self.df[[c for c in LABEL_COLS if c in self.df.columns]]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def rows(self, first_date=None, last_date=None) -> slice:
+        """
+        positional row range of [first_date, last_date] (open ends when None)
+        """
+        start = 0 if first_date is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(first_date)), side="left")
+        end = len(self.dates) if last_date is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(last_date)), side="right")
+        return slice(int(start), int(end))
+
+    def day_rows(self, day) -> slice:
+        i = np.searchsorted(self.days, np.datetime64(pd.Timestamp(day)))
+        if i == len(self.days) or self.days[i] != np.datetime64(pd.Timestamp(day)):
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def slice(self, first_date=None, last_date=None) -> pd.DataFrame:
+        return self.df.iloc[self.rows(first_date, last_date)]
+
+    def day(self, day) -> pd.DataFrame:
+        return self.df.iloc[self.day_rows(day)]
+
+    def xy(self, first_date=None, last_date=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        rows = self.rows(first_date, last_date)
+        return self.features.iloc[rows], self.labels.iloc[rows]
 
 
 class DataProcessor:
@@ -12,29 +88,44 @@ class DataProcessor:
         self.last_eval_date  = pd.Timestamp(train_cfg["last_eval_date"])
         self.cat_features    = train_cfg.get("cat_features", [])
 
+        # model input columns when a pruned feature manifest is applied
+        manifest = load_feature_manifest(cfg)
+        self.feature_names = manifest["features"] if manifest is not None else None
+
         # test in config
         test_cfg = cfg.get("test", {})
         self.last_test_date = pd.Timestamp(test_cfg["last_test_date"])
 
-    def split_by_date(self, main_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-        
-        df = main_df.copy()
-        df["Date"] = pd.to_datetime(df["Date"]) # ensure Date is datetime
+    def index_by_date(self, main_df: pd.DataFrame) -> DateIndexedFrame:
+        return DateIndexedFrame(main_df, self.cat_features, feature_names=self.feature_names)
 
-        train_df = df[df["Date"] <= self.last_train_date].copy()
-        eval_df  = df[(df["Date"] > self.last_train_date) & (df["Date"] <= self.last_eval_date)].copy()
-        test_df  = df[df["Date"] > self.last_eval_date].copy()
+    def split_by_date(self, main_df) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        main_df: raw frame or DateIndexedFrame; splits are row slices of the date-sorted frame
+        """
+        frame = main_df if isinstance(main_df, DateIndexedFrame) else self.index_by_date(main_df)
+        train_df = frame.slice(None, self.last_train_date)
+        eval_df  = frame.slice(self.last_train_date + pd.Timedelta(days=1), self.last_eval_date)
+        test_df  = frame.slice(self.last_eval_date + pd.Timedelta(days=1), None)
         return train_df, eval_df, test_df
 
-    def preprocess_df(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def split_xy(self, frame: DateIndexedFrame) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        preprocessed (features, labels) of the train / eval / test splits without re-casting categories
+        """
+        return {
+            "train": frame.xy(None, self.last_train_date),
+            "eval": frame.xy(self.last_train_date + pd.Timedelta(days=1), self.last_eval_date),
+            "test": frame.xy(self.last_eval_date + pd.Timedelta(days=1), None),
+        }
 
-        labels = df[["LogNewConfirmedCases", "LogNewFatalities"]].copy()
+    def preprocess_df(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
 
-        DROP_COLS = [
-            "Id", "ForecastId", "ConfirmedCases", "LogNewConfirmedCases",
-            "Fatalities", "LogNewFatalities", "Date"
-        ]
-        features = df.drop(columns=DROP_COLS, errors="ignore").copy()
+        labels = df[LABEL_COLS]
+        features = df.drop(columns=DROP_COLS, errors="ignore")
+        if self.feature_names is not None:
+            # data-dependent columns (e.g. Days_since_*) may be missing from a small batch
+            features = features.reindex(columns=self.feature_names)
 
         for c in self.cat_features:
             if c in features.columns:
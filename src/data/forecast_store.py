@@ -0,0 +1,144 @@
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.models.hierarchy import LocationHierarchy, ROLLUP_COLUMNS
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+VALUE_COLUMNS = ROLLUP_COLUMNS
+LEVELS = ["global", "country", "location"]
+
+
+class ForecastStore:
+    """
+    Columnar forecast store, one directory per run:
+
+      <root>/<run>/locations.csv   level, Country/Region, Province/State, start, end
+      <root>/<run>/<column>.npy    one array per column; rows of a location are the contiguous range [start, end), by date
+      <root>/<run>/overview.npz    country / global series downsampled to a few points for the global view
+      <root>/<run>/meta.json
+
+    Reading a location memory-maps the column files and slices its range, nothing else is parsed.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        self._columns: Dict[Tuple[str, str], np.ndarray] = {}
+        self._meta: Dict[str, dict] = {}
+
+    def runs(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / "meta.json").exists())
+
+    def write_run(self, run: str, df: pd.DataFrame, overview_points: int = 60) -> Path:
+        """
+        df: per-location rows (Country/Region, Province/State, Date, actual and Predicted* columns);
+        country and global rollups are added with LocationHierarchy
+        """
+        columns = [c for c in VALUE_COLUMNS if c in df.columns]
+        locations = df[LOCATION_COLUMNS + ["Date"] + columns].assign(level="location")
+        rollup = LocationHierarchy.from_frame(df).rollup(df, columns, levels=("global", "country"))
+        frame = pd.concat([rollup, locations], ignore_index=True)
+
+        # group rows by node (level order, then location) and date
+        frame["_level"] = frame["level"].map({level: i for i, level in enumerate(LEVELS)})
+        frame = frame.sort_values(["_level"] + LOCATION_COLUMNS + ["Date"], kind="stable").reset_index(drop=True)
+        node_codes, _ = pd.factorize(frame[["level"] + LOCATION_COLUMNS].astype(str).agg("\x1f".join, axis=1))
+        starts = np.flatnonzero(np.r_[True, node_codes[1:] != node_codes[:-1]])
+        ends = np.r_[starts[1:], len(frame)]
+
+        run_dir = self.root / run
+        tmp_dir = self.root / f".{run}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        index = frame.loc[starts, ["level"] + LOCATION_COLUMNS].reset_index(drop=True)
+        index["start"], index["end"] = starts, ends
+        index.to_csv(tmp_dir / "locations.csv", index=False)
+
+        np.save(tmp_dir / "Date.npy", frame["Date"].to_numpy(dtype="datetime64[D]"))
+        for c in columns:
+            np.save(tmp_dir / f"{c}.npy", frame[c].to_numpy(dtype=np.float64))
+
+        self._write_overview(tmp_dir, frame, index, columns, overview_points)
+        (tmp_dir / "meta.json").write_text(json.dumps({
+            "run": run,
+            "columns": columns,
+            "first_date": str(frame["Date"].min().date()),
+            "last_date": str(frame["Date"].max().date()),
+            "n_locations": int((index["level"] == "location").sum()),
+        }))
+
+        # replace the run in one step so readers never see a partial run
+        shutil.rmtree(run_dir, ignore_errors=True)
+        tmp_dir.rename(run_dir)
+        self._columns = {key: value for key, value in self._columns.items() if key[0] != run}
+        self._meta.pop(run, None)
+        return run_dir
+
+    @staticmethod
+    def _write_overview(run_dir: Path, frame: pd.DataFrame, index: pd.DataFrame, columns: List[str], n_points: int):
+        """
+        [n_nodes, n_points] matrices of the country / global nodes on a common, strided date grid
+        """
+        nodes = index[index["level"] != "location"].reset_index(drop=True)
+        dates = np.sort(frame["Date"].unique())
+        step = max(1, int(np.ceil(len(dates) / n_points)))
+        grid = dates[::-1][::step][::-1]   # always keeps the last date
+
+        rows = np.concatenate([np.arange(s, e) for s, e in zip(nodes["start"], nodes["end"])]) if len(nodes) else np.array([], dtype=int)
+        node_of_row = np.repeat(np.arange(len(nodes)), (nodes["end"] - nodes["start"]).to_numpy())
+        position = np.searchsorted(grid, frame["Date"].to_numpy()[rows])
+        on_grid = (position < len(grid)) & (grid[np.minimum(position, len(grid) - 1)] == frame["Date"].to_numpy()[rows])
+
+        matrices = {}
+        for c in columns:
+            matrix = np.full((len(nodes), len(grid)), np.nan)
+            matrix[node_of_row[on_grid], position[on_grid]] = frame[c].to_numpy()[rows][on_grid]
+            matrices[c] = matrix
+        np.savez(run_dir / "overview.npz", dates=grid.astype("datetime64[D]"), **matrices)
+
+    def meta(self, run: str) -> dict:
+        if run not in self._meta:
+            self._meta[run] = json.loads((self.root / run / "meta.json").read_text())
+        return self._meta[run]
+
+    def locations(self, run: str) -> pd.DataFrame:
+        return pd.read_csv(self.root / run / "locations.csv", keep_default_na=False)
+
+    def _column(self, run: str, column: str) -> np.ndarray:
+        key = (run, column)
+        if key not in self._columns:
+            self._columns[key] = np.load(self.root / run / f"{column}.npy", mmap_mode="r")
+        return self._columns[key]
+
+    def read(self, run: str, start: int, end: int) -> pd.DataFrame:
+        """
+        rows [start, end) of a run (one location partition, from locations())
+        """
+        out = {"Date": pd.to_datetime(np.asarray(self._column(run, "Date")[start:end]))}
+        for c in self.meta(run)["columns"]:
+            out[c] = np.asarray(self._column(run, c)[start:end])
+        return pd.DataFrame(out)
+
+    def read_location(self, run: str, level: str, country: str, province: str = "") -> pd.DataFrame:
+        index = self.locations(run)
+        match = index[(index["level"] == level) & (index["Country/Region"] == country) & (index["Province/State"] == province)]
+        if match.empty:
+            return pd.DataFrame(columns=["Date"] + self.meta(run)["columns"])
+        return self.read(run, int(match["start"].iloc[0]), int(match["end"].iloc[0]))
+
+    def overview(self, run: str) -> Tuple[pd.DataFrame, Dict[str, np.ndarray], np.ndarray]:
+        """
+        (country / global nodes, column -> [n_nodes, n_points], dates)
+        """
+        index = self.locations(run)
+        nodes = index[index["level"] != "location"].reset_index(drop=True)
+        with np.load(self.root / run / "overview.npz") as data:
+            matrices = {c: data[c] for c in data.files if c != "dates"}
+            dates = pd.to_datetime(data["dates"])
+        return nodes, matrices, dates
@@ -1,23 +1,41 @@
-import yaml
-import pandas as pd
+import argparse
+import heapq
+import logging
+from itertools import groupby
 from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils import load_config
 # from dataclasses import dataclass
 
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+VALUE_COLUMNS = ["ConfirmedCases", "Fatalities"]
+# merge key first: (country, province, date, lat, long, confirmed, fatalities)
+ROW_COLUMNS = LOCATION_COLUMNS + ["Date", "Lat", "Long"] + VALUE_COLUMNS
+TRAIN_COLUMNS = ["Province/State", "Country/Region", "Lat", "Long", "Date"] + VALUE_COLUMNS
+CHANGE_COLUMNS = LOCATION_COLUMNS + ["Date", "snapshot", "change"] + [c + "_old" for c in VALUE_COLUMNS] + VALUE_COLUMNS
+
 
 class CovidDataLoader:
-    
+
     def __init__(self, train_data_path: Path, test_data_path: Path):
         self.train_data_path = train_data_path
         self.test_data_path = test_data_path
-    
+
+    def load_train(self) -> pd.DataFrame:
+        return pd.read_csv(self.train_data_path, parse_dates=["Date"])
+
     def load(self) -> pd.DataFrame:
         # ensure data frame is successfully created
         try:
-            train = pd.read_csv(self.train_data_path, parse_dates=["Date"])
+            train = self.load_train()
             test  = pd.read_csv(self.test_data_path, parse_dates=["Date"])
         except (pd.errors.EmptyDataError, pd.errors.ParserError, FileNotFoundError) as e:
             raise ValueError(f"Failded loading CSV file: {e}") from e
-    
+
         last_train_date = train["Date"].max()
         test = test[test["Date"] > last_train_date]
 
@@ -28,15 +46,141 @@ class CovidDataLoader:
         return df.sort_values("Date").reset_index(drop=True)
 
 
-def main():
+def _same(old: float, new: float) -> bool:
+    # NaN (not reported) in both snapshots is no change
+    return old == new or (old != old and new != new)
+
+
+def iter_snapshot_rows(path: Path, snapshot: int, chunksize: int = 100000) -> Iterator[tuple]:
+    """
+    (country, province, date, lat, long, confirmed, fatalities, snapshot) of a snapshot file, read chunk by chunk.
+    Rows must be sorted by location and date (as in Kaggle's train.csv); raises ValueError at the first one that is not
+    """
+    previous = None
+    for chunk in pd.read_csv(path, parse_dates=["Date"], chunksize=chunksize):
+        chunk[LOCATION_COLUMNS] = chunk[LOCATION_COLUMNS].fillna("")
+        for row in chunk[ROW_COLUMNS].itertuples(index=False, name=None):
+            key = row[:3]
+            if previous is not None and key < previous:
+                raise ValueError(f"Snapshot {path} is not sorted by location and date at {key} (after {previous})")
+            previous = key
+            yield row + (snapshot,)
+
+
+class MultiSnapshotLoader(CovidDataLoader):
+    """
+    Train data from a sequence of overlapping snapshots (week_1, week_2, ... dumps with revised counts).
+    The snapshots are merged in one streaming k-way merge on (location, Date): only a chunk per file and
+    one row per file in the heap are in memory, never the snapshots themselves. A row reported by several
+    snapshots takes the values of the latest one (snapshot order = precedence).
+
+    change_set after a merge: rows whose values a later snapshot revised ("revised", with the values before)
+    and rows first reported by a later snapshot ("added"), so caches can invalidate only those locations.
+    """
+    def __init__(self, snapshot_paths: List[Path], test_data_path: Path | None = None, chunksize: int = 100000):
+        super().__init__(None, test_data_path)
+        if not snapshot_paths:
+            raise ValueError("MultiSnapshotLoader needs at least one snapshot")
+        self.snapshot_paths = [Path(p) for p in snapshot_paths]
+        # snapshot column of the change set (dumps are often all named train.csv)
+        self.names = [str(p) for p in self.snapshot_paths]
+        self.chunksize = chunksize
+        self.change_set = pd.DataFrame(columns=CHANGE_COLUMNS)
+
+    def iter_merged(self) -> Iterator[pd.DataFrame]:
+        """
+        merged rows in (location, Date) order, chunksize rows per frame; change_set is complete once exhausted
+        """
+        streams = [iter_snapshot_rows(path, i, self.chunksize) for i, path in enumerate(self.snapshot_paths)]
+        # equal keys come out in snapshot order, the last of a group wins
+        merged = heapq.merge(*streams, key=lambda row: (row[0], row[1], row[2], row[-1]))
+
+        rows: List[tuple] = []
+        changes: List[tuple] = []
+        for key, group in groupby(merged, key=lambda row: row[:3]):
+            group = list(group)
+            if group[0][-1] > 0:
+                changes.append(key + (self.names[group[0][-1]], "added", np.nan, np.nan) + group[0][5:7])
+            for old, new in zip(group, group[1:]):
+                if not all(_same(a, b) for a, b in zip(old[5:7], new[5:7])):
+                    changes.append(key + (self.names[new[-1]], "revised") + old[5:7] + new[5:7])
+            rows.append(group[-1][:-1])
+            if len(rows) >= self.chunksize:
+                yield pd.DataFrame(rows, columns=ROW_COLUMNS)[TRAIN_COLUMNS]
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=ROW_COLUMNS)[TRAIN_COLUMNS]
+
+        self.change_set = pd.DataFrame(changes, columns=CHANGE_COLUMNS)
+        logging.info(
+            f"Merged {len(self.snapshot_paths)} snapshots: "
+            f"{(self.change_set['change'] == 'revised').sum()} revised, {(self.change_set['change'] == 'added').sum()} added rows"
+        )
+
+    def load_train(self) -> pd.DataFrame:
+        train = pd.concat(list(self.iter_merged()), ignore_index=True)
+        train.insert(0, "Id", np.arange(1, len(train) + 1))
+        return train
+
+    def load(self) -> pd.DataFrame:
+        if self.test_data_path is None:
+            return self.load_train().sort_values("Date").reset_index(drop=True)
+        return super().load()
+
+    def changed_locations(self, since: str | None = None) -> pd.DataFrame:
+        """
+        locations with a revised or added row (in snapshot `since` or later, given as its path)
+        """
+        changes = self.change_set
+        if since is not None:
+            changes = changes[changes["snapshot"].isin(self.names[self.names.index(str(Path(since))):])]
+        return changes[LOCATION_COLUMNS].drop_duplicates().reset_index(drop=True)
+
+
+def data_loader(cfg: dict) -> CovidDataLoader:
+    """
+    loader of paths in config: the merged paths.snapshots when listed, else paths.train_csv
+    """
+    paths = cfg["paths"]
+    if paths.get("snapshots"):
+        return MultiSnapshotLoader(paths["snapshots"], paths["test_csv"])
+    return CovidDataLoader(paths["train_csv"], paths["test_csv"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshots", type=str, nargs="+", default=None, help="Snapshot CSVs, oldest first (default: paths.snapshots in config)")
+    parser.add_argument("--save-file", type=str, default=None, help="Path to save the merged train CSV")
+    parser.add_argument("--changes-file", type=str, default=None, help="Path to save the change set CSV (default: from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
     # load config
-    with open("config/config.yaml", "r") as f:
-        cfg = yaml.safe_load(f)
-    train_csv = cfg["paths"]["train_csv"]
-    test_csv  = cfg["paths"]["test_csv"]
-
-    # Load config file
-    data = CovidDataLoader(train_csv, test_csv).load()
-    
+    cfg = load_config()
+    snapshots = args.snapshots or cfg["paths"].get("snapshots")
+    if not snapshots:
+        raise ValueError("No snapshots given (--snapshots or paths.snapshots in config)")
+    loader = MultiSnapshotLoader(snapshots)
+
+    # merged rows are streamed to the output file chunk by chunk
+    n_rows = 0
+    save_path = Path(args.save_file) if args.save_file is not None else None
+    for i, chunk in enumerate(loader.iter_merged()):
+        chunk.insert(0, "Id", np.arange(n_rows + 1, n_rows + len(chunk) + 1))
+        n_rows += len(chunk)
+        if save_path is not None:
+            save_path.parent.mkdir(exist_ok=True, parents=True)
+            chunk.to_csv(save_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+
+    changes_path = Path(args.changes_file or cfg["paths"].get("changes_csv", "datasets/snapshot_changes.csv"))
+    changes_path.parent.mkdir(exist_ok=True, parents=True)
+    loader.change_set.to_csv(changes_path, index=False)
+    logging.info(
+        f"{n_rows} merged rows{f' saved to {save_path}' if save_path else ''}, change set saved to {changes_path} "
+        f"({len(loader.changed_locations())} locations changed)"
+    )
+
+
 if __name__ == "__main__":
     main()
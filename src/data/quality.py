@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+CUMULATIVE_FIELDS = ["ConfirmedCases", "Fatalities"]
+REPAIR_POLICIES = ["cummax", "isotonic", "drop"]
+
+
+class DataQualityCheck:
+    """
+    Validate every location in one vectorized pass (rows sorted by location and date):
+    duplicate days, gaps in dates, negative daily increments of the cumulative series, Fatalities > ConfirmedCases.
+
+    repair (negative increments):
+      cummax   - running maximum, later reports are taken as the truth until they are exceeded
+      isotonic - closest non-decreasing series (least squares), rounded to whole counts
+      drop     - drop the location
+    Duplicate days keep the last row, Fatalities is clipped to ConfirmedCases and date gaps are only reported.
+    """
+    def __init__(self, repair: str = "cummax", report_path: str | None = None):
+        if repair not in REPAIR_POLICIES:
+            raise ValueError(f"Unknown repair policy '{repair}', expected one of {REPAIR_POLICIES}")
+        self.repair = repair
+        self.report_path = report_path
+        self.report = pd.DataFrame()
+
+    @staticmethod
+    def _isotonic(values: np.ndarray, codes: np.ndarray, bad_locations: np.ndarray) -> np.ndarray:
+        from sklearn.isotonic import isotonic_regression
+
+        # only the (few) flagged locations are refitted
+        out = values.copy()
+        starts = np.searchsorted(codes, bad_locations, side="left")
+        ends = np.searchsorted(codes, bad_locations, side="right")
+        for start, end in zip(starts, ends):
+            segment = out[start:end]
+            valid = ~np.isnan(segment)
+            if valid.sum() > 1:
+                segment[valid] = np.rint(isotonic_regression(segment[valid]))
+        return out
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        missing = set(LOCATION_COLUMNS + CUMULATIVE_FIELDS + ["Date"]) - set(df.columns)
+        if missing:
+            raise KeyError(f"Missing columns for DataQualityCheck: {missing}")
+
+        # sort once by location and date, every check below is a shifted comparison
+        location_codes = df.groupby(LOCATION_COLUMNS, sort=False).ngroup().to_numpy()
+        dates = df["Date"].to_numpy(dtype="datetime64[ns]")
+        order = np.lexsort((dates, location_codes))
+        codes = location_codes[order]
+        n_locations = int(codes.max()) + 1 if len(codes) else 0
+
+        same_location = np.zeros(len(codes), dtype=bool)
+        same_location[1:] = codes[1:] == codes[:-1]
+        day_step = np.zeros(len(codes), dtype=np.int64)
+        day_step[1:] = (dates[order][1:] - dates[order][:-1]) // np.timedelta64(1, "D")
+
+        flags = {
+            "duplicate_days": same_location & (day_step == 0),
+            "date_gaps": same_location & (day_step > 1),
+        }
+        values = {field: df[field].to_numpy(dtype=float)[order] for field in CUMULATIVE_FIELDS}
+        for field in CUMULATIVE_FIELDS:
+            increment = np.full(len(codes), np.nan)
+            increment[1:] = values[field][1:] - values[field][:-1]
+            flags[f"negative_{field}"] = same_location & (increment < 0)
+        flags["fatalities_gt_confirmed"] = values["Fatalities"] > values["ConfirmedCases"]
+
+        counts = {name: np.bincount(codes[flag], minlength=n_locations) for name, flag in flags.items()}
+        non_monotone = (counts["negative_ConfirmedCases"] + counts["negative_Fatalities"]) > 0
+
+        # repair
+        drop_sorted = np.zeros(len(codes), dtype=bool)
+        drop_sorted[:-1] = flags["duplicate_days"][1:]   # keep the last row of a duplicated day
+        if self.repair == "drop":
+            drop_sorted |= non_monotone[codes]
+        elif non_monotone.any():
+            bad_locations = np.flatnonzero(non_monotone)
+            for field in CUMULATIVE_FIELDS:
+                if self.repair == "cummax":
+                    values[field] = pd.Series(values[field]).groupby(codes).cummax().to_numpy()
+                else:
+                    values[field] = self._isotonic(values[field], codes, bad_locations)
+        # min of two non-decreasing series stays non-decreasing
+        values["Fatalities"] = np.where(
+            values["Fatalities"] > values["ConfirmedCases"], values["ConfirmedCases"], values["Fatalities"]
+        )
+
+        out = df.copy()
+        for field in CUMULATIVE_FIELDS:
+            repaired = np.empty(len(order))
+            repaired[order] = values[field]
+            out[field] = repaired
+        drop = np.empty(len(order), dtype=bool)
+        drop[order] = drop_sorted
+        out = out[~drop]
+
+        self.report = self._build_report(df, order, codes, n_locations, counts, non_monotone)
+        if self.report_path is not None:
+            Path(self.report_path).parent.mkdir(exist_ok=True, parents=True)
+            self.report.to_csv(self.report_path, index=False)
+        print(f"data quality: {len(self.report)} locations with issues, {int(drop.sum())} rows dropped ({self.repair})")
+
+        return out
+
+    def _build_report(self, df, order, codes, n_locations, counts, non_monotone) -> pd.DataFrame:
+        """
+        one row per location with at least one issue
+        """
+        first_rows = order[np.searchsorted(codes, np.arange(n_locations))]
+        report = df[LOCATION_COLUMNS].iloc[first_rows].reset_index(drop=True)
+        report["n_rows"] = np.bincount(codes, minlength=n_locations)
+        for name, count in counts.items():
+            report[name] = count
+        report["action"] = np.where(non_monotone, self.repair, "")
+
+        has_issue = np.any([count > 0 for count in counts.values()], axis=0)
+        return report[has_issue].reset_index(drop=True)
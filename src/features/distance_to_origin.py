@@ -4,8 +4,10 @@ import geopy.distance
 
 class DistanceToOriginFeatures:
 
-    def __init__(self, origin_province: str = 'Hubei'):
+    def __init__(self, origin_province: str = 'Hubei', origin_coords: tuple | None = None):
         self.origin_province = origin_province
+        # known coords let partial frames (e.g. inference batches without the origin) be transformed
+        self.origin_coords = tuple(origin_coords) if origin_coords is not None else None
 
     def _get_origin_coords(self, df: pd.DataFrame) -> pd.DataFrame:
         for index, row in df.iterrows():
@@ -24,7 +26,7 @@ class DistanceToOriginFeatures:
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         
         out = df.copy()
-        origin_coords = self._get_origin_coords(out)
+        origin_coords = self.origin_coords or self._get_origin_coords(out)
         out = self._add_distance(out, origin_coords)
 
         return out
\ No newline at end of file
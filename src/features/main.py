@@ -1,35 +1,44 @@
-import yaml
 import pandas as pd
 from pathlib import Path
 from typing import Dict, Any, List, Type
 import argparse
 
-from src.data.load_dataset import CovidDataLoader
-from src.features.time_delay import TimeDelayFeatures
-from src.features.day_feature import DayFeatures
-from src.features.distance_to_origin import DistanceToOriginFeatures
-from src.features.country_area import CountryAreaFeatures
-from src.features.country_population import CountryPopulationFeatures
-from src.features.smoking import CountrySmokingRateFeatures
-from src.features.hospital_beds import CountryHospitalBedsFeatures
-from src.features.health_expenditure import CountryHealthExpenditureFeatures
-
-
-FEATURE_REGISTRY: Dict[str, Type] = {
-    "TimeDelayFeatures": TimeDelayFeatures,
-    "DayFeatures": DayFeatures,
-    "DistanceToOriginFeatures": DistanceToOriginFeatures,
-    "CountryAreaFeatures": CountryAreaFeatures,
-    "CountryPopulationFeatures": CountryPopulationFeatures,
-    "CountrySmokingRateFeatures": CountrySmokingRateFeatures,
-    "CountryHospitalBedsFeatures": CountryHospitalBedsFeatures,
-    "CountryHealthExpenditureFeatures": CountryHealthExpenditureFeatures,
-}
+from src.data.data_processing import DROP_COLS
+from src.data.load_dataset import data_loader
+from src.data.quality import DataQualityCheck
+from src.features.manifest import load_feature_manifest
+from src.utils import load_config, LazyRegistry
+
+
+# transformers are imported only when selected in features_to_apply
+FEATURE_REGISTRY: Dict[str, Type] = LazyRegistry({
+    "TimeDelayFeatures": "src.features.time_delay:TimeDelayFeatures",
+    "DayFeatures": "src.features.day_feature:DayFeatures",
+    "DistanceToOriginFeatures": "src.features.distance_to_origin:DistanceToOriginFeatures",
+    "SpatialNeighborFeatures": "src.features.spatial_neighbors:SpatialNeighborFeatures",
+    "CountryAreaFeatures": "src.features.country_area:CountryAreaFeatures",
+    "CountryPopulationFeatures": "src.features.country_population:CountryPopulationFeatures",
+    "CountrySmokingRateFeatures": "src.features.smoking:CountrySmokingRateFeatures",
+    "CountryHospitalBedsFeatures": "src.features.hospital_beds:CountryHospitalBedsFeatures",
+    "CountryHealthExpenditureFeatures": "src.features.health_expenditure:CountryHealthExpenditureFeatures",
+})
 
 class FeatureExtraction:
-    def __init__(self, registry: Dict[str, Type], params_map: Dict[str, Dict[str, Any]] | None = None):
+    def __init__(
+        self,
+        registry: Dict[str, Type],
+        params_map: Dict[str, Dict[str, Any]] | None = None,
+        quality_params: Dict[str, Any] | None = None,
+        manifest: Dict[str, Any] | None = None
+    ):
         self.registry = registry
         self.params_map = params_map or {}
+        # validation / repair of the cumulative series, runs before any feature
+        self.quality = DataQualityCheck(**(quality_params or {}))
+        # pruned feature manifest: only its transformers run (with its lag counts), other new columns are dropped
+        self.manifest = manifest
+        # columns added by every transformer of the last add_features
+        self.columns_by_feature: Dict[str, List[str]] = {}
 
     def _swap_cruise(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.copy()
@@ -47,36 +56,46 @@ class FeatureExtraction:
         return df
 
     def add_features(self, df: pd.DataFrame, enabled_features: list[str]) -> pd.DataFrame:
-        out = self._filling_null(self._swap_cruise(df))
+        out = self.quality.transform(self._filling_null(self._swap_cruise(df)))
+        if self.manifest is not None:
+            enabled_features = [name for name in enabled_features if name in self.manifest["features_to_apply"]]
 
+        self.columns_by_feature = {}
         for name in enabled_features:  
             cls = self.registry.get(name)
             if cls is None:
                 raise KeyError(f"Feature '{name}' is not registered in FEATURE_REGISTRY")
             params = self.params_map.get(name, {}) or {}
+            if self.manifest is not None:
+                params = {**params, **self.manifest["feature_params"].get(name, {})}
             transformer = cls(**params)
+            columns = set(out.columns)
             out = transformer.transform(out)
+            self.columns_by_feature[name] = [c for c in out.columns if c not in columns]
+
+        if self.manifest is not None:
+            kept = set(self.manifest["features"]) | set(DROP_COLS)
+            out = out.drop(columns=[c for columns in self.columns_by_feature.values() for c in columns if c not in kept])
 
         return out
 
-def main(): 
+def main(argv=None):
 
     # handle args
     parser = argparse.ArgumentParser()
     parser.add_argument("--save-file", type=str, default=None,
                         help="Path to save features CSV (default: from config)")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # load config
-    with open("config/config.yaml", "r") as f:
-        cfg = yaml.safe_load(f)
-    df = CovidDataLoader(cfg["paths"]["train_csv"], cfg["paths"]["test_csv"]).load()
+    cfg = load_config()
+    df = data_loader(cfg).load()
 
     # feature extraction
     params_map: Dict[str, Dict[str, Any]] = cfg.get("feature_params", {}) or {}
     enabled_features: list[str] = cfg.get("features_to_apply", [])
 
-    fx = FeatureExtraction(FEATURE_REGISTRY, params_map)
+    fx = FeatureExtraction(FEATURE_REGISTRY, params_map, cfg.get("data_quality"), load_feature_manifest(cfg))
     df_feat = fx.add_features(df, enabled_features)
 
     # DEBUG:
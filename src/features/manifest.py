@@ -0,0 +1,72 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+# lag column families -> (transformer, parameter setting how many lags it computes)
+LAG_FAMILIES = {
+    "LogNewConfirmedCases_prev_day_": ("TimeDelayFeatures", "days_history_size"),
+    "LogNewFatalities_prev_day_": ("TimeDelayFeatures", "days_history_size"),
+    "Neighbors_LogNewConfirmedCases_prev_day_": ("SpatialNeighborFeatures", "n_lags"),
+    "Neighbors_LogNewFatalities_prev_day_": ("SpatialNeighborFeatures", "n_lags"),
+}
+# produces the targets (LogNew*), runs even when none of its lags is kept
+REQUIRED_FEATURES = ["TimeDelayFeatures"]
+
+
+def _lag(column: str, prefix: str) -> int | None:
+    suffix = column[len(prefix):]
+    return int(suffix) if column.startswith(prefix) and suffix.isdigit() else None
+
+
+def build_feature_manifest(
+    feature_names: List[str], kept: List[str], columns_by_feature: Dict[str, List[str]], required_columns: List[str] = ()
+) -> dict:
+    """
+    manifest of the kept model input columns and the pipeline that computes only them.
+    required_columns (e.g. the categorical location columns) are kept whatever their importance.
+    Lags are kept as a prefix 1..max kept lag per family: recursive forecasts shift lag k into lag k + 1,
+    so a kept lag needs all shorter ones.
+    """
+    kept = set(kept) | set(required_columns)
+    feature_params: Dict[str, Dict[str, int]] = {}
+    for prefix, (feature, param) in LAG_FAMILIES.items():
+        family = {c: _lag(c, prefix) for c in feature_names if _lag(c, prefix) is not None}
+        max_lag = max((lag for c, lag in family.items() if c in kept), default=0)
+        kept |= {c for c, lag in family.items() if lag <= max_lag}
+        if feature in columns_by_feature:
+            params = feature_params.setdefault(feature, {})
+            params[param] = max(params.get(param, 0), max_lag)
+
+    features_to_apply = [
+        name for name, columns in columns_by_feature.items()
+        if name in REQUIRED_FEATURES or any(c in kept for c in columns)
+    ]
+    return {
+        "features": [c for c in feature_names if c in kept],
+        "dropped": [c for c in feature_names if c not in kept],
+        "features_to_apply": features_to_apply,
+        "feature_params": {name: params for name, params in feature_params.items() if name in features_to_apply},
+    }
+
+
+def save_feature_manifest(manifest: dict, path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    path.write_text(json.dumps(manifest, indent=2, default=str))
+    return path
+
+
+def load_feature_manifest(cfg: dict) -> dict | None:
+    """
+    pruned feature manifest (python -m src.cli select) when feature_selection.apply is set in config, else None
+    """
+    selection_cfg = cfg.get("feature_selection", {}) or {}
+    if not selection_cfg.get("apply", False):
+        return None
+    path = Path(selection_cfg["manifest"])
+    if not path.exists():
+        raise FileNotFoundError(f"Feature manifest {path} not found, run `python -m src.cli select` first or set feature_selection.apply: false")
+    manifest = json.loads(path.read_text())
+    logging.info(f"Using feature manifest {path} ({len(manifest['features'])} model input columns)")
+    return manifest
@@ -0,0 +1,165 @@
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+EARTH_RADIUS_KM = 6371.0088
+PREFIX = "Neighbors_"
+
+
+def neighbor_columns(target: str, n_lags: int) -> List[str]:
+    return [f"{PREFIX}{target}_prev_day_{lag}" for lag in range(1, n_lags + 1)]
+
+
+def neighbor_matrix(
+    lat: np.ndarray, long: np.ndarray, k: int | None = 8, radius_km: float | None = None, min_distance_km: float = 10.0
+) -> sparse.csr_matrix:
+    """
+    row-normalized inverse-distance weights [n, n] of every point to its neighbors (itself excluded).
+    A ball tree (haversine) over the unique coordinates finds the k nearest coordinates and / or those within radius_km;
+    points sharing a coordinate are neighbors at distance 0 (weights use max(distance, min_distance_km)).
+    """
+    from sklearn.neighbors import BallTree
+
+    if not k and radius_km is None:
+        raise ValueError("SpatialNeighborFeatures needs k and / or radius_km")
+    coords = np.radians(np.column_stack([lat, long]).astype(float))
+    unique, inverse = np.unique(coords, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    tree = BallTree(unique, metric="haversine")
+
+    if k:
+        n_query = min(k + 1, len(unique))   # + the coordinate itself
+        distances, indices = tree.query(unique, k=n_query)
+        rows = np.repeat(np.arange(len(unique)), n_query)
+        cols, distances = indices.ravel(), distances.ravel() * EARTH_RADIUS_KM
+        if radius_km is not None:
+            within = distances <= radius_km
+            rows, cols, distances = rows[within], cols[within], distances[within]
+    else:
+        indices, distances = tree.query_radius(unique, r=radius_km / EARTH_RADIUS_KM, return_distance=True)
+        rows = np.repeat(np.arange(len(unique)), [len(i) for i in indices])
+        cols, distances = np.concatenate(indices), np.concatenate(distances) * EARTH_RADIUS_KM
+
+    weights = 1.0 / np.maximum(distances, min_distance_km)
+    coordinate_weights = sparse.csr_matrix((weights, (rows, cols)), shape=(len(unique), len(unique)))
+
+    # coordinate neighbors -> point neighbors, without the point itself
+    membership = sparse.csr_matrix((np.ones(len(inverse)), (np.arange(len(inverse)), inverse)), shape=(len(inverse), len(unique)))
+    W = (membership @ coordinate_weights @ membership.T).tocsr()
+    W.setdiag(0)
+    W.eliminate_zeros()
+
+    row_sums = np.asarray(W.sum(axis=1)).ravel()
+    return (sparse.diags(np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums > 0)) @ W).tocsr()
+
+
+class NeighborAggregator:
+    """
+    Weighted mean over spatial neighbors for a fixed set of locations, used by the feature and by the
+    recursive forecasts to derive the neighbor lags of the next day from this day's predictions.
+    Missing neighbors (NaN, or locations without a row) are left out and the weights of the others renormalized.
+    """
+    def __init__(self, location_index: pd.MultiIndex, W: sparse.csr_matrix):
+        self.location_index = location_index
+        self.W = W
+
+    def codes(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        location position of every row of df (-1 for unknown locations)
+        """
+        return self.location_index.get_indexer(pd.MultiIndex.from_frame(df[LOCATION_COLUMNS].astype(str)))
+
+    def aggregate(self, grid: np.ndarray) -> np.ndarray:
+        """
+        grid: [n_locations, m] (e.g. one column per day) -> [n_locations, m], one sparse product for all columns
+        """
+        valid = ~np.isnan(grid)
+        totals = self.W @ np.where(valid, grid, 0.0)
+        weights = self.W @ valid.astype(float)
+        return np.divide(totals, weights, out=np.full(totals.shape, np.nan), where=weights > 0)
+
+    def for_rows(self, codes: np.ndarray) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        values of rows -> neighbor means of the same rows. Rows repeating a location (e.g. stacked scenarios)
+        are separate copies, each aggregated over the neighbors of its own copy.
+        """
+        codes = np.asarray(codes)
+        known = codes >= 0
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1]]) if len(codes) else np.array([], dtype=int)
+        copy = np.empty(len(codes), dtype=np.int64)
+        copy[order] = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+        n_copies = int(copy.max()) + 1 if len(codes) else 0
+        n_locations = len(self.location_index)
+
+        def aggregate_rows(values: np.ndarray) -> np.ndarray:
+            grid = np.full((n_locations, n_copies), np.nan)
+            grid[codes[known], copy[known]] = np.asarray(values, dtype=float)[known]
+            out = np.full(len(codes), np.nan)
+            out[known] = self.aggregate(grid)[codes[known], copy[known]]
+            return out
+
+        return aggregate_rows
+
+
+class SpatialNeighborFeatures:
+    """
+    Neighbors_LogNew{ConfirmedCases,Fatalities}_prev_day_{1..n_lags}: distance-weighted mean of the
+    neighbors' LogNew* values lagged by 1..n_lags days (neighbors: k nearest and / or within radius_km).
+    Runs after TimeDelayFeatures. Values go into a [location, day] grid, so all days are aggregated
+    with one sparse product per target and lags are shifted grid columns.
+    """
+    def __init__(self, k: int | None = 8, radius_km: float | None = None, n_lags: int = 7, min_distance_km: float = 10.0):
+        self.k = k
+        self.radius_km = radius_km
+        self.n_lags = n_lags
+        self.min_distance_km = min_distance_km
+
+    def aggregator(self, df: pd.DataFrame) -> NeighborAggregator:
+        """
+        over the locations of df (first Lat / Long of every location)
+        """
+        locations = df[LOCATION_COLUMNS + ["Lat", "Long"]].reset_index(drop=True).astype({c: str for c in LOCATION_COLUMNS})
+        locations = locations.drop_duplicates(LOCATION_COLUMNS).sort_values(LOCATION_COLUMNS)
+        W = neighbor_matrix(locations["Lat"].to_numpy(), locations["Long"].to_numpy(), self.k, self.radius_km, self.min_distance_km)
+        return NeighborAggregator(pd.MultiIndex.from_frame(locations[LOCATION_COLUMNS]), W)
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+
+        required = set(LOCATION_COLUMNS + ["Lat", "Long", "Date"] + TARGETS)
+        missing = required - set(df.columns)
+        if missing:
+            raise KeyError(f"Missing columns for SpatialNeighborFeatures (run TimeDelayFeatures first): {missing}")
+
+        aggregator = self.aggregator(df)
+        codes = aggregator.codes(df)
+        dates = pd.to_datetime(df["Date"])
+        days = ((dates - dates.min()) // pd.Timedelta(days=1)).to_numpy()
+
+        for target in TARGETS:
+            grid = np.full((len(aggregator.location_index), days.max() + 1), np.nan)
+            grid[codes, days] = df[target].to_numpy(dtype=float)
+            neighbors = aggregator.aggregate(grid)
+
+            for lag, column in enumerate(neighbor_columns(target, self.n_lags), start=1):
+                values = np.full(len(df), np.nan)
+                has_lag = days >= lag
+                values[has_lag] = neighbors[codes[has_lag], days[has_lag] - lag]
+                df[column] = values
+
+        return df
+
+
+def neighbor_aggregator(cfg: dict, df: pd.DataFrame) -> NeighborAggregator | None:
+    """
+    aggregator with the SpatialNeighborFeatures params of config over the locations of df, None if the feature is not used
+    """
+    if "SpatialNeighborFeatures" not in (cfg.get("features_to_apply", []) or []):
+        return None
+    params = (cfg.get("feature_params", {}) or {}).get("SpatialNeighborFeatures", {}) or {}
+    return SpatialNeighborFeatures(**params).aggregator(df)
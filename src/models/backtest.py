@@ -0,0 +1,262 @@
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from src.data.data_processing import DataProcessor
+from src.features.spatial_neighbors import neighbor_aggregator
+from src.models.evaluation import ForecastEvaluator, save_evaluation
+from src.models.utils import recursive_forecast
+from src.utils import load_config
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+
+# attached shared arrays of the current worker process
+_SHARED: Dict[str, Any] = {}
+
+
+class SharedFrame:
+    """
+    Date-sorted base data as numeric arrays in shared memory.
+    Rows of day d are [offsets[d], offsets[d + 1]), so a fold is an index range, never a copy.
+    """
+    def __init__(self, cfg: dict, df: pd.DataFrame):
+        cat_features = cfg["train"].get("cat_features", [])
+
+        frame = DataProcessor(cfg).index_by_date(df.dropna(subset=TARGETS + ["ConfirmedCases", "Fatalities"]))
+        observed, features = frame.df, frame.features
+
+        self.cat_columns = [c for c in features.columns if c in cat_features]
+        self.float_columns = [c for c in features.columns if c not in cat_features]
+        self.column_order = list(features.columns)
+        self.cat_features = self.cat_columns
+
+        locations = observed[LOCATION_COLUMNS].astype(str).agg("\x1f".join, axis=1)
+        location_codes, location_names = pd.factorize(locations)
+        self.location_names = [name.split("\x1f") for name in location_names]
+
+        # neighbor lags of the recursive forecast (SpatialNeighborFeatures), location code -> aggregator position
+        self.neighbors = neighbor_aggregator(cfg, observed)
+        self.neighbor_codes = (
+            self.neighbors.codes(pd.DataFrame(self.location_names, columns=LOCATION_COLUMNS))
+            if self.neighbors is not None else None
+        )
+
+        self.first_date = observed["Date"].min()
+        # offsets over every calendar day (days without observations get an empty range)
+        day = ((frame.dates - frame.days[0]) // np.timedelta64(1, "D")).astype(np.int64)
+        self.n_days = int(day.max()) + 1
+
+        arrays = {
+            "float": features[self.float_columns].to_numpy(dtype=np.float64),
+            "cat": np.column_stack([features[c].cat.codes.to_numpy(dtype=np.int32) for c in self.cat_columns])
+                   if self.cat_columns else np.zeros((len(features), 0), dtype=np.int32),
+            "targets": observed[TARGETS].to_numpy(dtype=np.float64),
+            "cumulative": observed[["ConfirmedCases", "Fatalities"]].to_numpy(dtype=np.float64),
+            "location": location_codes.astype(np.int32),
+            "offsets": np.searchsorted(day, np.arange(self.n_days + 1)).astype(np.int64),
+        }
+
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.specs = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def worker_args(self) -> dict:
+        return {
+            "specs": self.specs,
+            "float_columns": self.float_columns,
+            "cat_columns": self.cat_columns,
+            "column_order": self.column_order,
+            "location_names": self.location_names,
+            "first_date": self.first_date,
+            "neighbors": self.neighbors,
+            "neighbor_codes": self.neighbor_codes,
+        }
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach(worker_args: dict):
+    """
+    process pool initializer: map the shared arrays without copying
+    """
+    _SHARED.clear()
+    _SHARED.update(worker_args)
+    _SHARED["blocks"] = []
+    for name, (block_name, shape, dtype) in worker_args["specs"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _SHARED["blocks"].append(block)
+        _SHARED[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _frame(start: int, end: int) -> pd.DataFrame:
+    """
+    model input for rows [start, end) in training column order; categorical values stay integer codes
+    """
+    X = pd.DataFrame(_SHARED["float"][start:end], columns=_SHARED["float_columns"])
+    for j, c in enumerate(_SHARED["cat_columns"]):
+        X[c] = _SHARED["cat"][start:end, j]
+    return X[_SHARED["column_order"]]
+
+
+def _run_fold(origin_day: int, horizon: int, model_spec: dict) -> pd.DataFrame:
+    from src.models.train_model import MODEL_REGISTRY, fit_model
+
+    offsets = _SHARED["offsets"]
+    n_days = len(offsets) - 1
+    origin_start, train_end = offsets[origin_day], offsets[origin_day + 1]
+    eval_end = offsets[min(origin_day + horizon + 1, n_days)]
+    cat_features = _SHARED["cat_columns"]
+
+    # train on every day up to the origin
+    train_X = _frame(0, train_end)
+    models = {}
+    for j, target in enumerate(TARGETS):
+        models[target] = fit_model(
+            MODEL_REGISTRY[model_spec["type"]], model_spec["type"], model_spec["params"],
+            train_X, _SHARED["targets"][:train_end, j], None, None,
+            cat_features, verbose=False, write_files=False
+        )
+
+    # recursive forecast from the origin day
+    origin_X = _frame(origin_start, train_end)
+    origin_targets = _SHARED["targets"][origin_start:train_end]
+    origin_cumulative = _SHARED["cumulative"][origin_start:train_end]
+    neighbors = None
+    if _SHARED["neighbors"] is not None:
+        neighbors = _SHARED["neighbors"].for_rows(_SHARED["neighbor_codes"][_SHARED["location"][origin_start:train_end]])
+    out = recursive_forecast(
+        models, origin_X,
+        {"ConfirmedCases": origin_targets[:, 0], "Fatalities": origin_targets[:, 1]},
+        {"ConfirmedCases": origin_cumulative[:, 0], "Fatalities": origin_cumulative[:, 1]},
+        horizon, cat_features, neighbors
+    )
+
+    # line predictions up with the actual rows of the forecast window
+    location_pos = np.full(len(_SHARED["location_names"]), -1)
+    location_pos[_SHARED["location"][origin_start:train_end]] = np.arange(train_end - origin_start)
+    eval_rows = np.arange(train_end, eval_end)
+    eval_day = np.searchsorted(offsets, eval_rows, side="right") - 1
+    h = eval_day - origin_day - 1
+    pos = location_pos[_SHARED["location"][eval_rows]]
+    keep = pos >= 0
+    eval_rows, h, pos = eval_rows[keep], h[keep], pos[keep]
+
+    names = np.array(_SHARED["location_names"], dtype=object)[_SHARED["location"][eval_rows]]
+    fold_df = pd.DataFrame({
+        "Country/Region": [n[0] for n in names],
+        "Province/State": [n[1] for n in names],
+        "Date": _SHARED["first_date"] + pd.to_timedelta(eval_day[keep], unit="D"),
+        "ConfirmedCases": _SHARED["cumulative"][eval_rows, 0],
+        "Fatalities": _SHARED["cumulative"][eval_rows, 1],
+        "LogNewConfirmedCases": _SHARED["targets"][eval_rows, 0],
+        "LogNewFatalities": _SHARED["targets"][eval_rows, 1],
+        "PredictedConfirmedCases": out["ConfirmedCases"][h, pos],
+        "PredictedFatalities": out["Fatalities"][h, pos],
+        "PredictedLogNewConfirmedCases": out["LogNewConfirmedCases"][h, pos],
+        "PredictedLogNewFatalities": out["LogNewFatalities"][h, pos],
+    })
+
+    origin_date = _SHARED["first_date"] + pd.Timedelta(days=origin_day)
+    table = ForecastEvaluator(n_bootstrap=0).evaluate(
+        fold_df, origin_date + pd.Timedelta(days=1), run=str(origin_date.date())
+    )
+    return table[table["level"].isin(["overall", "horizon"])]
+
+
+class RollingOriginBacktest:
+    """
+    Walk-forward backtest: one fold per origin date, folds trained and forecasted in a process pool
+    """
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        backtest_cfg = cfg.get("backtest", {}) or {}
+        self.n_origins = backtest_cfg.get("n_origins", 30)
+        self.step_days = backtest_cfg.get("step_days", 1)
+        self.horizon = backtest_cfg.get("horizon", 14)
+        self.last_origin = backtest_cfg.get("last_origin")
+        self.n_workers = backtest_cfg.get("n_workers", 4)
+
+        model_info = cfg["models"][cfg["train"]["model"]]
+        params = {**model_info.get("params", {}), **(backtest_cfg.get("params") or {})}
+        if model_info["type"] == "CatBoostRegressor":
+            # split cores between workers instead of oversubscribing
+            params.setdefault("thread_count", max(1, (os.cpu_count() or 1) // self.n_workers))
+        self.model_spec = {"type": model_info["type"], "params": params}
+
+    def origin_days(self, frame: SharedFrame) -> List[int]:
+        if self.last_origin is not None:
+            last = (pd.Timestamp(self.last_origin) - frame.first_date).days
+        else:
+            # latest origin whose whole horizon is observed
+            last = frame.n_days - 1 - self.horizon
+        days = [last - i * self.step_days for i in range(self.n_origins)]
+        return sorted(d for d in days if 0 < d < frame.n_days - 1)
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        frame = SharedFrame(self.cfg, df)
+        try:
+            origins = self.origin_days(frame)
+            logging.info(f"Backtesting {len(origins)} origins with horizon {self.horizon} on {self.n_workers} workers")
+            with ProcessPoolExecutor(
+                max_workers=self.n_workers, initializer=_attach, initargs=(frame.worker_args(),)
+            ) as ex:
+                futures = [ex.submit(_run_fold, day, self.horizon, self.model_spec) for day in origins]
+                folds = [f.result() for f in futures]
+        finally:
+            frame.close()
+
+        return pd.concat(folds, ignore_index=True).rename(columns={"run": "origin"})
+
+
+def summarize(folds: pd.DataFrame) -> pd.DataFrame:
+    """
+    mean / std of every metric over folds, per level and key
+    """
+    metric_columns = [c for c in folds.columns if c.startswith(("RMSLE_", "MAE_"))]
+    summary = folds.groupby(["level", "key"], sort=False)[metric_columns].agg(["mean", "std"])
+    summary.columns = [f"{metric}_{stat}" for metric, stat in summary.columns]
+    summary.insert(0, "n_folds", folds.groupby(["level", "key"], sort=False).size())
+    return summary.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=str, required=True, help="Path to precomputed features CSV")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    cfg = load_config()
+
+    df_feat = pd.read_csv(args.features, parse_dates=["Date"])
+    df_feat[LOCATION_COLUMNS] = df_feat[LOCATION_COLUMNS].fillna("")
+
+    folds = RollingOriginBacktest(cfg).run(df_feat)
+    summary = summarize(folds)
+    print(summary[summary["level"] == "overall"].to_string(index=False))
+
+    save_dir = Path((cfg.get("evaluation", {}) or {}).get("save_dir", "evaluations"))
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    save_evaluation(folds, save_dir / f"backtest-{cfg['train']['model']}-{stamp}-folds.csv")
+    save_path = save_evaluation(summary, save_dir / f"backtest-{cfg['train']['model']}-{stamp}-summary.csv")
+    logging.info(f"Backtest results saved to {save_path}")
+
+
+if __name__ == "__main__":
+    main()
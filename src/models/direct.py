@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+
+
+def add_origin_features(df: pd.DataFrame, features_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Direct models see the origin day itself as the most recent lag (prev_day_0)
+    """
+    origin_features = features_df.copy()
+    for target in TARGETS:
+        origin_features[f"{target}_prev_day_0"] = df.loc[features_df.index, target].values
+    return origin_features
+
+
+def make_direct_dataset(
+    origin_df, origin_features, target_df,
+    horizons,
+    location_columns=["Country/Region", "Province/State"]
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stack one row per (origin day, horizon) with the target observed `horizon` days later.
+    Origins come from origin_df, targets from target_df (same frame for train, eval window for eval).
+    """
+    keys = origin_df[location_columns + ["Date"]]
+    frames = []
+    for h in horizons:
+        shifted = keys.assign(Date=keys["Date"] + pd.Timedelta(days=h), Horizon=h, _origin=keys.index)
+        frames.append(shifted)
+
+    stacked = pd.concat(frames, ignore_index=True).merge(
+        right=target_df[location_columns + ["Date"] + TARGETS].dropna(subset=TARGETS),
+        how="inner",
+        on=location_columns + ["Date"]
+    )
+
+    X = origin_features.loc[stacked["_origin"]].reset_index(drop=True)
+    X["Horizon"] = stacked["Horizon"].values
+    y = stacked[TARGETS]
+    return X, y
+
+
+class DirectModel:
+    """
+    Horizon-as-feature model, optionally split into one model per horizon bucket
+    """
+    def __init__(self, buckets: List[Tuple[int, int]], models: list):
+        self.buckets = buckets
+        self.models = models
+
+    def predict(self, X: pd.DataFrame, cat_features) -> np.ndarray:
+        import catboost as cb
+        preds = np.zeros(len(X))
+        horizon = X["Horizon"].values
+        for (lo, hi), model in zip(self.buckets, self.models):
+            mask = (horizon >= lo) & (horizon <= hi)
+            if mask.any():
+                preds[mask] = model.predict(cb.Pool(X[mask], cat_features=cat_features))
+        return preds
+
+
+def predict_direct_for_dataset(
+    df, origin_df, origin_features,
+    first_date, last_date,
+    models,
+    cat_features,
+    location_columns=["Country/Region", "Province/State"]
+):
+    """
+    Predict every day in [first_date, last_date] for every location in one batched call per target.
+    origin_df holds the last observed day, origin_features its direct features (see add_origin_features).
+    """
+    df['PredictedLogNewConfirmedCases'] = np.nan
+    df['PredictedLogNewFatalities'] = np.nan
+    df['PredictedConfirmedCases'] = np.nan
+    df['PredictedFatalities'] = np.nan
+
+    origin_date = origin_df["Date"].max()
+    last_horizon = (pd.Timestamp(last_date) - origin_date).days
+    horizons = np.arange(1, last_horizon + 1)
+    n_locations = len(origin_df)
+
+    # horizon-major layout: rows [h * n_locations : (h + 1) * n_locations] belong to horizons[h]
+    X = origin_features.iloc[np.tile(np.arange(n_locations), len(horizons))].reset_index(drop=True)
+    X["Horizon"] = np.repeat(horizons, n_locations)
+
+    pred_df = pd.DataFrame({
+        col: np.tile(origin_df[col].values, len(horizons)) for col in location_columns
+    })
+    pred_df["Date"] = origin_date + pd.to_timedelta(X["Horizon"], unit="D")
+
+    for field in ['ConfirmedCases', 'Fatalities']:
+        log_new = np.maximum(models['LogNew' + field].predict(X, cat_features), 0.0)
+        increments = np.rint(np.expm1(log_new)).reshape(len(horizons), n_locations)
+        cumulative = origin_df[field].values + np.cumsum(increments, axis=0)
+
+        pred_df['PredictedLogNew' + field] = log_new
+        pred_df['Predicted' + field] = cumulative.ravel()
+
+    pred_df = pred_df[pred_df["Date"] >= pd.Timestamp(first_date)]
+    merged = df[location_columns + ["Date"]].reset_index(names="_row").merge(
+        right=pred_df, how="inner", on=location_columns + ["Date"]
+    )
+    pred_columns = [
+        'PredictedLogNewConfirmedCases', 'PredictedLogNewFatalities',
+        'PredictedConfirmedCases', 'PredictedFatalities'
+    ]
+    df.loc[merged["_row"].values, pred_columns] = merged[pred_columns].values
+
+    return df
@@ -0,0 +1,236 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+WEIGHT_METHODS = ["equal", "stacked"]
+
+# model type -> saved file extension
+MODEL_FILE_EXTENSIONS = {
+    "CatBoostRegressor": "cbm",
+    "LGBMRegressor": "txt",
+    "XGBRegressor": "json",
+}
+
+
+def save_member(model, model_type: str, path_stem: Path) -> Path:
+    save_path = Path(f"{path_stem}.{MODEL_FILE_EXTENSIONS[model_type]}")
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    if model_type == "LGBMRegressor":
+        model.booster_.save_model(str(save_path))
+    else:
+        model.save_model(str(save_path))
+    return save_path
+
+
+class LoadedModel:
+    """
+    LightGBM Booster / XGBoost model loaded from file behind the interface the forecasters use with CatBoost models:
+    feature_names_, and predict on a feature frame whose location columns may be plain strings. The columns the model
+    treats as categorical are passed as pandas categories, both libraries map them to their training categories.
+    """
+    def __init__(self, model, feature_names: List[str], categorical: List[str]):
+        self.model = model
+        self.feature_names_ = list(feature_names)
+        self.categorical = list(categorical)
+
+    @classmethod
+    def from_lightgbm(cls, booster) -> "LoadedModel":
+        names = booster.feature_name()
+        categorical = [names[i] for i in booster.params.get("categorical_feature", [])]
+        return cls(booster, names, categorical)
+
+    @classmethod
+    def from_xgboost(cls, model) -> "LoadedModel":
+        booster = model.get_booster()
+        types = booster.feature_types or ["float"] * len(booster.feature_names)
+        return cls(model, booster.feature_names, [name for name, kind in zip(booster.feature_names, types) if kind == "c"])
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        X = X.reindex(columns=self.feature_names_)
+        recast = {c: "category" for c in self.categorical if not isinstance(X[c].dtype, pd.CategoricalDtype)}
+        return np.asarray(self.model.predict(X.astype(recast) if recast else X), dtype=float)
+
+
+def load_member(model_type: str, path: Path, evaluator: str = "catboost"):
+    if model_type == "CatBoostRegressor":
+        if evaluator == "numpy":
+            from src.models.oblivious_trees import ObliviousTreeEvaluator
+            exported = Path(f"{path}.numpy")
+            if exported.is_dir():   # exported by the model registry, arrays are memory-mapped
+                return ObliviousTreeEvaluator.load(exported)
+            return ObliviousTreeEvaluator.from_cbm(path)
+        import catboost as cb
+        model = cb.CatBoost()
+        model.load_model(str(path))
+        return model
+    if model_type == "LGBMRegressor":
+        import lightgbm as lgb
+        return LoadedModel.from_lightgbm(lgb.Booster(model_file=str(path)))
+    if model_type == "XGBRegressor":
+        import xgboost as xgb
+        model = xgb.XGBRegressor()
+        model.load_model(str(path))
+        return LoadedModel.from_xgboost(model)
+    raise ValueError(f"Unknown model type '{model_type}'")
+
+
+def fit_weights(member_predictions: np.ndarray, y: np.ndarray, method: str = "stacked") -> np.ndarray:
+    """
+    member_predictions: [n_rows, n_members] predictions on the eval window
+    equal: plain average, stacked: non-negative least squares normalized to sum 1
+    """
+    n_members = member_predictions.shape[1]
+    if method == "equal" or n_members == 1:
+        return np.full(n_members, 1.0 / n_members)
+    if method != "stacked":
+        raise ValueError(f"Unknown weight method '{method}', expected one of {WEIGHT_METHODS}")
+
+    from scipy.optimize import nnls
+    valid = ~np.isnan(y)
+    weights, _ = nnls(member_predictions[valid], y[valid])
+    if weights.sum() <= 0:
+        return np.full(n_members, 1.0 / n_members)
+    return weights / weights.sum()
+
+
+class SharedInputs:
+    """
+    Model inputs of the latest feature frame, shared by the ensembles of all targets:
+    the cb.Pool of a forecast day is built once for every CatBoost member and target,
+    the frame for the other members once with the categories seen in training
+    (XGBoost predicts from category codes, which differ between separately preprocessed frames)
+    """
+    def __init__(self, categories: Dict[str, list] | None = None):
+        self.categories = {c: pd.CategoricalDtype(values) for c, values in (categories or {}).items()}
+        self._frame = None
+        self._inputs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, X: pd.DataFrame, kind: str, cat_features) -> Any:
+        with self._lock:
+            if X is not self._frame:
+                self._frame, self._inputs = X, {}
+            if kind not in self._inputs:
+                if kind == "pool":
+                    import catboost as cb
+                    self._inputs[kind] = cb.Pool(X, cat_features=[c for c in cat_features if c in X.columns])
+                else:
+                    recast = {c: dtype for c, dtype in self.categories.items() if c in X.columns and X[c].dtype != dtype}
+                    self._inputs[kind] = X.astype(recast) if recast else X
+            return self._inputs[kind]
+
+
+class EnsembleModel:
+    """
+    Weighted blend of member models of one target, members predicted concurrently.
+    Acts as a single model for predict_for_dataset / recursive_forecast, so lag updates use the blended prediction.
+    """
+    def __init__(
+        self,
+        names: List[str],
+        members: list,
+        weights: np.ndarray,
+        feature_names: List[str],
+        cat_features: List[str],
+        shared_inputs: SharedInputs | None = None,
+        executor: ThreadPoolExecutor | None = None,
+    ):
+        self.names = names
+        self.members = members
+        self.weights = np.asarray(weights, dtype=float)
+        self.feature_names_ = list(feature_names)
+        self.cat_features = cat_features
+        self.shared_inputs = shared_inputs or SharedInputs()
+        self.executor = executor or ThreadPoolExecutor(max_workers=len(members))
+        self.timings = {name: 0.0 for name in names}
+        self.calls = 0
+
+    def _member_input(self, member, X: pd.DataFrame):
+        cb = sys.modules.get("catboost")
+        kind = "pool" if cb is not None and isinstance(member, cb.CatBoost) else "frame"
+        return self.shared_inputs.get(X, kind, self.cat_features)
+
+    def _predict_member(self, i: int, X: pd.DataFrame) -> np.ndarray:
+        start = time.perf_counter()
+        preds = np.asarray(self.members[i].predict(self._member_input(self.members[i], X)), dtype=float)
+        self.timings[self.names[i]] += time.perf_counter() - start
+        return preds
+
+    def predict_members(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        [n_rows, n_members]
+        """
+        futures = [self.executor.submit(self._predict_member, i, X) for i in range(len(self.members))]
+        return np.column_stack([f.result() for f in futures])
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        self.calls += 1
+        return self.predict_members(X) @ self.weights
+
+    def close(self):
+        """
+        shut down the member thread pool (shared by the ensembles of all targets)
+        """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def timing_report(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "member": self.names,
+            "weight": self.weights,
+            "predict_sec": [self.timings[name] for name in self.names],
+            "calls": self.calls,
+        })
+
+
+def training_categories(train_X: pd.DataFrame, cat_features: List[str]) -> Dict[str, list]:
+    return {c: train_X[c].cat.categories.tolist() for c in cat_features if c in train_X.columns}
+
+
+def save_manifest(
+    path: Path, members: List[dict], weights: Dict[str, List[float]],
+    feature_names: List[str], cat_features: List[str], categories: Dict[str, list]
+):
+    """
+    members: [{"name", "type", "files": {target: file name}}]
+    """
+    manifest = {
+        "members": members, "weights": weights, "feature_names": feature_names,
+        "cat_features": cat_features, "categories": categories,
+    }
+    Path(path).write_text(json.dumps(manifest, indent=2))
+
+
+def load_ensemble(manifest_path: Path, targets: List[str], evaluator: str = "catboost") -> Dict[str, EnsembleModel]:
+    """
+    target -> EnsembleModel, members of all targets share one input cache and one thread pool
+    """
+    manifest = json.loads(Path(manifest_path).read_text())
+    model_dir = Path(manifest_path).parent
+    names = [member["name"] for member in manifest["members"]]
+    shared_inputs = SharedInputs(manifest.get("categories"))
+    executor = ThreadPoolExecutor(max_workers=len(names))
+
+    models = {}
+    for target in targets:
+        members = [
+            load_member(member["type"], model_dir / member["files"][target], evaluator)
+            for member in manifest["members"]
+        ]
+        models[target] = EnsembleModel(
+            names, members, manifest["weights"][target],
+            manifest["feature_names"], manifest["cat_features"], shared_inputs, executor
+        )
+    return models
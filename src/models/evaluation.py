@@ -0,0 +1,152 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# metric name -> (actual column, predicted column, kind)
+METRICS = {
+    "RMSLE_ConfirmedCases": ("ConfirmedCases", "PredictedConfirmedCases", "rmsle"),
+    "RMSLE_Fatalities": ("Fatalities", "PredictedFatalities", "rmsle"),
+    "MAE_LogNewConfirmedCases": ("LogNewConfirmedCases", "PredictedLogNewConfirmedCases", "mae"),
+    "MAE_LogNewFatalities": ("LogNewFatalities", "PredictedLogNewFatalities", "mae"),
+}
+
+
+def _row_errors(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    per-row error of every metric (NaN where actual or prediction is missing)
+    """
+    errors = {}
+    for name, (actual, predicted, kind) in METRICS.items():
+        if actual not in df.columns or predicted not in df.columns:
+            continue
+        y_true = df[actual].to_numpy(dtype=float)
+        y_pred = df[predicted].to_numpy(dtype=float)
+        if kind == "rmsle":
+            errors[name] = (np.log1p(y_pred) - np.log1p(y_true)) ** 2
+        else:
+            errors[name] = np.abs(y_pred - y_true)
+    return errors
+
+
+def _group_sums(codes: np.ndarray, n_groups: int, errors: Dict[str, np.ndarray]):
+    """
+    error sums and counts per group with one bincount per metric
+    """
+    sums = np.zeros((n_groups, len(errors)))
+    counts = np.zeros((n_groups, len(errors)))
+    for j, err in enumerate(errors.values()):
+        valid = ~np.isnan(err)
+        sums[:, j] = np.bincount(codes[valid], weights=err[valid], minlength=n_groups)
+        counts[:, j] = np.bincount(codes[valid], minlength=n_groups)
+    return sums, counts
+
+
+def _finalize(names: List[str], sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = sums / counts
+    for j, name in enumerate(names):
+        if METRICS[name][2] == "rmsle":
+            values[..., j] = np.sqrt(values[..., j])
+    return values
+
+
+class ForecastEvaluator:
+    """
+    Forecast metrics overall and per location / country / horizon day,
+    with location-level bootstrap confidence intervals for the overall metrics
+    """
+    def __init__(self, n_bootstrap: int = 1000, confidence: float = 0.95, n_jobs: int = 4, seed: int = 42):
+        self.n_bootstrap = n_bootstrap
+        self.confidence = confidence
+        self.n_jobs = n_jobs
+        self.seed = seed
+
+    def _bootstrap(self, names: List[str], sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        resample locations with replacement; each worker draws its own block of resamples
+        """
+        n_locations = len(sums)
+        n_jobs = max(1, min(self.n_jobs, self.n_bootstrap))
+        blocks = np.array_split(np.arange(self.n_bootstrap), n_jobs)
+        seeds = np.random.SeedSequence(self.seed).spawn(n_jobs)
+
+        def run(block, seed):
+            rng = np.random.default_rng(seed)
+            weights = rng.multinomial(n_locations, np.full(n_locations, 1.0 / n_locations), size=len(block))
+            return _finalize(names, weights @ sums, weights @ counts)
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as ex:
+            samples = list(ex.map(run, blocks, seeds))
+        return np.concatenate(samples)
+
+    def evaluate(self, df: pd.DataFrame, first_date, run: str = "") -> pd.DataFrame:
+        """
+        df: forecast frame with actual and Predicted* columns (output of predict_for_dataset)
+        first_date: first forecast day (horizon 1)
+        """
+        df = df[df["Date"] >= pd.Timestamp(first_date)]
+        errors = _row_errors(df)
+        names = list(errors)
+
+        country = df["Country/Region"].astype(str).to_numpy()
+        province = df["Province/State"].fillna("").astype(str).to_numpy()
+        location = np.where(province == "", country, np.char.add(np.char.add(country, " / "), province))
+        horizon = ((df["Date"] - pd.Timestamp(first_date)).dt.days + 1).to_numpy()
+
+        tables = []
+        location_sums = location_counts = None
+        for level, keys in [("location", location), ("country", country), ("horizon", horizon)]:
+            codes, uniques = pd.factorize(keys, sort=True)
+            sums, counts = _group_sums(codes, len(uniques), errors)
+            table = pd.DataFrame(_finalize(names, sums, counts), columns=names)
+            table.insert(0, "n", counts.max(axis=1).astype(int))
+            table.insert(0, "key", [str(k) for k in uniques])
+            table.insert(0, "level", level)
+            tables.append(table)
+            if level == "location":
+                location_sums, location_counts = sums, counts
+
+        overall = _finalize(names, location_sums.sum(axis=0), location_counts.sum(axis=0))
+        rows = [["overall", "all", int(location_counts.sum(axis=0).max()), *overall]]
+        if self.n_bootstrap > 0 and len(location_sums) > 1:
+            samples = self._bootstrap(names, location_sums, location_counts)
+            alpha = (1 - self.confidence) / 2
+            low, high = np.nanpercentile(samples, [100 * alpha, 100 * (1 - alpha)], axis=0)
+            rows.append(["overall", f"ci_low_{self.confidence:g}", self.n_bootstrap, *low])
+            rows.append(["overall", f"ci_high_{self.confidence:g}", self.n_bootstrap, *high])
+        tables.insert(0, pd.DataFrame(rows, columns=["level", "key", "n"] + names))
+
+        result = pd.concat(tables, ignore_index=True)
+        result.insert(0, "run", run)
+        return result
+
+
+def save_evaluation(table: pd.DataFrame, save_path: Path) -> Path:
+    """
+    compact long table, one file per run
+    """
+    save_path = Path(save_path)
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    table.to_csv(save_path, index=False, float_format="%.6g")
+    return save_path
+
+
+def main(argv=None):
+    # compare the overall metrics of saved runs side by side
+    parser = argparse.ArgumentParser()
+    parser.add_argument("runs", nargs="+", help="Evaluation CSV files written by train_model")
+    parser.add_argument("--level", type=str, default="overall", help="overall | location | country | horizon")
+    args = parser.parse_args(argv)
+
+    tables = pd.concat([pd.read_csv(path, keep_default_na=False, na_values=[""]) for path in args.runs], ignore_index=True)
+    tables = tables[tables["level"] == args.level]
+    metric_columns = [c for c in METRICS if c in tables.columns]
+    print(tables.set_index(["key", "run"])[metric_columns].sort_index().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data.load_dataset import data_loader
+from src.data.data_processing import DataProcessor, DateIndexedFrame
+from src.features.main import FeatureExtraction, FEATURE_REGISTRY
+from src.features.manifest import build_feature_manifest, save_feature_manifest
+from src.features.spatial_neighbors import neighbor_aggregator
+from src.models.evaluation import ForecastEvaluator, save_evaluation
+from src.models.train_model import MODEL_REGISTRY, fit_model
+from src.models.utils import forecast_from_origin, to_model_input
+from src.utils import load_config
+
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+DEFAULT_CUMULATIVE = 0.95
+
+
+def _rmse(model, X: pd.DataFrame, y: np.ndarray, cat_features) -> float:
+    predicted = np.maximum(model.predict(to_model_input({"model": model}, X, cat_features)), 0.0)
+    return float(np.sqrt(np.nanmean((predicted - y) ** 2)))
+
+
+def model_importances(models: Dict[str, Any], feature_names: List[str]) -> pd.DataFrame:
+    """
+    column x target importances reported by the fitted models (e.g. CatBoost PredictionValuesChange)
+    """
+    return pd.DataFrame(
+        {target: np.asarray(model.feature_importances_, dtype=float) for target, model in models.items()},
+        index=feature_names
+    )
+
+
+def permutation_importances(
+    models: Dict[str, Any], X: pd.DataFrame, y: pd.DataFrame, cat_features,
+    n_repeats: int = 3, n_jobs: int = 4, seed: int = 42
+) -> pd.DataFrame:
+    """
+    column x target increase of the one-step RMSE on X when the column is shuffled (mean over n_repeats);
+    every (target, column) run is a task of a thread pool, the boosters predict outside the GIL
+    """
+    rng = np.random.default_rng(seed)
+    permutations = [rng.permutation(len(X)) for _ in range(n_repeats)]
+    labels = {target: y[target].to_numpy(dtype=float) for target in models}
+    baseline = {target: _rmse(model, X, labels[target], cat_features) for target, model in models.items()}
+
+    def run(target: str, column: str) -> float:
+        losses = []
+        for permutation in permutations:
+            X_permuted = X.copy(deep=False)
+            X_permuted[column] = X[column].take(permutation).array
+            losses.append(_rmse(models[target], X_permuted, labels[target], cat_features))
+        return float(np.mean(losses)) - baseline[target]
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as ex:
+        futures = {(target, column): ex.submit(run, target, column) for target in models for column in X.columns}
+        scores = {key: future.result() for key, future in futures.items()}
+    return pd.DataFrame({target: [scores[(target, c)] for c in X.columns] for target in models}, index=list(X.columns))
+
+
+def select_columns(importance: pd.DataFrame, cumulative: float = DEFAULT_CUMULATIVE) -> List[str]:
+    """
+    per target, the most important columns holding `cumulative` of its positive importance; union over targets
+    """
+    kept = set()
+    for target in importance.columns:
+        scores = importance[target].clip(lower=0.0).sort_values(ascending=False)
+        scores = scores[scores > 0]
+        if scores.empty:
+            continue
+        share = (scores.cumsum() / scores.sum()).to_numpy()
+        n = min(int(np.searchsorted(share, cumulative)) + 1, len(scores))
+        kept |= set(scores.index[:n])
+    return [c for c in importance.index if c in kept]
+
+
+class FeatureSelection:
+    """
+    Feature selection stage after training: the full pipeline is trained and ranked, the pruned manifest
+    is trained again and both are compared on the eval window (accuracy, extraction / fit / forecast time, memory)
+    """
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self.selection_cfg = cfg.get("feature_selection", {}) or {}
+        self.processor = DataProcessor({**cfg, "feature_selection": {**self.selection_cfg, "apply": False}})
+        self.cat_features = cfg["train"].get("cat_features", [])
+
+        self.model_key = self.selection_cfg.get("model") or cfg["train"]["model"]
+        model_info = cfg["models"][self.model_key]
+        if model_info["type"] == "Ensemble":
+            raise ValueError("Feature selection ranks columns with a single model type, set feature_selection.model")
+        self.model_type = model_info["type"]
+        self.params = {**model_info.get("params", {}), **(self.selection_cfg.get("params") or {})}
+
+        self.last_train_date = pd.Timestamp(cfg["train"]["last_train_date"])
+        self.last_eval_date = pd.Timestamp(cfg["train"]["last_eval_date"])
+        self.evaluator = ForecastEvaluator(n_bootstrap=0, seed=cfg.get("seed", 42))
+
+    def run_pipeline(self, df_raw: pd.DataFrame, manifest: dict | None, label: str) -> Tuple[dict, Dict[str, Any], dict]:
+        """
+        extract features (honoring manifest), train both targets and forecast the eval window recursively;
+        returns (report row, models, {"eval_X", "eval_y", "columns_by_feature"})
+        """
+        fx = FeatureExtraction(
+            FEATURE_REGISTRY, self.cfg.get("feature_params", {}) or {},
+            {**(self.cfg.get("data_quality") or {}), "report_path": None}, manifest
+        )
+        start = time.perf_counter()
+        df_feat = fx.add_features(df_raw, self.cfg.get("features_to_apply", []))
+        extract_sec = time.perf_counter() - start
+
+        frame = DateIndexedFrame(df_feat, self.cat_features, feature_names=manifest["features"] if manifest else None)
+        _, eval_df, _ = self.processor.split_by_date(frame)
+        splits = self.processor.split_xy(frame)
+        train_X, train_y = splits["train"]
+        eval_X, eval_y = splits["eval"]
+
+        start = time.perf_counter()
+        models = {
+            target: fit_model(
+                MODEL_REGISTRY[self.model_type], self.model_type, self.params,
+                train_X, train_y[target], eval_X, eval_y[target], self.cat_features, verbose=False, write_files=False
+            )
+            for target in TARGETS
+        }
+        fit_sec = time.perf_counter() - start
+
+        forecast_df = eval_df.copy()
+        prev_day_df = frame.day(self.last_train_date)
+        start = time.perf_counter()
+        forecast_from_origin(
+            forecast_df, prev_day_df, train_X.loc[prev_day_df.index], self.last_eval_date,
+            models=models,
+            cat_features=self.cat_features,
+            neighbors=neighbor_aggregator(self.cfg, eval_df)
+        )
+        forecast_sec = time.perf_counter() - start
+
+        table = self.evaluator.evaluate(forecast_df, self.last_train_date + pd.Timedelta(days=1), run=label)
+        overall = table[(table["level"] == "overall") & (table["key"] == "all")].iloc[0]
+        row = {
+            "features": label,
+            "n_columns": train_X.shape[1],
+            "train_X_mb": train_X.memory_usage(deep=True).sum() / 2 ** 20,
+            "extract_sec": extract_sec,
+            "fit_sec": fit_sec,
+            "eval_forecast_sec": forecast_sec,
+            "RMSLE_ConfirmedCases": overall["RMSLE_ConfirmedCases"],
+            "RMSLE_Fatalities": overall["RMSLE_Fatalities"],
+        }
+        logging.info(f"{label}: {row}")
+        return row, models, {"eval_X": eval_X, "eval_y": eval_y, "columns_by_feature": fx.columns_by_feature}
+
+    def rank(self, models: Dict[str, Any], eval_X: pd.DataFrame, eval_y: pd.DataFrame, method: str) -> pd.DataFrame:
+        start = time.perf_counter()
+        if method == "importance":
+            importance = model_importances(models, list(eval_X.columns))
+        elif method == "permutation":
+            importance = permutation_importances(
+                models, eval_X, eval_y, self.cat_features,
+                n_repeats=self.selection_cfg.get("n_repeats", 3),
+                n_jobs=self.selection_cfg.get("n_jobs", 4),
+                seed=self.cfg.get("seed", 42),
+            )
+        else:
+            raise ValueError(f"Unknown feature selection method '{method}', expected 'importance' or 'permutation'")
+        logging.info(f"Ranked {eval_X.shape[1]} columns by {method} in {time.perf_counter() - start:.1f}s")
+        return importance
+
+    def run(self, df_raw: pd.DataFrame, method: str, cumulative: float) -> Tuple[dict, pd.DataFrame]:
+        """
+        (manifest, report of the full vs pruned pipeline)
+        """
+        full_row, models, full = self.run_pipeline(df_raw, None, "all")
+        importance = self.rank(models, full["eval_X"], full["eval_y"], method)
+
+        feature_names = list(full["eval_X"].columns)
+        manifest = build_feature_manifest(
+            feature_names, select_columns(importance, cumulative), full["columns_by_feature"],
+            required_columns=[c for c in self.cat_features if c in feature_names]
+        )
+        manifest = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "model_key": self.model_key,
+            "method": method,
+            "cumulative_importance": cumulative,
+            "source_features_to_apply": self.cfg.get("features_to_apply", []),
+            **manifest,
+            "importance": importance.round(6).to_dict(orient="index"),
+        }
+        logging.info(
+            f"Keeping {len(manifest['features'])} of {len(feature_names)} columns, "
+            f"features {manifest['features_to_apply']}, params {manifest['feature_params']}"
+        )
+
+        pruned_row, _, _ = self.run_pipeline(df_raw, manifest, "pruned")
+        return manifest, pd.DataFrame([full_row, pruned_row])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--method", type=str, default=None, help="importance | permutation (default: from config)")
+    parser.add_argument("--cumulative", type=float, default=None, help="Importance share kept per target (default: from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    cfg = load_config()
+    selection_cfg = cfg.get("feature_selection", {}) or {}
+    method = args.method or selection_cfg.get("method", "importance")
+    cumulative = args.cumulative if args.cumulative is not None else selection_cfg.get("cumulative_importance", DEFAULT_CUMULATIVE)
+
+    df_raw = data_loader(cfg).load()
+    manifest, report = FeatureSelection(cfg).run(df_raw, method, cumulative)
+    print(report.to_string(index=False))
+
+    manifest_path = save_feature_manifest(manifest, selection_cfg.get("manifest", "datasets/covid19_feature_extraction/feature_manifest.json"))
+    save_dir = Path((cfg.get("evaluation", {}) or {}).get("save_dir", "evaluations"))
+    report_path = save_evaluation(report, save_dir / f"feature-selection-{manifest['model_key']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv")
+    logging.info(f"Feature manifest saved to {manifest_path} (set feature_selection.apply: true to use it), report saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
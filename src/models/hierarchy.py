@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from typing import Any, Dict, List, Tuple
+
+from src.models.utils import numeric_features, recursive_forecast
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+GLOBAL_KEY = "Global"
+
+# cumulative columns that add up over locations (log increments do not)
+ROLLUP_COLUMNS = ["ConfirmedCases", "Fatalities", "PredictedConfirmedCases", "PredictedFatalities"]
+FIELDS = ["ConfirmedCases", "Fatalities"]
+
+
+class LocationHierarchy:
+    """
+    global -> country -> location (Country/Region, Province/State) hierarchy.
+    S is the sparse summing matrix [n_nodes, n_locations], nodes ordered global, countries, locations,
+    so the values of every level are S @ (location values), for all days at once.
+    """
+    def __init__(self, locations: pd.DataFrame):
+        locations = locations[LOCATION_COLUMNS].drop_duplicates().sort_values(LOCATION_COLUMNS).reset_index(drop=True)
+        self.location_index = pd.MultiIndex.from_frame(locations)
+        country_codes, self.countries = pd.factorize(locations["Country/Region"], sort=True)
+
+        n_locations, n_countries = len(locations), len(self.countries)
+        rows = np.concatenate([
+            np.zeros(n_locations, dtype=np.int64),                       # global
+            1 + country_codes,                                          # country
+            1 + n_countries + np.arange(n_locations),                   # location
+        ])
+        cols = np.tile(np.arange(n_locations), 3)
+        self.S = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(1 + n_countries + n_locations, n_locations)
+        )
+
+        self.nodes = pd.DataFrame({
+            "level": ["global"] + ["country"] * n_countries + ["location"] * n_locations,
+            "Country/Region": [GLOBAL_KEY] + list(self.countries) + list(locations["Country/Region"]),
+            "Province/State": [""] * (1 + n_countries) + list(locations["Province/State"]),
+        })
+        self._solvers: Dict[str, tuple] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "LocationHierarchy":
+        return cls(df[LOCATION_COLUMNS])
+
+    @property
+    def n_locations(self) -> int:
+        return self.S.shape[1]
+
+    def codes(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        location position of every row of df (-1 for locations outside the hierarchy)
+        """
+        return self.location_index.get_indexer(pd.MultiIndex.from_frame(df[LOCATION_COLUMNS]))
+
+    def aggregate(self, values: np.ndarray) -> np.ndarray:
+        """
+        values: [n_locations, k] -> [n_nodes, k]; a node is NaN if any of its locations is NaN
+        """
+        values = np.asarray(values, dtype=float)
+        missing = np.isnan(values)
+        totals = self.S @ np.where(missing, 0.0, values)
+        return np.where(self.S @ missing.astype(float) > 0, np.nan, totals)
+
+    def rollup(self, df: pd.DataFrame, columns: List[str] = ROLLUP_COLUMNS, levels=("global", "country")) -> pd.DataFrame:
+        """
+        long frame (level, Country/Region, Province/State, Date, columns) of the selected levels for every date of df.
+        Rows are placed into a [location, day] grid by code, then one sparse product per column covers all days.
+        Locations without a row on a date make their country / global value NaN for that date.
+        """
+        columns = [c for c in columns if c in df.columns]
+        location_codes = self.codes(df)
+        known = location_codes >= 0
+        day_codes, days = pd.factorize(df["Date"], sort=True)
+
+        node_mask = self.nodes["level"].isin(levels).to_numpy()
+        nodes = self.nodes[node_mask]
+        out = pd.DataFrame({
+            "level": np.repeat(nodes["level"].to_numpy(), len(days)),
+            "Country/Region": np.repeat(nodes["Country/Region"].to_numpy(), len(days)),
+            "Province/State": np.repeat(nodes["Province/State"].to_numpy(), len(days)),
+            "Date": np.tile(np.asarray(days), len(nodes)),
+        })
+        for c in columns:
+            grid = np.full((self.n_locations, len(days)), np.nan)
+            grid[location_codes[known], day_codes[known]] = df[c].to_numpy(dtype=float)[known]
+            out[c] = self.aggregate(grid)[node_mask].ravel()
+        return out
+
+    def _solver(self, method: str):
+        """
+        factorized S' W^-1 S (n_locations x n_locations, sparse) and W^-1, cached per method
+        """
+        if method not in self._solvers:
+            if method == "ols":
+                w_inv = np.ones(self.S.shape[0])
+            elif method == "wls":
+                # structural scaling: variance proportional to the number of locations under a node
+                w_inv = 1.0 / np.asarray(self.S.sum(axis=1)).ravel()
+            else:
+                raise ValueError(f"Unknown reconciliation method '{method}', expected 'ols' or 'wls'")
+            W_inv = sparse.diags(w_inv)
+            self._solvers[method] = (splu((self.S.T @ W_inv @ self.S).tocsc()), W_inv)
+        return self._solvers[method]
+
+    def reconcile(self, base: np.ndarray, method: str = "wls") -> np.ndarray:
+        """
+        base: [n_nodes, k] forecasts of every node, e.g. locations from the location model and
+        countries / global from separate models; NaN nodes are filled bottom-up.
+        returns coherent forecasts S (S' W^-1 S)^-1 S' W^-1 base, where every level adds up
+        """
+        base = np.asarray(base, dtype=float)
+        if base.ndim == 1:
+            return self.reconcile(base[:, None], method)[:, 0]
+
+        bottom_up = self.aggregate(base[-self.n_locations:])
+        base = np.where(np.isnan(base), bottom_up, base)
+        lu, W_inv = self._solver(method)
+        return self.S @ lu.solve(self.S.T @ (W_inv @ base))
+
+    def country_origin(self, origin_df: pd.DataFrame, origin_features_df: pd.DataFrame, cat_features) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        origin rows and model features of every country node (ordered as the nodes), aggregated from its locations:
+        counts and daily increments (LogNew* and their lags) are summed, Days_since_* take the max (a total crosses
+        a threshold no later than any of its locations), other numeric features the mean
+        """
+        origin_df = origin_df.reset_index(drop=True)
+        X = numeric_features(origin_features_df, cat_features).reset_index(drop=True)
+        country = origin_df["Country/Region"]
+
+        increments = [c for c in X.columns if c.startswith("LogNew")]
+        days_since = [c for c in X.columns if c.startswith("Days_since_")]
+        numeric = [c for c in X.columns if c not in cat_features and c not in increments + days_since]
+        country_X = pd.concat([
+            np.log1p(np.expm1(X[increments]).groupby(country, sort=True).sum(min_count=1)),
+            X[days_since].groupby(country, sort=True).max(),
+            X[numeric].groupby(country, sort=True).mean(),
+        ], axis=1).reindex(self.countries)
+        if "Country/Region" in X.columns:
+            country_X["Country/Region"] = self.countries
+        if "Province/State" in X.columns:
+            country_X["Province/State"] = ""
+
+        country_df = pd.DataFrame({"Country/Region": self.countries, "Province/State": ""})
+        for field in FIELDS:
+            country_df[field] = origin_df[field].astype(float).groupby(country, sort=True).sum().reindex(self.countries).to_numpy()
+            country_df["LogNew" + field] = np.log1p(
+                np.expm1(origin_df["LogNew" + field].astype(float)).groupby(country, sort=True).sum().reindex(self.countries)
+            ).to_numpy()
+        return country_df, country_X[X.columns].reset_index(drop=True)
+
+    def reconcile_forecast(
+        self, predictions: pd.DataFrame, origin_df: pd.DataFrame, origin_features_df: pd.DataFrame,
+        models: Dict[str, Any], cat_features, method: str = "wls"
+    ) -> pd.DataFrame:
+        """
+        Coherent Predicted{ConfirmedCases,Fatalities} of the location rows of predictions (forecast days after the origin).
+        Base forecasts: the locations' own, and per country the recursive forecast of the same models from the country's
+        aggregated origin row (country_origin); the global node is filled bottom-up. Every day is reconciled in one
+        solve over all nodes, so country totals and their locations agree.
+        """
+        predictions = predictions.copy()
+        country_df, country_X = self.country_origin(origin_df, origin_features_df, cat_features)
+        origin_date = pd.Timestamp(origin_df["Date"].max())
+        location_codes = self.codes(predictions)
+        day_codes = (pd.to_datetime(predictions["Date"]) - origin_date).dt.days.to_numpy() - 1
+        valid = (location_codes >= 0) & (day_codes >= 0)
+        horizon = int(day_codes.max()) + 1
+
+        country_out = recursive_forecast(
+            models, country_X,
+            {field: country_df["LogNew" + field].to_numpy(dtype=float) for field in FIELDS},
+            {field: country_df[field].to_numpy(dtype=float) for field in FIELDS},
+            horizon, cat_features
+        )
+        n_countries = len(self.countries)
+        for field in FIELDS:
+            base = np.full((self.S.shape[0], horizon), np.nan)
+            base[1:1 + n_countries] = country_out[field].T
+            location_base = np.full((self.n_locations, horizon), np.nan)
+            location_base[location_codes[valid], day_codes[valid]] = predictions["Predicted" + field].to_numpy(dtype=float)[valid]
+            # a location without a forecast on a day would make the whole solve NaN, it counts as 0 there
+            base[1 + n_countries:] = np.nan_to_num(location_base, nan=0.0)
+            coherent = self.reconcile(base, method)[1 + n_countries:]
+            values = predictions["Predicted" + field].to_numpy(dtype=float).copy()
+            values[valid] = np.maximum(coherent[location_codes[valid], day_codes[valid]], 0.0)
+            predictions["Predicted" + field] = values
+        return predictions
+
+
+def reconcile_method(cfg: dict) -> str | None:
+    """
+    hierarchy.reconcile of config: ols | wls, or None to keep the location forecasts as they are
+    """
+    return (cfg.get("hierarchy", {}) or {}).get("reconcile")
@@ -1,38 +1,226 @@
 import argparse
-import yaml
 import pandas as pd
 import logging
+from datetime import datetime
 from pathlib import Path
-import catboost as cb
-from typing import Dict, Any, List, Type
+from typing import Dict, Any, Iterator, List, Type
 
 from src.data.data_processing import DataProcessor
+from src.data.load_dataset import data_loader
 from src.features.main import FeatureExtraction, FEATURE_REGISTRY
+from src.features.manifest import load_feature_manifest
+from src.features.spatial_neighbors import neighbor_aggregator
 from src.models.utils import predict_for_dataset
+from src.models.ensemble import load_ensemble, load_member
+from src.models.registry import load_configured_models, model_files
+from src.utils import load_config
+from src import telemetry
 
+LOCATION_COLUMNS = ["Province/State", "Country/Region"]
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
 
-def main():
+
+def load_models(model_dir: Path, model_key: str, evaluator: str = "catboost") -> Dict[str, Any]:
+    """
+    load saved models/{model_key}_{target}.{cbm,txt,json} once (or the ensemble of models/{model_key}_ensemble.json)
+    evaluator (CatBoost models): "catboost" (plain CatBoost: saved params hold both verbose and logging_level,
+    which CatBoostRegressor.predict rejects) or "numpy" (ObliviousTreeEvaluator, no Pool per call)
+    """
+    if evaluator not in ("catboost", "numpy"):
+        raise ValueError(f"Unknown evaluator '{evaluator}', expected 'catboost' or 'numpy'")
+    files = model_files(model_dir, model_key)
+    if files["type"] == "Ensemble":
+        return load_ensemble(Path(model_dir) / files["ensemble"], TARGETS, evaluator)
+    return {target: load_member(files["type"], Path(model_dir) / name, evaluator) for target, name in files["files"].items()}
+
+
+def iter_location_batches(test_csv: Path, batch_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Stream test.csv in chunks of ~batch_size rows without splitting a location across batches.
+    Rows of one location are expected to be contiguous (as in Kaggle's test.csv).
+    """
+    carry = None
+    for chunk in pd.read_csv(test_csv, parse_dates=["Date"], chunksize=batch_size):
+        chunk[LOCATION_COLUMNS] = chunk[LOCATION_COLUMNS].fillna("")
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+
+        # keep the (possibly incomplete) last location for the next chunk
+        last_key = chunk[LOCATION_COLUMNS].iloc[-1]
+        is_last = (chunk[LOCATION_COLUMNS] == last_key).all(axis=1)
+        carry = chunk[is_last]
+        if (~is_last).any():
+            yield chunk[~is_last]
+
+    if carry is not None and not carry.empty:
+        yield carry
+
+
+class BatchForecaster:
+    """
+    Batch inference engine: models and train history are loaded once,
+    the test file is forecasted in location batches and streamed to a submission file
+    """
+    def __init__(self, cfg: dict, models: Dict[str, Any]):
+        self.cfg = cfg
+        self.models = models
+        self.cat_features = cfg["test"].get("cat_features", [])
+        self.processor = DataProcessor(cfg)
+
+        params_map: Dict[str, Dict[str, Any]] = cfg.get("feature_params", {}) or {}
+        self.enabled_features: list[str] = cfg.get("features_to_apply", [])
+        # same repair as in training, the report is written by feature extraction, not per batch
+        self.quality_params = {**(cfg.get("data_quality") or {}), "report_path": None}
+        # pruned feature manifest: lags and features the models do not use are never computed
+        self.manifest = load_feature_manifest(cfg)
+        self.fx = FeatureExtraction(FEATURE_REGISTRY, params_map, self.quality_params, self.manifest)
+
+        try:
+            # merged snapshots when paths.snapshots is set
+            self.train = data_loader(cfg).load_train()
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, FileNotFoundError) as e:
+            raise ValueError(f"Failded loading CSV file: {e}") from e
+        self.train[LOCATION_COLUMNS] = self.train[LOCATION_COLUMNS].fillna("")
+        self.last_train_date = self.train["Date"].max()
+
+        # batches may not contain the outbreak origin, resolve it once from the full train data
+        if "DistanceToOriginFeatures" in self.enabled_features:
+            distance_params = dict(params_map.get("DistanceToOriginFeatures", {}) or {})
+            distance_params["origin_coords"] = FEATURE_REGISTRY["DistanceToOriginFeatures"](**distance_params)._get_origin_coords(self.train)
+            self.fx = FeatureExtraction(
+                FEATURE_REGISTRY, {**params_map, "DistanceToOriginFeatures": distance_params}, self.quality_params, self.manifest
+            )
+
+        # neighbor lags need every location, as in training: with SpatialNeighborFeatures all train locations
+        # are forecast together once and batches are sliced out of it, so results do not depend on batch_size
+        self.neighbors = neighbor_aggregator(cfg, self.train)
+        if self.manifest is not None and "SpatialNeighborFeatures" not in self.manifest["features_to_apply"]:
+            self.neighbors = None
+        self._all_locations_forecast = None
+
+    def _history(self, locations: pd.DataFrame) -> pd.DataFrame:
+        # full per-location history: DayFeatures counts days from the first train date
+        return self.train.merge(locations, how="inner", on=LOCATION_COLUMNS)
+
+    def _forecast(self, history: pd.DataFrame, future: pd.DataFrame) -> pd.DataFrame:
+        """
+        location, Date and PredictedConfirmedCases / PredictedFatalities of the future rows
+        """
+        df_raw = pd.concat([history, future], ignore_index=True).sort_values("Date").reset_index(drop=True)
+        df_feat = self.fx.add_features(df_raw, self.enabled_features)
+        features, _ = self.processor.preprocess_df(df_feat)
+
+        model_features = self.models[TARGETS[0]].feature_names_
+        features = features.reindex(columns=model_features)
+
+        prev_day_df = df_feat.loc[df_feat["Date"] == self.last_train_date]
+        predict_for_dataset(
+            df_feat, features, prev_day_df,
+            self.last_train_date + pd.Timedelta(days=1), future["Date"].max(),
+            update_features_data=True,
+            models=self.models,
+            cat_features=self.cat_features,
+            neighbors=self.neighbors
+        )
+        future_rows = df_feat["Date"] > self.last_train_date
+        return df_feat.loc[future_rows, LOCATION_COLUMNS + ["Date", "PredictedConfirmedCases", "PredictedFatalities"]]
+
+    def _forecast_all_locations(self, last_date: pd.Timestamp) -> pd.DataFrame:
+        """
+        forecast of every train location up to last_date, computed once (again only if a batch needs later dates)
+        """
+        if self._all_locations_forecast is None or self._all_locations_forecast["Date"].max() < last_date:
+            static_columns = LOCATION_COLUMNS + [c for c in ["Lat", "Long"] if c in self.train.columns]
+            locations = self.train.sort_values("Date").groupby(LOCATION_COLUMNS, as_index=False).last()[static_columns]
+            dates = pd.DataFrame({"Date": pd.date_range(self.last_train_date + pd.Timedelta(days=1), last_date)})
+            self._all_locations_forecast = self._forecast(self.train, locations.merge(dates, how="cross"))
+            logging.info(f"Forecast all {len(locations)} locations up to {last_date.date()} (neighbor lags)")
+        return self._all_locations_forecast
+
+    def predict_batch(self, test_batch: pd.DataFrame) -> pd.DataFrame:
+        """
+        return ForecastId, ConfirmedCases, Fatalities for every row of test_batch
+        """
+        locations = test_batch[LOCATION_COLUMNS].drop_duplicates()
+        history = self._history(locations)
+
+        future = test_batch[test_batch["Date"] > self.last_train_date]
+        predicted = pd.DataFrame()
+        if not future.empty:
+            if self.neighbors is not None:
+                predicted = self._forecast_all_locations(future["Date"].max())
+            else:
+                predicted = self._forecast(history, future)
+
+        # vectorized join back to ForecastId: forecasts for future days, actuals for days already in train
+        submission = test_batch[["ForecastId"] + LOCATION_COLUMNS + ["Date"]].merge(
+            right=history[LOCATION_COLUMNS + ["Date", "ConfirmedCases", "Fatalities"]],
+            how="left",
+            on=LOCATION_COLUMNS + ["Date"]
+        )
+        if not predicted.empty:
+            submission = submission.merge(predicted, how="left", on=LOCATION_COLUMNS + ["Date"])
+            for field in ["ConfirmedCases", "Fatalities"]:
+                submission[field] = submission[field].fillna(submission["Predicted" + field])
+
+        # locations without a forecast (e.g. dropped as non-cumulative) keep their last known value
+        last_known = history.sort_values("Date").groupby(LOCATION_COLUMNS, as_index=False).last()
+        submission = submission.merge(
+            right=last_known[LOCATION_COLUMNS + ["ConfirmedCases", "Fatalities"]],
+            how="left",
+            on=LOCATION_COLUMNS,
+            suffixes=("", "_last")
+        )
+        for field in ["ConfirmedCases", "Fatalities"]:
+            submission[field] = submission[field].fillna(submission[field + "_last"]).fillna(0.0)
+
+        return submission[["ForecastId", "ConfirmedCases", "Fatalities"]].sort_values("ForecastId")
+
+    def run(self, test_csv: Path, save_path: Path, batch_size: int) -> Path:
+        save_path = Path(save_path)
+        save_path.parent.mkdir(exist_ok=True, parents=True)
+
+        if self.neighbors is not None:
+            logging.warning(
+                f"SpatialNeighborFeatures: all train locations are forecast at once, batch_size {batch_size} "
+                "only bounds the test rows read and written per batch, not the memory of the forecast"
+            )
+        n_rows = 0
+        for i, test_batch in enumerate(iter_location_batches(test_csv, batch_size)):
+            with telemetry.writer().stage("predict_batch", i):
+                submission = self.predict_batch(test_batch)
+            submission.to_csv(save_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+            n_rows += len(submission)
+            logging.info(f"Batch {i}: wrote {len(submission)} rows ({n_rows} total)")
+
+        logging.info(f"Submission saved to {save_path}")
+        return save_path
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("--test", type=str, default=None, help="Path to test.csv")
-    args = parser.parse_args()
+    parser.add_argument("--save-file", type=str, default=None, help="Path to save submission CSV (default: from config)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Number of test rows per batch (default: from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
-    with open("config/config.yaml", "r") as f:
-        cfg = yaml.safe_load(f)
+    cfg = load_config()
 
-    # load raw test
-    if args.test is not None:
-        test_csv = args.test
-    else:
-        test_csv = cfg["paths"]["test_csv"]
+    test_cfg = cfg.get("test", {})
+    test_csv = args.test if args.test is not None else cfg["paths"]["test_csv"]
+    save_path = args.save_file if args.save_file is not None else test_cfg["save_submission"]
+    batch_size = args.batch_size if args.batch_size is not None else test_cfg.get("batch_size", 10000)
 
-    df_raw = pd.read_csv(test_csv, parse_dates=["Date"])
+    # load models once (test.model_version from the registry), rejected before any feature is built if the pipeline changed
+    version, models = load_configured_models(cfg)
+    logging.info(f"Loaded {cfg['train']['model']} {version}")
 
-    # feature extraction
-    params_map: Dict[str, Dict[str, Any]] = cfg.get("feature_params", {}) or {}
-    enabled_features: list[str] = cfg.get("features_to_apply", [])
-    fx = FeatureExtraction(FEATURE_REGISTRY, params_map)
-    df_feat = fx.add_features(df_raw, enabled_features)
+    telemetry.start_from_config(cfg, f"predict-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    BatchForecaster(cfg, models).run(test_csv, save_path, batch_size)
+    telemetry.stop()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
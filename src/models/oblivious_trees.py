@@ -0,0 +1,472 @@
+import argparse
+import json
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+# CityHash64 (v1.0.x, as used by CatBoost to hash categorical values)
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_K0 = 0xc3a5c85c97cb3127
+_K1 = 0xb492b66fbe98f273
+_K2 = 0x9ae16a3b2f90404f
+_K3 = 0xc949d7c7509e6557
+_KMUL = 0x9ddfea08eb382d69
+
+
+def _fetch64(s: bytes, i: int) -> int:
+    return struct.unpack_from("<Q", s, i)[0]
+
+
+def _fetch32(s: bytes, i: int) -> int:
+    return struct.unpack_from("<I", s, i)[0]
+
+
+def _rotate(v: int, shift: int) -> int:
+    return v if shift == 0 else ((v >> shift) | (v << (64 - shift))) & _MASK64
+
+
+def _shift_mix(v: int) -> int:
+    return v ^ (v >> 47)
+
+
+def _hash_len16(u: int, v: int) -> int:
+    a = ((u ^ v) * _KMUL) & _MASK64
+    a ^= a >> 47
+    b = ((v ^ a) * _KMUL) & _MASK64
+    b ^= b >> 47
+    return (b * _KMUL) & _MASK64
+
+
+def _hash_len0to16(s: bytes, n: int) -> int:
+    if n > 8:
+        a = _fetch64(s, 0)
+        b = _fetch64(s, n - 8)
+        return _hash_len16(a, _rotate((b + n) & _MASK64, n)) ^ b
+    if n >= 4:
+        a = _fetch32(s, 0)
+        return _hash_len16((n + (a << 3)) & _MASK64, _fetch32(s, n - 4))
+    if n > 0:
+        y = s[0] + (s[n >> 1] << 8)
+        z = n + (s[n - 1] << 2)
+        return (_shift_mix(((y * _K2) ^ (z * _K3)) & _MASK64) * _K2) & _MASK64
+    return _K2
+
+
+def _hash_len17to32(s: bytes, n: int) -> int:
+    a = (_fetch64(s, 0) * _K1) & _MASK64
+    b = _fetch64(s, 8)
+    c = (_fetch64(s, n - 8) * _K2) & _MASK64
+    d = (_fetch64(s, n - 16) * _K0) & _MASK64
+    return _hash_len16(
+        (_rotate((a - b) & _MASK64, 43) + _rotate(c, 30) + d) & _MASK64,
+        (a + _rotate(b ^ _K3, 20) - c + n) & _MASK64
+    )
+
+
+def _hash_len33to64(s: bytes, n: int) -> int:
+    z = _fetch64(s, 24)
+    a = (_fetch64(s, 0) + (n + _fetch64(s, n - 16)) * _K0) & _MASK64
+    b = _rotate((a + z) & _MASK64, 52)
+    c = _rotate(a, 37)
+    a = (a + _fetch64(s, 8)) & _MASK64
+    c = (c + _rotate(a, 7)) & _MASK64
+    a = (a + _fetch64(s, 16)) & _MASK64
+    vf = (a + z) & _MASK64
+    vs = (b + _rotate(a, 31) + c) & _MASK64
+    a = (_fetch64(s, 16) + _fetch64(s, n - 32)) & _MASK64
+    z = _fetch64(s, n - 8)
+    b = _rotate((a + z) & _MASK64, 52)
+    c = _rotate(a, 37)
+    a = (a + _fetch64(s, n - 24)) & _MASK64
+    c = (c + _rotate(a, 7)) & _MASK64
+    a = (a + _fetch64(s, n - 16)) & _MASK64
+    wf = (a + z) & _MASK64
+    ws = (b + _rotate(a, 31) + c) & _MASK64
+    r = _shift_mix(((vf + ws) * _K2 + (wf + vs) * _K0) & _MASK64)
+    return (_shift_mix((r * _K0 + vs) & _MASK64) * _K2) & _MASK64
+
+
+def _weak_hash_len32_with_seeds(s: bytes, i: int, a: int, b: int):
+    w, x, y, z = _fetch64(s, i), _fetch64(s, i + 8), _fetch64(s, i + 16), _fetch64(s, i + 24)
+    a = (a + w) & _MASK64
+    b = _rotate((b + a + z) & _MASK64, 21)
+    c = a
+    a = (a + x + y) & _MASK64
+    b = (b + _rotate(a, 44)) & _MASK64
+    return (a + z) & _MASK64, (b + c) & _MASK64
+
+
+def city_hash64(s: bytes) -> int:
+    n = len(s)
+    if n <= 16:
+        return _hash_len0to16(s, n)
+    if n <= 32:
+        return _hash_len17to32(s, n)
+    if n <= 64:
+        return _hash_len33to64(s, n)
+
+    # hash the end first, then loop over 64-byte chunks keeping v, w, x, y, z as state
+    x = _fetch64(s, 0)
+    y = _fetch64(s, n - 16) ^ _K1
+    z = _fetch64(s, n - 56) ^ _K0
+    v = _weak_hash_len32_with_seeds(s, n - 64, n, y)
+    w = _weak_hash_len32_with_seeds(s, n - 32, (n * _K1) & _MASK64, _K0)
+    z = (z + _shift_mix(v[1]) * _K1) & _MASK64
+    x = (_rotate((z + x) & _MASK64, 39) * _K1) & _MASK64
+    y = (_rotate(y, 33) * _K1) & _MASK64
+
+    pos = 0
+    remaining = (n - 1) & ~63
+    while True:
+        x = (_rotate((x + y + v[0] + _fetch64(s, pos + 16)) & _MASK64, 37) * _K1) & _MASK64
+        y = (_rotate((y + v[1] + _fetch64(s, pos + 48)) & _MASK64, 42) * _K1) & _MASK64
+        x ^= w[1]
+        y ^= v[0]
+        z = _rotate(z ^ w[0], 33)
+        v = _weak_hash_len32_with_seeds(s, pos, (v[1] * _K1) & _MASK64, (x + w[0]) & _MASK64)
+        w = _weak_hash_len32_with_seeds(s, pos + 32, (z + w[1]) & _MASK64, y)
+        z, x = x, z
+        pos += 64
+        remaining -= 64
+        if remaining == 0:
+            break
+
+    return _hash_len16(
+        (_hash_len16(v[0], w[0]) + _shift_mix(y) * _K1 + z) & _MASK64,
+        (_hash_len16(v[1], w[1]) + x) & _MASK64
+    )
+
+
+def cat_feature_hash(value) -> int:
+    """
+    CatBoost's hash of a categorical value: low 32 bits of CityHash64, as a signed int32
+    """
+    h = city_hash64(str(value).encode("utf-8")) & 0xFFFFFFFF
+    return h - (1 << 32) if h >= (1 << 31) else h
+
+
+def _combine_hash(a: int, b: int) -> int:
+    magic_mult = 0x4906ba494954cb65
+    return (magic_mult * ((a + magic_mult * b) & _MASK64)) & _MASK64
+
+
+class ObliviousTreeEvaluator:
+    """
+    Pure-NumPy evaluator of a CatBoost model (symmetric trees) loaded from its JSON export.
+
+    Every tree split becomes one column of a boolean matrix (feature > border, or hash == value for one-hot),
+    leaf indices are assembled from those bits and leaf values are gathered into flat arrays.
+    Categorical features are supported through one-hot splits and CTRs over categorical values.
+    """
+    # array state written by save() and memory-mapped by load()
+    ARRAYS = ["float_nan_as_true", "split_kind", "split_source", "split_border", "tree_split_ids", "leaf_offsets", "leaf_values"]
+
+    def __init__(self, model_json: dict, chunk_size: int = 8192):
+        self.chunk_size = chunk_size
+        info = model_json["features_info"]
+        float_features = sorted(info.get("float_features", []), key=lambda f: f["feature_index"])
+        cat_features = sorted(info.get("categorical_features", []), key=lambda f: f["feature_index"])
+
+        # flat feature order = column order of the training frame
+        names = {f["flat_feature_index"]: f["feature_id"] for f in float_features + cat_features}
+        self.feature_names_ = [names[i] for i in sorted(names)]
+        self.float_feature_names = [f["feature_id"] for f in float_features]
+        self.cat_feature_names = [f["feature_id"] for f in cat_features]
+        self.float_nan_as_true = np.array(
+            [f.get("nan_value_treatment") == "AsTrue" for f in float_features], dtype=bool
+        )
+
+        # global binary feature index -> (kind, source index, border); floats first, then ctrs
+        binary_features = []
+        for i, f in enumerate(float_features):
+            for border in f.get("borders") or []:
+                binary_features.append(("float", i, border))
+        self.ctrs = info.get("ctrs", []) or []
+        for i, ctr in enumerate(self.ctrs):
+            for element in ctr["elements"]:
+                if element["combination_element"] not in ("cat_feature_value", "float_feature"):
+                    raise NotImplementedError(f"CTR combination element {element['combination_element']} is not supported")
+            for border in ctr.get("borders") or []:
+                binary_features.append(("ctr", i, border))
+        self.ctr_tables = {
+            identifier: self._parse_ctr_table(table)
+            for identifier, table in (model_json.get("ctr_data") or {}).items()
+        }
+
+        # unique split conditions used by the trees
+        split_keys: Dict[tuple, int] = {}
+        tree_splits: List[List[int]] = []
+        for tree in model_json["oblivious_trees"]:
+            ids = []
+            for split in tree["splits"]:
+                if split["split_type"] in ("FloatFeature", "OnlineCtr"):
+                    kind, source, border = binary_features[split["split_index"]]
+                    key = (kind, source, border)
+                elif split["split_type"] == "OneHotFeature":
+                    key = ("onehot", split["cat_feature_index"], split["value"])
+                else:
+                    raise NotImplementedError(f"Split type {split['split_type']} is not supported")
+                ids.append(split_keys.setdefault(key, len(split_keys)))
+            tree_splits.append(ids)
+
+        keys = list(split_keys)
+        self.split_kind = np.array([k[0] for k in keys])
+        self.split_source = np.array([k[1] for k in keys], dtype=np.int64)
+        self.split_border = np.array([k[2] for k in keys], dtype=np.float64)
+        self.n_splits = len(keys)
+
+        # pad trees to the max depth with an always-false split (index n_splits)
+        self.max_depth = max((len(ids) for ids in tree_splits), default=0)
+        self.tree_split_ids = np.full((len(tree_splits), self.max_depth), self.n_splits, dtype=np.int64)
+        for t, ids in enumerate(tree_splits):
+            self.tree_split_ids[t, :len(ids)] = ids
+
+        leaf_values = [np.asarray(tree["leaf_values"], dtype=np.float64) for tree in model_json["oblivious_trees"]]
+        sizes = np.array([len(v) for v in leaf_values], dtype=np.int64)
+        self.leaf_offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.leaf_values = np.concatenate(leaf_values) if leaf_values else np.zeros(0)
+
+        scale, bias = model_json.get("scale_and_bias", [1.0, [0.0]])
+        self.scale = float(scale)
+        self.bias = float(bias[0]) if isinstance(bias, list) else float(bias)
+        self._hash_cache: Dict[str, int] = {}
+        self._ctr_cache: Dict[tuple, float] = {}
+
+    @staticmethod
+    def _parse_ctr_table(table: dict) -> dict:
+        stride = int(table["hash_stride"])
+        flat = table["hash_map"]
+        hashes = [int(h) for h in flat[0::stride]]
+        counts = np.array([flat[i + 1:i + stride] for i in range(0, len(flat), stride)], dtype=np.float64)
+        return {
+            "index": {h: i for i, h in enumerate(hashes) if h != _MASK64},
+            "counts": counts.reshape(len(hashes), stride - 1),
+            "counter_denominator": float(table.get("counter_denominator", 0)),
+        }
+
+    @classmethod
+    def from_json(cls, path: Path, **kwargs) -> "ObliviousTreeEvaluator":
+        with open(path, "r") as f:
+            return cls(json.load(f), **kwargs)
+
+    @classmethod
+    def from_cbm(cls, path: Path, **kwargs) -> "ObliviousTreeEvaluator":
+        """
+        CatBoost is only needed here to export the JSON, evaluation is NumPy
+        """
+        import catboost as cb
+
+        model = cb.CatBoost()
+        model.load_model(str(path))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = Path(tmp_dir) / "model.json"
+            model.save_model(str(json_path), format="json")
+            return cls.from_json(json_path, **kwargs)
+
+    def save(self, path: Path) -> Path:
+        """
+        directory with one .npy per array and the remaining state as JSON, so load() can memory-map the arrays
+        """
+        path = Path(path)
+        path.mkdir(exist_ok=True, parents=True)
+        for name in self.ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        for i, table in enumerate(self.ctr_tables.values()):
+            np.save(path / f"ctr_{i}_hashes.npy", np.array(list(table["index"]), dtype=np.uint64))
+            np.save(path / f"ctr_{i}_rows.npy", np.array(list(table["index"].values()), dtype=np.int64))
+            np.save(path / f"ctr_{i}_counts.npy", table["counts"])
+        state = {
+            "chunk_size": self.chunk_size,
+            "feature_names_": self.feature_names_,
+            "float_feature_names": self.float_feature_names,
+            "cat_feature_names": self.cat_feature_names,
+            "ctrs": self.ctrs,
+            "ctr_tables": [
+                {"identifier": identifier, "counter_denominator": table["counter_denominator"]}
+                for identifier, table in self.ctr_tables.items()
+            ],
+            "n_splits": self.n_splits,
+            "max_depth": self.max_depth,
+            "scale": self.scale,
+            "bias": self.bias,
+        }
+        (path / "state.json").write_text(json.dumps(state))
+        return path
+
+    @classmethod
+    def load(cls, path: Path, mmap_mode: str | None = "r") -> "ObliviousTreeEvaluator":
+        """
+        evaluator saved with save(); arrays are memory-mapped read-only, so processes loading the same model share its pages
+        """
+        path = Path(path)
+        state = json.loads((path / "state.json").read_text())
+        evaluator = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(evaluator, name, np.load(path / f"{name}.npy", mmap_mode=mmap_mode))
+        evaluator.ctr_tables = {
+            table["identifier"]: {
+                "index": dict(zip(
+                    np.load(path / f"ctr_{i}_hashes.npy").tolist(), np.load(path / f"ctr_{i}_rows.npy").tolist()
+                )),
+                "counts": np.load(path / f"ctr_{i}_counts.npy", mmap_mode=mmap_mode),
+                "counter_denominator": table["counter_denominator"],
+            }
+            for i, table in enumerate(state.pop("ctr_tables"))
+        }
+        for name, value in state.items():
+            setattr(evaluator, name, value)
+        evaluator._hash_cache = {}
+        evaluator._ctr_cache = {}
+        return evaluator
+
+    def _hash_values(self, values: np.ndarray) -> np.ndarray:
+        uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+        hashes = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            h = self._hash_cache.get(value)
+            if h is None:
+                h = self._hash_cache[value] = cat_feature_hash(value)
+            hashes[i] = h
+        return hashes[inverse]
+
+    def _ctr_values(self, float_X: np.ndarray, cat_hashes: np.ndarray) -> np.ndarray:
+        values = np.zeros((len(cat_hashes), len(self.ctrs)))
+        for i, ctr in enumerate(self.ctrs):
+            # projection = categorical values (by index), then binarized float features (by index, border)
+            cat_elements = sorted(e["cat_feature_index"] for e in ctr["elements"] if e["combination_element"] == "cat_feature_value")
+            float_elements = sorted(
+                (e["float_feature_index"], e["border"]) for e in ctr["elements"] if e["combination_element"] == "float_feature"
+            )
+            keys = [cat_hashes[:, c] for c in cat_elements]
+            for f, border in float_elements:
+                column = float_X[:, f]
+                keys.append(np.where(np.isnan(column), self.float_nan_as_true[f], column > np.float32(border)).astype(np.int64))
+            combos, inverse = np.unique(np.column_stack(keys), axis=0, return_inverse=True)
+            table = self.ctr_tables[ctr["identifier"]]
+
+            combo_values = np.empty(len(combos))
+            for j, combo in enumerate(combos):
+                cache_key = (i, tuple(combo))
+                if cache_key in self._ctr_cache:
+                    combo_values[j] = self._ctr_cache[cache_key]
+                    continue
+                projection_hash = 0
+                for h in combo:
+                    projection_hash = _combine_hash(projection_hash, int(h))
+                bucket = table["index"].get(projection_hash)
+                counts = table["counts"][bucket] if bucket is not None else np.zeros(table["counts"].shape[1])
+
+                ctr_type = ctr["ctr_type"]
+                if ctr_type == "Borders":
+                    border_idx = ctr.get("target_border_idx", 0)
+                    good, total = counts[border_idx + 1:].sum(), counts.sum()
+                elif ctr_type == "Buckets":
+                    good, total = counts[ctr.get("target_border_idx", 0)], counts.sum()
+                elif ctr_type in ("Counter", "FeatureFreq"):
+                    good, total = counts[0], table["counter_denominator"]
+                else:
+                    raise NotImplementedError(f"CTR type {ctr_type} is not supported")
+                ctr_value = (good + ctr["prior_numerator"]) / (total + ctr["prior_denomerator"])
+                combo_values[j] = self._ctr_cache[cache_key] = (ctr_value + ctr["shift"]) * ctr["scale"]
+
+            values[:, i] = combo_values[inverse.ravel()]
+        return values
+
+    def _split_bits(self, float_X: np.ndarray, cat_hashes: np.ndarray) -> np.ndarray:
+        # last column stays False, it pads trees shallower than max_depth
+        padded_bits = np.zeros((len(float_X), self.n_splits + 1), dtype=bool)
+        bits = padded_bits[:, :self.n_splits]
+
+        is_float = self.split_kind == "float"
+        if is_float.any():
+            src = self.split_source[is_float]
+            column = float_X[:, src]
+            borders = self.split_border[is_float].astype(np.float32)
+            bits[:, is_float] = np.where(np.isnan(column), self.float_nan_as_true[src], column > borders)
+
+        is_ctr = self.split_kind == "ctr"
+        if is_ctr.any():
+            ctr_values = self._ctr_values(float_X, cat_hashes)
+            bits[:, is_ctr] = ctr_values[:, self.split_source[is_ctr]] > self.split_border[is_ctr]
+
+        is_onehot = self.split_kind == "onehot"
+        if is_onehot.any():
+            bits[:, is_onehot] = cat_hashes[:, self.split_source[is_onehot]] == self.split_border[is_onehot].astype(np.int64)
+
+        return padded_bits
+
+    def _predict_chunk(self, float_X: np.ndarray, cat_hashes: np.ndarray) -> np.ndarray:
+        # split-major bits so each depth level gathers contiguous rows
+        bits = np.ascontiguousarray(self._split_bits(float_X, cat_hashes).T)
+        leaf_index = np.zeros((len(self.tree_split_ids), len(float_X)), dtype=np.int32)
+        for depth in range(self.max_depth):
+            leaf_index |= bits[self.tree_split_ids[:, depth]].astype(np.int32) << depth
+        return self.leaf_values[self.leaf_offsets[:, None] + leaf_index].sum(axis=0)
+
+    def predict(self, X) -> np.ndarray:
+        """
+        X: DataFrame with the training columns (any order) or an array in feature_names_ order
+        """
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X, columns=self.feature_names_)
+        float_X = X[self.float_feature_names].to_numpy(dtype=np.float32)
+        cat_hashes = (
+            np.column_stack([self._hash_values(X[c].to_numpy()) for c in self.cat_feature_names])
+            if self.cat_feature_names else np.zeros((len(X), 0), dtype=np.int64)
+        )
+
+        raw = np.empty(len(X))
+        for start in range(0, len(X), self.chunk_size):
+            end = start + self.chunk_size
+            raw[start:end] = self._predict_chunk(float_X[start:end], cat_hashes[start:end])
+        return self.scale * raw + self.bias
+
+
+def _benchmark(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(argv=None):
+    # check against CatBoost and compare single-row / batched latency
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, required=True, help="Path to a saved .cbm model")
+    parser.add_argument("--features", type=str, required=True, help="Path to a features CSV")
+    parser.add_argument("--batch-size", type=int, default=300, help="Rows per batched call")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    import catboost as cb
+
+    model = cb.CatBoost()
+    model.load_model(args.model)
+    evaluator = ObliviousTreeEvaluator.from_cbm(args.model)
+
+    df = pd.read_csv(args.features)
+    cat_features = evaluator.cat_feature_names
+    df[cat_features] = df[cat_features].fillna("").astype(str)
+    X = df.reindex(columns=evaluator.feature_names_)
+
+    expected = model.predict(cb.Pool(X, cat_features=cat_features))
+    actual = evaluator.predict(X)
+    print(f"max |catboost - numpy| over {len(X)} rows: {np.abs(expected - actual).max():.3e}")
+
+    single = X.iloc[:1]
+    batch = X.iloc[:args.batch_size]
+    print(f"{'call':<10}{'catboost (Pool + predict) ms':>30}{'numpy ms':>12}")
+    for name, rows in [("single", single), (f"batch {len(batch)}", batch)]:
+        cb_ms = _benchmark(lambda: model.predict(cb.Pool(rows, cat_features=cat_features)), args.repeats)
+        np_ms = _benchmark(lambda: evaluator.predict(rows), args.repeats)
+        print(f"{name:<10}{cb_ms:>30.3f}{np_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from src.data.data_processing import DataProcessor
+from src.features.spatial_neighbors import neighbor_aggregator
+from src.models.registry import csv_feature_columns
+from src.models.utils import advance_features, last_observed, to_model_input
+from src.utils import load_config
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+FIELDS = ["ConfirmedCases", "Fatalities"]
+
+
+def multi_quantile_loss(quantiles: List[float]) -> str:
+    """
+    CatBoost loss of one model predicting all quantile levels (one tree ensemble, one predict call)
+    """
+    return "MultiQuantile:alpha=" + ",".join(f"{q:g}" for q in quantiles)
+
+
+def quantile_column(field: str, q: float) -> str:
+    return f"{field}_q{q:g}"
+
+
+def load_quantile_models(model_dir: Path, model_key: str) -> Dict[str, Any]:
+    """
+    models/{model_key}_quantile_{target}.cbm saved by train_model (probabilistic.enabled)
+    """
+    import catboost as cb
+
+    models = {}
+    for target in TARGETS:
+        model_path = Path(model_dir) / f"{model_key}_quantile_{target}.cbm"
+        if not model_path.exists():
+            raise FileNotFoundError(f"Quantile model not found: {model_path}, train with probabilistic.enabled: true")
+        model = cb.CatBoost()
+        model.load_model(str(model_path))
+        models[target] = model
+    return models
+
+
+def sample_quantile(levels: np.ndarray, quantiles: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """
+    inverse CDF at u of every row given its predicted quantiles [n, Q] at levels [Q]:
+    piecewise linear between levels, linear extrapolation of the outer segments in the tails
+    """
+    levels = np.asarray(levels, dtype=float)
+    quantiles = np.sort(quantiles, axis=1)   # independent quantile heads may cross
+    j = np.clip(np.searchsorted(levels, u), 1, len(levels) - 1)
+    rows = np.arange(len(quantiles))
+    low, high = quantiles[rows, j - 1], quantiles[rows, j]
+    return low + (u - levels[j - 1]) / (levels[j] - levels[j - 1]) * (high - low)
+
+
+def sample_paths(
+    models, levels,
+    last_features_df, last_log_new, last_cumulative,
+    horizon, cat_features,
+    n_paths: int = 200,
+    output_quantiles=(0.05, 0.5, 0.95),
+    rho: float = 0.5,
+    seed: int = 42,
+    neighbors=None
+) -> Dict[str, np.ndarray]:
+    """
+    Monte Carlo trajectories of the recursive forecast: the n_paths copies of every row are stacked into one
+    [n_paths x rows, features] frame, so every day is one predict call per target for all paths, and each path
+    feeds its own sampled LogNew* values into its lags. A path keeps its quantile level correlated over days
+    (AR(1) normal scores with coefficient rho).
+
+    last_log_new / last_cumulative: {'ConfirmedCases': array, 'Fatalities': array} of the last observed day
+    neighbors: NeighborAggregator.for_rows of the stacked rows when the models use SpatialNeighborFeatures
+    returns {'ConfirmedCases' / 'Fatalities': array [horizon, len(output_quantiles), n_rows]} of the cumulative values
+    """
+    n_rows = len(last_features_df)
+    rng = np.random.default_rng(seed)
+    features_df = pd.concat([last_features_df] * n_paths, ignore_index=True)
+    log_new = {'LogNew' + field: np.tile(np.asarray(last_log_new[field], dtype=float), n_paths) for field in FIELDS}
+    cumulative = {field: np.tile(np.asarray(last_cumulative[field], dtype=float), n_paths) for field in FIELDS}
+    scores = {field: rng.standard_normal(n_paths * n_rows) for field in FIELDS}
+
+    out = {field: np.zeros((horizon, len(output_quantiles), n_rows)) for field in FIELDS}
+    for h in range(horizon):
+        features_df = advance_features(features_df, log_new, neighbors)
+        pool = to_model_input(models, features_df, cat_features)
+        for field in FIELDS:
+            if h > 0:
+                scores[field] = rho * scores[field] + np.sqrt(1.0 - rho ** 2) * rng.standard_normal(n_paths * n_rows)
+            predicted = np.asarray(models['LogNew' + field].predict(pool)).reshape(n_paths * n_rows, -1)
+            log_new['LogNew' + field] = np.maximum(sample_quantile(levels, predicted, ndtr(scores[field])), 0.0)
+            cumulative[field] = cumulative[field] + np.rint(np.expm1(log_new['LogNew' + field]))
+            out[field][h] = np.quantile(cumulative[field].reshape(n_paths, n_rows), output_quantiles, axis=0)
+    return out
+
+
+def quantile_frame(last_rows: pd.DataFrame, out: Dict[str, np.ndarray], output_quantiles, horizon: int) -> pd.DataFrame:
+    """
+    long frame: location, Date and one column per field and output quantile, rows ordered by location and date
+    """
+    last_dates = last_rows["Date"].to_numpy(dtype="datetime64[ns]")
+    result = pd.DataFrame({
+        "Country/Region": np.repeat(last_rows["Country/Region"].to_numpy(), horizon),
+        "Province/State": np.repeat(last_rows["Province/State"].to_numpy(), horizon),
+        "Date": (last_dates[:, None] + np.arange(1, horizon + 1) * np.timedelta64(1, "D")).ravel(),
+    })
+    for field in FIELDS:
+        # [horizon, quantile, location] -> rows ordered by location, date
+        for k, q in enumerate(output_quantiles):
+            result[quantile_column(field, q)] = out[field][:, k, :].T.ravel()
+    return result
+
+
+def interval_scores(forecast: pd.DataFrame, actual: pd.DataFrame, output_quantiles) -> pd.DataFrame:
+    """
+    per field: coverage of the outermost central interval, mean pinball loss (log1p scale) per quantile
+    and RMSLE of the median (when 0.5 is an output quantile)
+    """
+    merged = forecast.merge(actual[LOCATION_COLUMNS + ["Date"] + FIELDS], how="inner", on=LOCATION_COLUMNS + ["Date"])
+    low, high = min(output_quantiles), max(output_quantiles)
+    rows = []
+    for field in FIELDS:
+        y = np.log1p(merged[field].to_numpy(dtype=float))
+        row = {
+            "field": field,
+            "n": len(merged),
+            f"coverage_{high - low:g}": float(np.mean(
+                (merged[quantile_column(field, low)] <= merged[field]) & (merged[field] <= merged[quantile_column(field, high)])
+            )),
+        }
+        for q in output_quantiles:
+            error = y - np.log1p(merged[quantile_column(field, q)].to_numpy(dtype=float))
+            row[f"pinball_q{q:g}"] = float(np.mean(np.maximum(q * error, (q - 1) * error)))
+        if 0.5 in output_quantiles:
+            row["RMSLE_median"] = float(np.sqrt(np.mean((np.log1p(merged[quantile_column(field, 0.5)].to_numpy(dtype=float)) - y) ** 2)))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=str, default=None, help="Path to precomputed features CSV (default: from config)")
+    parser.add_argument("--horizon", type=int, default=None, help="Days to forecast (default: from config)")
+    parser.add_argument("--paths", type=int, default=None, help="Monte Carlo paths per location (default: from config)")
+    parser.add_argument("--save-file", type=str, default=None, help="Path to save quantile forecasts CSV (default: from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    cfg = load_config()
+    prob_cfg = cfg.get("probabilistic", {}) or {}
+    horizon = args.horizon if args.horizon is not None else prob_cfg.get("horizon", 30)
+    n_paths = args.paths if args.paths is not None else prob_cfg.get("n_paths", 200)
+    output_quantiles = prob_cfg.get("output_quantiles", [0.05, 0.5, 0.95])
+    save_path = Path(args.save_file if args.save_file is not None else prob_cfg["save_file"])
+    features_path = args.features or Path(cfg["features"]["save_df_dir"]) / cfg["features"]["save_filename"]
+    cat_features = cfg["test"].get("cat_features", [])
+
+    models = load_quantile_models(cfg["train"]["save_model_dir"], cfg["train"]["model"])
+    missing = sorted(set(models[TARGETS[0]].feature_names_) - set(csv_feature_columns(features_path)))
+    if missing:
+        raise KeyError(f"Features CSV lacks columns of the quantile models: {missing}")
+    features_df = pd.read_csv(features_path, parse_dates=["Date"])
+    features_df[LOCATION_COLUMNS] = features_df[LOCATION_COLUMNS].fillna("")
+
+    last_rows = last_observed(features_df, LOCATION_COLUMNS).reset_index(drop=True)
+    features, _ = DataProcessor(cfg).preprocess_df(last_rows)
+    features = features.reindex(columns=models[TARGETS[0]].feature_names_)
+    aggregator = neighbor_aggregator(cfg, last_rows)
+    neighbors = aggregator.for_rows(np.tile(aggregator.codes(last_rows), n_paths)) if aggregator is not None else None
+
+    start = time.perf_counter()
+    out = sample_paths(
+        models, prob_cfg.get("quantiles", [0.05, 0.25, 0.5, 0.75, 0.95]),
+        features,
+        {field: last_rows["LogNew" + field].to_numpy(dtype=float) for field in FIELDS},
+        {field: last_rows[field].to_numpy(dtype=float) for field in FIELDS},
+        horizon, cat_features,
+        n_paths=n_paths,
+        output_quantiles=output_quantiles,
+        rho=prob_cfg.get("rho", 0.5),
+        seed=cfg.get("seed", 42),
+        neighbors=neighbors
+    )
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"{n_paths} paths x {len(last_rows)} locations x {horizon} days in {elapsed:.2f}s "
+        f"({n_paths * len(last_rows) * horizon / elapsed:.0f} path-days/s)"
+    )
+
+    result = quantile_frame(last_rows, out, output_quantiles, horizon)
+    print(result[result["Date"] == result["Date"].max()].head(10).to_string(index=False))
+
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    result.to_csv(save_path, index=False)
+    logging.info(f"Quantile forecasts saved to {save_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import pandas as pd
+
+from src.data.data_processing import DROP_COLS
+from src.features.manifest import load_feature_manifest
+from src.models.ensemble import MODEL_FILE_EXTENSIONS, load_ensemble, load_member
+from src.utils import load_config
+
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+DEFAULT_ALIAS = "latest"
+
+# (version dir, evaluator) -> models; versions are immutable, so every consumer of a process shares one load.
+# Only the versions held by aliases (and the one loaded last) stay cached, so hot swaps do not accumulate model sets
+_LOADED: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_LOADED_LOCK = threading.Lock()
+
+
+class SchemaMismatchError(ValueError):
+    pass
+
+
+def _hash(payload) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def schema_hash(feature_names: List[str], cat_features: List[str]) -> str:
+    """
+    hash of the ordered model input columns and their kind (categorical / numeric)
+    """
+    return _hash([[c, "cat" if c in cat_features else "num"] for c in feature_names])
+
+
+def feature_config_hash(cfg: dict) -> str:
+    """
+    hash of the feature pipeline in config (enabled features, their params, the data quality repair),
+    comparable before any feature is built (and the pruned feature manifest when applied)
+    """
+    enabled = cfg.get("features_to_apply", []) or []
+    params = cfg.get("feature_params", {}) or {}
+    payload = {
+        "features_to_apply": enabled,
+        "feature_params": {name: params.get(name) for name in enabled},
+        "repair": (cfg.get("data_quality") or {}).get("repair", "cummax"),
+    }
+    manifest = load_feature_manifest(cfg)
+    if manifest is not None:
+        payload["feature_manifest"] = manifest["features"]
+    return _hash(payload)
+
+
+def model_version(model_dir: Path, model_key: str) -> str:
+    """
+    short content hash of the model files (single model or ensemble members + manifest), used in cache keys
+    """
+    digest = hashlib.sha1()
+    for path in sorted(Path(model_dir).glob(f"{model_key}_*")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def model_files(model_dir: Path, model_key: str) -> Dict[str, Any]:
+    """
+    files of the recursive models saved by train_model: {"type": "Ensemble", "ensemble": manifest, "files": [...]}
+    or {"type": model type, "files": {target: file name}}
+    """
+    model_dir = Path(model_dir)
+    manifest_path = model_dir / f"{model_key}_ensemble.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        members = [name for member in manifest["members"] for name in member["files"].values()]
+        return {"type": "Ensemble", "ensemble": manifest_path.name, "files": [manifest_path.name] + members}
+
+    for model_type, extension in MODEL_FILE_EXTENSIONS.items():
+        files = {target: f"{model_key}_{target}.{extension}" for target in TARGETS}
+        if all((model_dir / name).exists() for name in files.values()):
+            return {"type": model_type, "files": files}
+    raise FileNotFoundError(f"No saved models of {model_key} in {model_dir}")
+
+
+def csv_feature_columns(features_path: Path) -> List[str]:
+    """
+    model input columns of a features CSV, from its header only
+    """
+    return [c for c in pd.read_csv(features_path, nrows=0).columns if c not in DROP_COLS]
+
+
+def check_schema(manifest: dict, feature_columns: List[str] | None = None, cfg: dict | None = None):
+    """
+    feature_columns: model input columns a consumer will provide (e.g. from the header of a features CSV),
+    cfg: config of a consumer that builds features itself. Raises SchemaMismatchError before any feature is built.
+    """
+    if feature_columns is not None:
+        if schema_hash(list(feature_columns), manifest["cat_features"]) != manifest["schema_hash"]:
+            missing = sorted(set(manifest["feature_names"]) - set(feature_columns))
+            extra = sorted(set(feature_columns) - set(manifest["feature_names"]))
+            if missing or extra:
+                raise SchemaMismatchError(
+                    f"Features do not match model {manifest['model_key']} {manifest['version']}: missing {missing}, unexpected {extra}"
+                )
+            # same columns in another order are reindexed by the consumers
+    if cfg is not None and manifest.get("feature_config_hash") not in (None, feature_config_hash(cfg)):
+        raise SchemaMismatchError(
+            f"Feature pipeline in config differs from the one model {manifest['model_key']} {manifest['version']} was trained with"
+        )
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts:
+
+      <root>/<model_key>/<version>/   model files (as saved by train_model) + manifest.json
+      <root>/<model_key>/aliases.json {alias: version}, e.g. latest, prod
+
+    A version is immutable once registered, aliases are moved with an atomic file replace.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def versions(self, model_key: str) -> List[str]:
+        model_root = self.root / model_key
+        if not model_root.exists():
+            return []
+        return sorted(p.name for p in model_root.iterdir() if (p / "manifest.json").exists())
+
+    def aliases(self, model_key: str) -> Dict[str, str]:
+        path = self.root / model_key / "aliases.json"
+        return json.loads(path.read_text()) if path.exists() else {}
+
+    def resolve(self, model_key: str, ref: str = DEFAULT_ALIAS) -> str:
+        """
+        version name of a version or alias
+        """
+        if ref in self.versions(model_key):
+            return ref
+        aliases = self.aliases(model_key)
+        if ref not in aliases:
+            raise KeyError(f"Unknown version or alias '{ref}' of {model_key} in {self.root}")
+        return aliases[ref]
+
+    def manifest(self, model_key: str, ref: str = DEFAULT_ALIAS) -> dict:
+        return json.loads((self.root / model_key / self.resolve(model_key, ref) / "manifest.json").read_text())
+
+    def set_alias(self, model_key: str, alias: str, ref: str):
+        version = self.resolve(model_key, ref)
+        aliases = {**self.aliases(model_key), alias: version}
+        path = self.root / model_key / "aliases.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(aliases, indent=2))
+        os.replace(tmp_path, path)
+
+    def register(self, model_key: str, model_dir: Path, info: dict, aliases=(DEFAULT_ALIAS,)) -> str:
+        """
+        copy the saved models of model_key into a new version; info: manifest fields such as
+        feature_names, cat_features, params, split dates and metrics
+        """
+        model_dir = Path(model_dir)
+        files = model_files(model_dir, model_key)
+        names = files["files"] if files["type"] == "Ensemble" else list(files["files"].values())
+
+        model_root = self.root / model_key
+        model_root.mkdir(exist_ok=True, parents=True)
+        tmp_dir = model_root / f".{datetime.now().strftime('%Y%m%d%H%M%S%f')}.tmp"
+        tmp_dir.mkdir()
+        for name in names:
+            shutil.copy2(model_dir / name, tmp_dir / name)
+        self._export_numpy(tmp_dir, names)
+
+        # claim the next version name, renaming the finished directory makes it visible at once
+        while True:
+            versions = self.versions(model_key)
+            version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+            manifest = {
+                **info,
+                "model_key": model_key,
+                "version": version,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                **files,
+                "schema_hash": schema_hash(info["feature_names"], info["cat_features"]),
+            }
+            (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2, default=str))
+            try:
+                tmp_dir.rename(model_root / version)
+                break
+            except OSError as e:
+                # another process claimed the version first, anything else is a real failure
+                if e.errno in (errno.EEXIST, errno.ENOTEMPTY):
+                    continue
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+        for alias in aliases:
+            self.set_alias(model_key, alias, version)
+        return version
+
+    @staticmethod
+    def _export_numpy(version_dir: Path, names: List[str]):
+        """
+        NumPy evaluator arrays of every CatBoost file, loaded memory-mapped with evaluator: numpy
+        """
+        from src.models.oblivious_trees import ObliviousTreeEvaluator
+        for name in names:
+            if not name.endswith(".cbm"):
+                continue
+            try:
+                ObliviousTreeEvaluator.from_cbm(version_dir / name).save(version_dir / f"{name}.numpy")
+            except NotImplementedError as e:
+                logging.warning(f"{name} is not exported for the NumPy evaluator: {e}")
+
+    def load(
+        self, model_key: str, ref: str = DEFAULT_ALIAS, evaluator: str = "catboost",
+        feature_columns: List[str] | None = None, cfg: dict | None = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        (version, target -> model); the schema is checked before loading, loaded versions are cached per process
+        """
+        manifest = self.manifest(model_key, ref)
+        check_schema(manifest, feature_columns, cfg)
+        version_dir = self.root / model_key / manifest["version"]
+
+        key = (str(version_dir.resolve()), evaluator)
+        model_root = version_dir.parent.resolve()
+        keep = {str(model_root / version) for version in [*self.aliases(model_key).values(), manifest["version"]]}
+        with _LOADED_LOCK:
+            for cached in [k for k in _LOADED if Path(k[0]).parent == model_root and k[0] not in keep]:
+                del _LOADED[cached]
+            if key not in _LOADED:
+                if manifest["type"] == "Ensemble":
+                    _LOADED[key] = load_ensemble(version_dir / manifest["ensemble"], TARGETS, evaluator)
+                else:
+                    _LOADED[key] = {
+                        target: load_member(manifest["type"], version_dir / name, evaluator)
+                        for target, name in manifest["files"].items()
+                    }
+            return manifest["version"], _LOADED[key]
+
+
+def load_configured_models(cfg: dict, feature_columns: List[str] | None = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    (version, models) of test.model_version (version or alias) from the registry;
+    falls back to the files in train.save_model_dir when the registry is not configured or empty.
+    feature_columns: checked against the model schema, otherwise the feature pipeline in cfg is
+    """
+    from src.models.inference import load_models
+
+    model_key = cfg["train"]["model"]
+    model_dir = Path(cfg["train"]["save_model_dir"])
+    evaluator = cfg["test"].get("evaluator", "catboost")
+    registry_dir = (cfg.get("registry") or {}).get("dir")
+    ref = cfg["test"].get("model_version")
+
+    if registry_dir and ref is not None:
+        registry = ModelRegistry(registry_dir)
+        if registry.versions(model_key):
+            return registry.load(model_key, ref, evaluator, feature_columns, cfg if feature_columns is None else None)
+        logging.warning(f"No registered versions of {model_key} in {registry_dir}, loading models from {model_dir}")
+    return model_version(model_dir, model_key), load_models(model_dir, model_key, evaluator)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", choices=["list", "alias"], help="list versions, or point an alias at a version")
+    parser.add_argument("--model", type=str, default=None, help="Model key (default: train.model in config)")
+    parser.add_argument("--alias", type=str, default="prod", help="Alias to set")
+    parser.add_argument("--version", type=str, default=DEFAULT_ALIAS, help="Version or alias the alias points to")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    registry = ModelRegistry(cfg["registry"]["dir"])
+    model_key = args.model or cfg["train"]["model"]
+
+    if args.action == "alias":
+        registry.set_alias(model_key, args.alias, args.version)
+
+    aliases = registry.aliases(model_key)
+    for version in registry.versions(model_key):
+        manifest = registry.manifest(model_key, version)
+        names = ", ".join(alias for alias, target in aliases.items() if target == version)
+        metrics = {m["mode"]: round(m["RMSLE_ConfirmedCases"], 4) for m in manifest.get("metrics", [])}
+        print(f"{version}  {manifest['created']}  schema {manifest['schema_hash']}  RMSLE_ConfirmedCases {metrics}  {names}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.data.data_processing import DataProcessor
+from src.features.main import FEATURE_REGISTRY
+from src.features.spatial_neighbors import neighbor_aggregator
+from src.models.inference import TARGETS
+from src.models.registry import csv_feature_columns, load_configured_models
+from src.models.utils import last_observed, recursive_forecast
+from src.utils import load_config
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+BASELINE = "baseline"
+
+
+def is_dynamic(column: str) -> bool:
+    """
+    columns moved forward by advance_features every forecast day; everything else is static per location
+    """
+    return "_prev_day_" in column or column in ("Day", "WeekDay") or column.startswith("Days_since_")
+
+
+class ScenarioForecaster:
+    """
+    What-if forecasts over the static columns (e.g. CountryHospitalBedsRate, CountryHealthExpenditurePerCapitaPPP,
+    CountryPopDensity, Distance_to_origin). The baseline and K perturbed copies of the last observed day are stacked
+    into one frame, so every forecast day is one predict call for all (K + 1) x locations rows.
+
+    scenario spec: {column: {"set": v} | {"scale": f} | {"add": d}, "countries": [...] (optional, default all)}
+    Distance_to_origin also takes {"origin": [lat, long]} or {"origin_province": name} to move the outbreak origin.
+    """
+    def __init__(self, cfg: dict, models: Dict[str, Any], features_df: pd.DataFrame):
+        self.models = models
+        self.cat_features = cfg["test"].get("cat_features", [])
+
+        self.last_rows = last_observed(features_df, LOCATION_COLUMNS).reset_index(drop=True)
+        features, _ = DataProcessor(cfg).preprocess_df(self.last_rows)
+        self.features = features.reindex(columns=models[TARGETS[0]].feature_names_)
+        self.neighbors = neighbor_aggregator(cfg, self.last_rows)
+
+    def _origin_distance(self, op: dict, mask: np.ndarray) -> np.ndarray:
+        distance = FEATURE_REGISTRY["DistanceToOriginFeatures"]
+        if "origin" in op:
+            coords = tuple(op["origin"])
+        else:
+            coords = distance(op["origin_province"])._get_origin_coords(self.last_rows)
+        return distance(origin_coords=coords)._add_distance(self.last_rows[mask], coords)["Distance_to_origin"].to_numpy()
+
+    def apply(self, spec: dict) -> pd.DataFrame:
+        """
+        perturbed copy of the last-day features
+        """
+        features = self.features.copy()
+        countries = spec.get("countries")
+        mask = self.last_rows["Country/Region"].isin(countries).to_numpy() if countries else np.ones(len(features), dtype=bool)
+
+        for column, op in spec.items():
+            if column == "countries":
+                continue
+            if column not in features.columns:
+                raise KeyError(f"Scenario column '{column}' is not a model feature")
+            if is_dynamic(column) or column in self.cat_features:
+                raise ValueError(f"Scenario column '{column}' is not a static numeric feature")
+
+            values = features[column].to_numpy(dtype=float).copy()
+            if "set" in op:
+                values[mask] = op["set"]
+            elif "scale" in op:
+                values[mask] *= op["scale"]
+            elif "add" in op:
+                values[mask] += op["add"]
+            elif column == "Distance_to_origin" and ("origin" in op or "origin_province" in op):
+                values[mask] = self._origin_distance(op, mask)
+            else:
+                raise ValueError(f"Unknown scenario operation {op} for '{column}'")
+            features[column] = values
+        return features
+
+    @staticmethod
+    def scenario_names(scenarios: Dict[str, dict]) -> List[str]:
+        """
+        stacked scenarios: the baseline first (a `baseline` definition is ignored), then the definitions
+        """
+        return [BASELINE] + [name for name in scenarios if name != BASELINE]
+
+    def forecast(self, scenarios: Dict[str, dict], horizon: int) -> pd.DataFrame:
+        """
+        long frame: scenario, location, Date, ConfirmedCases, Fatalities and the difference to the baseline
+        """
+        names = self.scenario_names(scenarios)
+        n_locations = len(self.features)
+        stacked = pd.concat(
+            [self.features] + [self.apply(scenarios[name]) for name in names[1:]], ignore_index=True
+        )
+
+        # every scenario starts from the same observed history, neighbor lags stay within a scenario
+        neighbors = None
+        if self.neighbors is not None:
+            neighbors = self.neighbors.for_rows(np.tile(self.neighbors.codes(self.last_rows), len(names)))
+        out = recursive_forecast(
+            self.models,
+            stacked,
+            {field: np.tile(self.last_rows["LogNew" + field].to_numpy(dtype=float), len(names)) for field in ["ConfirmedCases", "Fatalities"]},
+            {field: np.tile(self.last_rows[field].to_numpy(dtype=float), len(names)) for field in ["ConfirmedCases", "Fatalities"]},
+            horizon,
+            self.cat_features,
+            neighbors
+        )
+
+        # [horizon, scenario, location] -> rows ordered by scenario, location, date
+        shape = (horizon, len(names), n_locations)
+        last_dates = self.last_rows["Date"].to_numpy(dtype="datetime64[ns]")
+        result = pd.DataFrame({
+            "scenario": np.repeat(names, n_locations * horizon),
+            "Country/Region": np.tile(np.repeat(self.last_rows["Country/Region"].to_numpy(), horizon), len(names)),
+            "Province/State": np.tile(np.repeat(self.last_rows["Province/State"].to_numpy(), horizon), len(names)),
+            "Date": np.tile((last_dates[:, None] + np.arange(1, horizon + 1) * np.timedelta64(1, "D")).ravel(), len(names)),
+        })
+        for field in ["ConfirmedCases", "Fatalities"]:
+            values = out[field].reshape(shape)
+            result[field] = values.transpose(1, 2, 0).ravel()
+            result[field + "Delta"] = (values - values[:, :1]).transpose(1, 2, 0).ravel()
+        return result
+
+
+def summarize(result: pd.DataFrame) -> pd.DataFrame:
+    """
+    global totals on the last forecast day per scenario
+    """
+    last_day = result[result["Date"] == result.groupby(LOCATION_COLUMNS)["Date"].transform("max")]
+    return last_day.groupby("scenario", sort=False)[["ConfirmedCases", "Fatalities", "ConfirmedCasesDelta", "FatalitiesDelta"]].sum()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=str, default=None, help="Path to precomputed features CSV (default: from config)")
+    parser.add_argument("--scenarios", type=str, default=None, help="YAML file of scenario definitions (default: from config)")
+    parser.add_argument("--horizon", type=int, default=None, help="Days to forecast (default: from config)")
+    parser.add_argument("--save-file", type=str, default=None, help="Path to save scenario forecasts CSV (default: from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    cfg = load_config()
+    scenario_cfg = cfg.get("scenarios", {}) or {}
+    if args.scenarios is not None:
+        with open(args.scenarios, "r") as f:
+            definitions = yaml.safe_load(f)
+    else:
+        definitions = scenario_cfg.get("definitions", {}) or {}
+    horizon = args.horizon if args.horizon is not None else scenario_cfg.get("horizon", 30)
+    save_path = Path(args.save_file if args.save_file is not None else scenario_cfg["save_file"])
+    features_path = args.features or Path(cfg["features"]["save_df_dir"]) / cfg["features"]["save_filename"]
+
+    version, models = load_configured_models(cfg, csv_feature_columns(features_path))
+    logging.info(f"Loaded {cfg['train']['model']} {version}")
+    features_df = pd.read_csv(features_path, parse_dates=["Date"])
+    features_df[LOCATION_COLUMNS] = features_df[LOCATION_COLUMNS].fillna("")
+
+    forecaster = ScenarioForecaster(cfg, models, features_df)
+    start = time.perf_counter()
+    result = forecaster.forecast(definitions, horizon)
+    elapsed = time.perf_counter() - start
+    n_scenarios = len(forecaster.scenario_names(definitions))
+    logging.info(
+        f"{n_scenarios} scenarios x {len(forecaster.features)} locations x {horizon} days in {elapsed:.2f}s "
+        f"({n_scenarios * len(forecaster.features) * horizon / elapsed:.0f} location-days/s)"
+    )
+    print(summarize(result))
+
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    result.to_csv(save_path, index=False)
+    logging.info(f"Scenario forecasts saved to {save_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,50 @@
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, List, Type
 import argparse
 import yaml
-import catboost as cb
-import lightgbm as lgb
-import xgboost as xgb
-import joblib
 
-from src.data.load_dataset import CovidDataLoader
+from src.data.load_dataset import data_loader
 from src.data.data_processing import DataProcessor
+from src.data.forecast_store import ForecastStore
 from src.features.main import FeatureExtraction, FEATURE_REGISTRY
-from src.models.utils import predict_for_dataset
+from src.features.manifest import load_feature_manifest
+from src.features.spatial_neighbors import neighbor_aggregator
+from src.models.utils import forecast_from_origin, numeric_features
+from src.models.evaluation import ForecastEvaluator, save_evaluation
+from src.models.ensemble import (
+    EnsembleModel, SharedInputs, fit_weights, save_member, save_manifest, training_categories
+)
+from src.models.hierarchy import LocationHierarchy, ROLLUP_COLUMNS, reconcile_method
+from src.models.registry import ModelRegistry, feature_config_hash
+from src.models.probabilistic import (
+    interval_scores, multi_quantile_loss, quantile_frame, sample_paths
+)
+from src.models.direct import (
+    DirectModel, add_origin_features, make_direct_dataset, predict_direct_for_dataset
+)
+from src.utils import load_config, LazyRegistry
+from src import telemetry
 
-# model registry
-MODEL_REGISTRY = {
-    "CatBoostRegressor": cb.CatBoostRegressor,
-    "LGBMRegressor": lgb.LGBMRegressor,
-    "XGBRegressor": xgb.XGBRegressor,
+# model registry (backends are imported only when the model type is selected)
+MODEL_REGISTRY = LazyRegistry({
+    "CatBoostRegressor": "catboost:CatBoostRegressor",
+    "LGBMRegressor": "lightgbm:LGBMRegressor",
+    "XGBRegressor": "xgboost:XGBRegressor",
+})
+
+# seed parameter name per model type (ensembles over seeds)
+SEED_PARAMS = {
+    "CatBoostRegressor": "random_seed",
+    "LGBMRegressor": "random_state",
+    "XGBRegressor": "random_state",
 }
 
 def setup_logger(log_dir: Path, model_name: str, params: dict) -> Path:
@@ -42,15 +65,240 @@ def setup_logger(log_dir: Path, model_name: str, params: dict) -> Path:
     logging.info(f"Model params:\n{yaml.dump(params)}")
     return log_file
 
+def eval_history(model, model_type: str) -> Dict[str, Dict[str, list]]:
+    """
+    per-iteration losses recorded by the booster during fit: {dataset: {metric: [loss per iteration]}}
+    """
+    if model_type == "CatBoostRegressor":
+        return model.get_evals_result()
+    if model_type == "LGBMRegressor":
+        return model.evals_result_
+    if model_type == "XGBRegressor":
+        return model.evals_result()
+    return {}
+
+def log_fit(model, model_type: str, tag: str, fit_sec: float, feature_names: List[str]):
+    """
+    loss curves, iterations per second and a feature importance snapshot of a fitted model to the telemetry writer;
+    read from the model after fit, nothing runs inside the boosting loop
+    """
+    writer = telemetry.writer()
+    n_iterations = 0
+    for dataset, metrics in eval_history(model, model_type).items():
+        for metric, losses in metrics.items():
+            n_iterations = max(n_iterations, len(losses))
+            for i, loss in enumerate(losses):
+                writer.add_scalar(f"train/{tag}/{dataset}/{metric}", loss, i)
+    writer.add_scalars({
+        f"train/{tag}/fit_seconds": fit_sec,
+        f"train/{tag}/iterations_per_sec": n_iterations / max(fit_sec, 1e-9),
+    })
+    importances = getattr(model, "feature_importances_", None)
+    if importances is not None:
+        writer.add_scalars({f"importance/{tag}/{name}": value for name, value in zip(feature_names, importances)})
+
+def fit_model(
+    model_cls, model_type: str, params: dict, train_X, train_y, eval_X, eval_y, cat_features,
+    verbose: bool = True, tag: str | None = None, write_files: bool = True, train_dir: str = ""
+):
+    """
+    write_files=False for secondary fits (direct / ensemble / quantile models, backtest folds, feature selection):
+    CatBoost then writes no learn_error.tsv / catboost_training.json / events files, which concurrent fits would
+    otherwise share; train_dir is where the others write them (the cwd by default)
+    """
+    start = time.perf_counter()
+    if model_type == "CatBoostRegressor":
+        model = model_cls(
+            **params,
+            logging_level="Verbose" if verbose else "Silent",
+            train_dir=train_dir,
+            allow_writing_files=write_files
+        )
+        model.fit(
+            train_X, train_y,
+            eval_set=(eval_X, eval_y) if eval_X is not None else None,
+            cat_features=cat_features,
+            verbose=100 if verbose else False
+        )
+    elif model_type == "LGBMRegressor":
+        model = model_cls(**params, verbose=-1)
+        model.fit(
+            train_X, train_y,
+            eval_set=[(eval_X, eval_y)] if eval_X is not None else None,
+            categorical_feature=[c for c in cat_features if c in train_X.columns]
+        )
+    elif model_type == "XGBRegressor":
+        # categorical columns are pandas categories, handled natively by the hist tree method
+        model = model_cls(**params, enable_categorical=True, tree_method="hist")
+        model.fit(
+            train_X, train_y,
+            eval_set=[(eval_X, eval_y)] if eval_X is not None else None,
+            verbose=100 if verbose else False
+        )
+    else:
+        raise ValueError(f"Unknown model type '{model_type}', expected one of {list(MODEL_REGISTRY)}")
+    if tag is not None:
+        log_fit(model, model_type, tag, time.perf_counter() - start, list(train_X.columns))
+    return model
+
+def train_ensemble_models(cfg: dict, model_info: dict, train_X, train_y, eval_X, eval_y, cat_features) -> Dict[str, EnsembleModel]:
+    """
+    Train every member (x seed) per target, learn blend weights on the eval window and save members + manifest
+    """
+    save_model_dir = Path(cfg["train"]["save_model_dir"])
+    chosen_model_key = cfg["train"]["model"]
+    seeds = model_info.get("seeds") or [None]
+    weight_method = model_info.get("weights", "equal")
+
+    members = []
+    for member_key in model_info["members"]:
+        for seed in seeds:
+            member_info = cfg["models"][member_key]
+            params = dict(member_info.get("params", {}))
+            if seed is not None:
+                params[SEED_PARAMS[member_info["type"]]] = seed
+            name = member_key if seed is None else f"{member_key}_s{seed}"
+            members.append({"name": name, "type": member_info["type"], "params": params, "files": {}})
+
+    categories = training_categories(train_X, cat_features)
+    shared_inputs = SharedInputs(categories)
+    executor = ThreadPoolExecutor(max_workers=model_info.get("n_jobs", len(members)))
+    models, weights = {}, {}
+    for target in ["LogNewConfirmedCases", "LogNewFatalities"]:
+        fitted = []
+        for member in members:
+            start = time.perf_counter()
+            model = fit_model(
+                MODEL_REGISTRY[member["type"]], member["type"], member["params"],
+                train_X, train_y[target], eval_X, eval_y[target],
+                cat_features, tag=f"{target}/{member['name']}", write_files=False
+            )
+            fitted.append(model)
+            save_path = save_member(model, member["type"], save_model_dir / f"{chosen_model_key}_{member['name']}_{target}")
+            member["files"][target] = save_path.name
+            logging.info(f"Finished training ensemble member {member['name']} for {target} in {time.perf_counter() - start:.1f}s, saved to {save_path}")
+
+        ensemble = EnsembleModel(
+            [member["name"] for member in members], fitted, np.ones(len(fitted)) / len(fitted),
+            list(train_X.columns), cat_features, shared_inputs, executor
+        )
+        ensemble.weights = fit_weights(ensemble.predict_members(eval_X), eval_y[target].to_numpy(dtype=float), weight_method)
+        ensemble.timings = {name: 0.0 for name in ensemble.names}
+        weights[target] = ensemble.weights.tolist()
+        models[target] = ensemble
+        logging.info(f"Ensemble weights ({weight_method}) for {target}: {dict(zip(ensemble.names, np.round(ensemble.weights, 4)))}")
+
+    save_manifest(
+        save_model_dir / f"{chosen_model_key}_ensemble.json",
+        [{"name": m["name"], "type": m["type"], "files": m["files"]} for m in members],
+        weights, list(train_X.columns), cat_features, categories
+    )
+    return models
+
+def train_direct_models(cfg: dict, train_df, train_X, eval_df, model_cls, model_type, params, cat_features) -> Dict[str, DirectModel]:
+    """
+    Train horizon-as-feature models (one per horizon bucket) on the shared train/eval split
+    """
+    direct_cfg = cfg["train"].get("direct", {}) or {}
+    max_horizon = direct_cfg.get("max_horizon", 30)
+    buckets = [tuple(b) for b in (direct_cfg.get("horizon_buckets") or [[1, max_horizon]])]
+
+    origin_X = add_origin_features(train_df, train_X)
+    direct_train_X, direct_train_y = make_direct_dataset(train_df, origin_X, train_df, range(1, max_horizon + 1))
+    direct_eval_X, direct_eval_y = make_direct_dataset(train_df, origin_X, eval_df, range(1, max_horizon + 1))
+
+    save_model_dir = Path(cfg["train"]["save_model_dir"])
+    chosen_model_key = cfg["train"]["model"]
+
+    models = {}
+    for target in ["LogNewConfirmedCases", "LogNewFatalities"]:
+        bucket_models = []
+        for lo, hi in buckets:
+            train_mask = direct_train_X["Horizon"].between(lo, hi)
+            eval_mask = direct_eval_X["Horizon"].between(lo, hi)
+            model = fit_model(
+                model_cls, model_type, params,
+                direct_train_X[train_mask], direct_train_y.loc[train_mask, target],
+                direct_eval_X[eval_mask], direct_eval_y.loc[eval_mask, target],
+                cat_features, tag=f"{target}/direct_h{lo}-{hi}", write_files=False
+            )
+            bucket_models.append(model)
+
+            save_model_dir.mkdir(exist_ok=True, parents=True)
+            save_path = save_model_dir / f"{chosen_model_key}_direct_h{lo}-{hi}_{target}.cbm"
+            model.save_model(str(save_path))
+            logging.info(f"Finished training direct {chosen_model_key} for {target} (horizons {lo}-{hi}), saved to {save_path}")
+
+        models[target] = DirectModel(buckets, bucket_models)
+
+    return models
+
+def train_quantile_models(cfg: dict, train_X, train_y, eval_X, eval_y, cat_features) -> Dict[str, Any]:
+    """
+    MultiQuantile models of both targets (probabilistic forecasts): one model predicts every quantile level
+    """
+    prob_cfg = cfg.get("probabilistic", {}) or {}
+    model_info = cfg["models"][prob_cfg.get("model", "CatBoost")]
+    quantiles = prob_cfg.get("quantiles", [0.05, 0.25, 0.5, 0.75, 0.95])
+    params = {
+        **model_info.get("params", {}),
+        **(prob_cfg.get("params") or {}),
+        "loss_function": multi_quantile_loss(quantiles),
+    }
+
+    save_model_dir = Path(cfg["train"]["save_model_dir"])
+    save_model_dir.mkdir(exist_ok=True, parents=True)
+    chosen_model_key = cfg["train"]["model"]
+
+    models = {}
+    for target in ["LogNewConfirmedCases", "LogNewFatalities"]:
+        model = fit_model(
+            MODEL_REGISTRY[model_info["type"]], model_info["type"], params,
+            train_X, train_y[target], eval_X, eval_y[target],
+            cat_features, tag=f"{target}/quantile", write_files=False
+        )
+        save_path = save_model_dir / f"{chosen_model_key}_quantile_{target}.cbm"
+        model.save_model(str(save_path))
+        models[target] = model
+        logging.info(f"Finished training quantile model ({quantiles}) for {target}, saved to {save_path}")
+    return models
+
+def validate_model_config(cfg: dict):
+    """
+    fail before any fit on model keys / types the configured forecast modes cannot train
+    """
+    def model_type_of(key: str, supported, usage: str = "") -> str:
+        if key not in cfg["models"]:
+            raise ValueError(f"Model '{key}' is not defined under models in config")
+        model_type = cfg["models"][key]["type"]
+        if model_type not in supported:
+            raise ValueError(f"Model '{key}' has type '{model_type}', expected one of {list(supported)}{usage}")
+        return model_type
+
+    chosen_model_key = cfg["train"]["model"]
+    if model_type_of(chosen_model_key, [*MODEL_REGISTRY, "Ensemble"]) == "Ensemble":
+        for member_key in cfg["models"][chosen_model_key]["members"]:
+            model_type_of(member_key, MODEL_REGISTRY)
+    elif "direct" in cfg["train"].get("forecast_modes", ["recursive"]):
+        model_type_of(chosen_model_key, ["CatBoostRegressor"], " for the direct forecast mode")
+
+    prob_cfg = cfg.get("probabilistic", {}) or {}
+    if prob_cfg.get("enabled", False):
+        model_type_of(prob_cfg.get("model", "CatBoost"), ["CatBoostRegressor"], " for quantile models (MultiQuantile loss)")
+
 def train_model(cfg: dict, df) -> Dict[str, Any]:
+    validate_model_config(cfg)
 
-    # split data
+    # split data (shared by all forecast modes)
     processor = DataProcessor(cfg)
-    train_df, eval_df, _ = processor.split_by_date(df)
-    train_X, train_y = processor.preprocess_df(train_df)
-    eval_X,  eval_y  = processor.preprocess_df(eval_df)
+    frame = processor.index_by_date(df)
+    train_df, eval_df, _ = processor.split_by_date(frame)
+    splits = processor.split_xy(frame)
+    train_X, train_y = splits["train"]
+    eval_X,  eval_y  = splits["eval"]
 
     cat_features = cfg["train"].get("cat_features", [])
+    forecast_modes = cfg["train"].get("forecast_modes", ["recursive"])
 
     # get the model you assinged in config
     save_model_dir = cfg["train"]["save_model_dir"]
@@ -64,78 +312,201 @@ def train_model(cfg: dict, df) -> Dict[str, Any]:
     save_model_dir = Path(save_model_dir)
     save_log_dir = Path(save_log_dir)
 
-    model_cls = MODEL_REGISTRY[model_type]
-    setup_logger(save_log_dir, chosen_model_key, params)
+    log_file = setup_logger(save_log_dir, chosen_model_key, params if model_type != "Ensemble" else model_info)
 
-    models = {}
-    for target in ["LogNewConfirmedCases", "LogNewFatalities"]:
-        if model_type == "CatBoostRegressor":
-            model = model_cls(
-                **params,
-                logging_level="Verbose",   
-                train_dir=""             
-            )
-            model.fit(
-                train_X, train_y[target],
-                eval_set=(eval_X, eval_y[target]),
-                cat_features=cat_features,
-                verbose=100
+    telemetry.start_from_config(cfg, log_file.stem)
+
+    trained = {}
+    with telemetry.writer().stage("train"):
+        if model_type == "Ensemble":
+            trained["recursive"] = train_ensemble_models(cfg, model_info, train_X, train_y, eval_X, eval_y, cat_features)
+            if "direct" in forecast_modes:
+                logging.warning("Direct forecast mode is not available for ensembles, only the recursive mode is trained")
+            forecast_modes = []
+        else:
+            model_cls = MODEL_REGISTRY[model_type]
+
+        if "recursive" in forecast_modes:
+            models = {}
+            for target in ["LogNewConfirmedCases", "LogNewFatalities"]:
+                model = fit_model(
+                    model_cls, model_type, params,
+                    train_X, train_y[target], eval_X, eval_y[target],
+                    cat_features, tag=target, train_dir=str(save_log_dir / log_file.stem)
+                )
+                models[target] = model
+
+                # save　model
+                save_path = save_member(model, model_type, save_model_dir / f"{chosen_model_key}_{target}")
+
+                logging.info(f"Finished training {chosen_model_key} for {target}, saved to {save_path}")
+            trained["recursive"] = models
+
+        if "direct" in forecast_modes:
+            trained["direct"] = train_direct_models(
+                cfg, train_df, train_X, eval_df, model_cls, model_type, params, cat_features
             )
-        # else:
-        #     model.fit(
-        #         train_X, train_y[target],
-        #         eval_set=[(eval_X, eval_y[target])],
-        #         verbose=True
-        #     )
 
-        models[target] = model
+        prob_cfg = cfg.get("probabilistic", {}) or {}
+        quantile_models = None
+        if prob_cfg.get("enabled", False):
+            quantile_models = train_quantile_models(cfg, train_X, train_y, eval_X, eval_y, cat_features)
 
-        # save　model
-        save_model_dir.mkdir(exist_ok=True, parents=True)
-        if model_type == "CatBoostRegressor":
-            save_path = save_model_dir / f"{chosen_model_key}_{target}.cbm"
-            model.save_model(str(save_path))
-        # elif model_type == "LGBMRegressor":
-        #     save_path = save_model_dir / f"{chosen_model_key}_{target}.txt"
-        #     model.booster_.save_model(str(save_path))
-        # elif model_type == "XGBRegressor":
-        #     save_path = save_model_dir / f"{chosen_model_key}_{target}.json"
-        #     model.save_model(str(save_path))
-        # else:
-        #     save_path = save_model_dir / f"{chosen_model_key}_{target}.pkl"
-        #     joblib.dump(model, save_path)
-
-        logging.info(f"Finished training {chosen_model_key} for {target}, saved to {save_path}")
-
-    # Evaluation
+    # Evaluation: forecast the whole eval window from the last train day
     last_train_date = pd.Timestamp(cfg["train"]["last_train_date"])
     last_eval_date = pd.Timestamp(cfg["train"]["last_eval_date"])
-    prev_day_df = train_df.loc[train_df["Date"] == last_train_date]
+    prev_day_df = frame.day(last_train_date)
     first_eval_date = last_train_date + pd.Timedelta(days=1)
 
-    predict_for_dataset(
-        eval_df, eval_X, prev_day_df,
-        first_eval_date, last_eval_date,
-        update_features_data=False,
-        models=models,
-        cat_features=cat_features
+    eval_cfg = cfg.get("evaluation", {}) or {}
+    evaluator = ForecastEvaluator(
+        n_bootstrap=eval_cfg.get("n_bootstrap", 1000),
+        confidence=eval_cfg.get("confidence", 0.95),
+        n_jobs=eval_cfg.get("n_jobs", 4),
+        seed=cfg.get("seed", 42),
     )
-    print(eval_df.head())
-    logging.info(f"Eval prediction sample:\n{eval_df.head()}")
 
-    return models
+    # country / global totals of the location forecasts, summing matrix built once for all modes
+    hierarchy = LocationHierarchy.from_frame(eval_df)
+    # neighbor lags of the eval forecast come from the neighbors' predictions (SpatialNeighborFeatures)
+    neighbors = neighbor_aggregator(cfg, eval_df)
+
+    # eval forecasts for the dashboard (streamlit run src/streamlit/app.py), with some train days as history
+    dashboard_cfg = cfg.get("dashboard", {}) or {}
+    store = ForecastStore(dashboard_cfg.get("store_dir", "datasets/forecast_store"))
+    history_df = train_df[train_df["Date"] > last_train_date - pd.Timedelta(days=dashboard_cfg.get("history_days", 30))]
+
+    report = []
+    tables = []
+    for mode, models in trained.items():
+        mode_eval_df = eval_df.copy()
+        start = time.perf_counter()
+        with telemetry.writer().stage(f"evaluate/{mode}"):
+            if mode == "recursive":
+                # a genuine multi-day forecast from the last train day, no features of observed eval days
+                forecast_from_origin(
+                    mode_eval_df, prev_day_df, train_X.loc[prev_day_df.index],
+                    last_eval_date,
+                    models=models,
+                    cat_features=cat_features,
+                    neighbors=neighbors
+                )
+                if reconcile_method(cfg):
+                    # location forecasts made coherent with forecasts of the country totals by the same models
+                    mode_eval_df = hierarchy.reconcile_forecast(
+                        mode_eval_df, prev_day_df, train_X.loc[prev_day_df.index],
+                        models, cat_features, reconcile_method(cfg)
+                    )
+            else:
+                predict_direct_for_dataset(
+                    mode_eval_df, prev_day_df, add_origin_features(prev_day_df, train_X.loc[prev_day_df.index]),
+                    first_eval_date, last_eval_date,
+                    models=models,
+                    cat_features=cat_features
+                )
+        latency = time.perf_counter() - start
+
+        table = evaluator.evaluate(mode_eval_df, first_eval_date, run=f"{log_file.stem}-{mode}")
+        tables.append(table)
+        rollup = hierarchy.rollup(mode_eval_df, ROLLUP_COLUMNS)
+        tables.append(evaluator.evaluate(rollup, first_eval_date, run=f"{log_file.stem}-{mode}-rollup"))
+        store.write_run(
+            f"{log_file.stem}-{mode}", pd.concat([history_df, mode_eval_df], ignore_index=True),
+            overview_points=dashboard_cfg.get("overview_points", 60)
+        )
+        overall = table[(table["level"] == "overall") & (table["key"] == "all")].iloc[0]
+        telemetry.writer().add_scalars({
+            f"eval/{mode}/RMSLE_ConfirmedCases": overall["RMSLE_ConfirmedCases"],
+            f"eval/{mode}/RMSLE_Fatalities": overall["RMSLE_Fatalities"],
+            f"eval/{mode}/latency_sec": latency,
+        })
+        report.append({
+            "mode": mode,
+            "RMSLE_ConfirmedCases": overall["RMSLE_ConfirmedCases"],
+            "RMSLE_Fatalities": overall["RMSLE_Fatalities"],
+            "latency_sec": latency,
+        })
+        logging.info(f"Eval prediction sample ({mode}):\n{mode_eval_df.head()}")
+        for target, model in models.items():
+            if isinstance(model, EnsembleModel):
+                logging.info(f"Ensemble member predict time for {target} ({mode}):\n{model.timing_report().to_string(index=False)}")
+
+    # prediction intervals of the eval window from Monte Carlo paths of the quantile models
+    if quantile_models is not None:
+        output_quantiles = prob_cfg.get("output_quantiles", [0.05, 0.5, 0.95])
+        n_paths = prob_cfg.get("n_paths", 200)
+        horizon = (last_eval_date - last_train_date).days
+        last_X = numeric_features(train_X.loc[prev_day_df.index], cat_features)
+        start = time.perf_counter()
+        with telemetry.writer().stage("evaluate/probabilistic"):
+            out = sample_paths(
+                quantile_models, prob_cfg.get("quantiles", [0.05, 0.25, 0.5, 0.75, 0.95]),
+                last_X,
+                {field: prev_day_df["LogNew" + field].to_numpy(dtype=float) for field in ["ConfirmedCases", "Fatalities"]},
+                {field: prev_day_df[field].to_numpy(dtype=float) for field in ["ConfirmedCases", "Fatalities"]},
+                horizon, cat_features,
+                n_paths=n_paths,
+                output_quantiles=output_quantiles,
+                rho=prob_cfg.get("rho", 0.5),
+                seed=cfg.get("seed", 42),
+                neighbors=neighbors.for_rows(np.tile(neighbors.codes(prev_day_df), n_paths)) if neighbors is not None else None
+            )
+        latency = time.perf_counter() - start
+        interval_df = interval_scores(quantile_frame(prev_day_df, out, output_quantiles, horizon), eval_df, output_quantiles)
+        interval_df.insert(0, "run", f"{log_file.stem}-probabilistic")
+        for row in interval_df.to_dict(orient="records"):
+            telemetry.writer().add_scalars({
+                f"eval/probabilistic/{row['field']}/{key}": value for key, value in row.items() if key not in ("run", "field", "n")
+            })
+        logging.info(
+            f"Prediction intervals ({n_paths} paths, {latency:.1f}s) on the eval window:\n{interval_df.to_string(index=False)}"
+        )
+        save_evaluation(interval_df, Path(eval_cfg.get("save_dir", "evaluations")) / f"{log_file.stem}-quantiles.csv")
+
+    report_df = pd.DataFrame(report)
+    print(report_df)
+    logging.info(f"Eval window {first_eval_date.date()} - {last_eval_date.date()} forecast modes:\n{report_df.to_string(index=False)}")
+
+    save_eval_dir = Path(eval_cfg.get("save_dir", "evaluations"))
+    eval_path = save_evaluation(pd.concat(tables, ignore_index=True), save_eval_dir / f"{log_file.stem}.csv")
+    logging.info(f"Evaluation tables (overall / location / country / horizon) saved to {eval_path}")
+    logging.info(f"Dashboard runs saved to {store.root}")
+
+    # version the recursive models (the ones inference and serving load) with what produced them
+    registry_cfg = cfg.get("registry", {}) or {}
+    if registry_cfg.get("dir") and "recursive" in trained:
+        registry = ModelRegistry(registry_cfg["dir"])
+        version = registry.register(chosen_model_key, save_model_dir, {
+            "run": log_file.stem,
+            "params": params if model_type != "Ensemble" else model_info,
+            "feature_names": list(train_X.columns),
+            "cat_features": cat_features,
+            "feature_config_hash": feature_config_hash(cfg),
+            "split": {"last_train_date": str(last_train_date.date()), "last_eval_date": str(last_eval_date.date())},
+            "data_window": {"first_date": str(pd.Timestamp(frame.days[0]).date()), "last_date": str(pd.Timestamp(frame.days[-1]).date())},
+            "metrics": [r for r in report if r["mode"] == "recursive"],
+        }, aliases=registry_cfg.get("aliases", ["latest"]))
+        logging.info(f"Registered {chosen_model_key} {version} in {registry.root} (aliases {registry_cfg.get('aliases', ['latest'])})")
+
+    # the ensembles of both targets share one member thread pool, shut it down once the eval forecasts are done
+    for model in trained.get("recursive", {}).values():
+        if isinstance(model, EnsembleModel):
+            model.close()
+
+    telemetry.stop()
+
+    return trained
 
 
-def main():
+def main(argv=None):
 
     # You can either run feature/main.py or choose created feature file
     parser = argparse.ArgumentParser()
     parser.add_argument("--features", type=str, default=None, help="Path to precomputed features CSV")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # load config
-    with open("config/config.yaml", "r") as f:
-        cfg = yaml.safe_load(f)
+    cfg = load_config()
 
     if args.features is not None and Path(args.features).exists():
         logging.info(f"Loading precomputed features from {args.features}")
@@ -143,10 +514,10 @@ def main():
         df_feat = df_feat.fillna("")
     else:
         logging.info("No precomputed features provided, running feature extraction from scratch...")
-        df_raw = CovidDataLoader(cfg["paths"]["train_csv"], cfg["paths"]["test_csv"]).load()
+        df_raw = data_loader(cfg).load()
         params_map: Dict[str, Dict[str, Any]] = cfg.get("feature_params", {}) or {}
         enabled_features: list[str] = cfg.get("features_to_apply", [])
-        fx = FeatureExtraction(FEATURE_REGISTRY, params_map)
+        fx = FeatureExtraction(FEATURE_REGISTRY, params_map, cfg.get("data_quality"), load_feature_manifest(cfg))
         df_feat = fx.add_features(df_raw, enabled_features)
 
         # save features
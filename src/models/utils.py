@@ -1,6 +1,23 @@
+import sys
+import time
+
 import numpy as np
 import pandas as pd
-import catboost as cb
+
+from src.data.data_processing import date_offsets
+from src import telemetry
+
+
+def to_model_input(models, features_df: pd.DataFrame, cat_features):
+    """
+    cb.Pool for CatBoost models, the frame itself for evaluators predicting from DataFrames
+    (e.g. ObliviousTreeEvaluator), which skips Pool construction
+    """
+    # catboost is only imported by whoever loaded CatBoost models, no need to import it here
+    cb = sys.modules.get("catboost")
+    if cb is not None and any(isinstance(model, cb.CatBoost) for model in models.values()):
+        return cb.Pool(features_df, cat_features=cat_features)
+    return features_df
 
 
 def predict_for_dataset(
@@ -9,30 +26,59 @@ def predict_for_dataset(
     update_features_data,
     models,
     cat_features,
-    location_columns=["Country/Region", "Province/State"]
+    location_columns=["Country/Region", "Province/State"],
+    neighbors=None
 ):
+    """
+    neighbors: NeighborAggregator when the models use SpatialNeighborFeatures,
+    their lags on later days are then updated from this day's predictions like the own lags
+    """
     df['PredictedLogNewConfirmedCases'] = np.nan
     df['PredictedLogNewFatalities'] = np.nan
     df['PredictedConfirmedCases'] = np.nan
     df['PredictedFatalities'] = np.nan
 
-    for day in pd.date_range(first_date, last_date):
-        day_df = df[df['Date'] == day]
-        if day_df.empty:
+    # row labels of every day, found once instead of scanning df['Date'] per day
+    order, days, offsets = date_offsets(df['Date'])
+    day_index = {
+        pd.Timestamp(day): df.index[order[offsets[i]:offsets[i + 1]]]
+        for i, day in enumerate(days)
+    }
+    empty_index = df.index[:0]
+    writer = telemetry.writer()
+    # lags the models use (fewer with a pruned feature manifest): later days never need this day's predictions
+    n_lags = {
+        prefix: max(len(lag_columns(features_df, prefix + prediction_type)) for prediction_type in ['LogNewConfirmedCases', 'LogNewFatalities'])
+        for prefix in ['', 'Neighbors_']
+    }
+    max_lag = max(n_lags.values())
+    if not n_lags['Neighbors_']:
+        neighbors = None
+
+    for horizon, day in enumerate(pd.date_range(first_date, last_date), start=1):
+        day_rows = day_index.get(day, empty_index)
+        if day_rows.empty:
             continue
+        start = time.perf_counter()
 
-        day_features_pool = cb.Pool(features_df.loc[day_df.index], cat_features=cat_features)
+        day_features_pool = to_model_input(models, features_df.loc[day_rows], cat_features)
 
         # predict LogNew* data
         for prediction_type in ['LogNewConfirmedCases', 'LogNewFatalities']:
-            df.loc[day_df.index, 'Predicted' + prediction_type] = np.maximum(
+            df.loc[day_rows, 'Predicted' + prediction_type] = np.maximum(
                 models[prediction_type].predict(day_features_pool),
                 0.0
             )
 
-        day_predictions_df = df.loc[day_df.index][
+        day_predictions_df = df.loc[day_rows][
             location_columns + ['PredictedLogNewConfirmedCases', 'PredictedLogNewFatalities']
         ]
+        if neighbors is not None:
+            day_neighbors = neighbors.for_rows(neighbors.codes(day_predictions_df))
+            day_predictions_df = day_predictions_df.assign(**{
+                'Neighbors' + prediction_type: day_neighbors(day_predictions_df['Predicted' + prediction_type].to_numpy())
+                for prediction_type in ['LogNewConfirmedCases', 'LogNewFatalities']
+            })
 
         # update Predicted ConfirmedCases and Fatalities
         for field in ['ConfirmedCases', 'Fatalities']:
@@ -43,19 +89,20 @@ def predict_for_dataset(
                 on=location_columns
             )
 
-            df.loc[day_df.index, 'Predicted' + field] = merged_df.apply(
-                lambda row: row[prev_day_field] + np.rint(np.expm1(row['PredictedLogNew' + field])),
-                axis='columns'
-            ).values
+            # observed counts of a features CSV are object columns ("" from fillna), the predictions are float
+            df.loc[day_rows, 'Predicted' + field] = (
+                pd.to_numeric(merged_df[prev_day_field], errors='coerce').to_numpy(dtype=float)
+                + np.rint(np.expm1(merged_df['PredictedLogNew' + field].to_numpy(dtype=float)))
+            )
 
         if update_features_data:
             # fill time delay embedding features based on this day for next days
-            for next_day in pd.date_range(day + pd.Timedelta(days=1), last_date):
-                next_day_features_df = features_df[df['Date'] == next_day]
-                if next_day_features_df.empty:
+            for next_day in pd.date_range(day + pd.Timedelta(days=1), min(pd.Timestamp(last_date), day + pd.Timedelta(days=max_lag))):
+                next_day_rows = day_index.get(next_day, empty_index)
+                if next_day_rows.empty:
                     continue
 
-                merged_df = next_day_features_df[location_columns].merge(
+                merged_df = df.loc[next_day_rows, location_columns].merge(
                     right=day_predictions_df,
                     how='inner',
                     on=location_columns
@@ -63,10 +110,154 @@ def predict_for_dataset(
 
                 prev_day_idx = (next_day - day).days
                 for prediction_type in ['LogNewConfirmedCases', 'LogNewFatalities']:
-                    features_df.loc[next_day_features_df.index, prediction_type + '_prev_day_%s' % prev_day_idx] = (
-                        merged_df['Predicted' + prediction_type].values
-                    )
+                    lag_column = prediction_type + '_prev_day_%s' % prev_day_idx
+                    if lag_column in features_df.columns:
+                        features_df.loc[next_day_rows, lag_column] = merged_df['Predicted' + prediction_type].values
+                    neighbor_column = 'Neighbors_' + prediction_type + '_prev_day_%s' % prev_day_idx
+                    if neighbors is not None and neighbor_column in features_df.columns:
+                        features_df.loc[next_day_rows, neighbor_column] = merged_df['Neighbors' + prediction_type].values
+
+        prev_day_df = df.loc[day_rows]
+
+        # buffered, written by the telemetry thread
+        elapsed = time.perf_counter() - start
+        writer.add_scalars({
+            "forecast/day_latency_ms": elapsed * 1000,
+            "forecast/rows_per_sec": len(day_rows) / max(elapsed, 1e-9),
+        }, horizon)
+
+    return df
+
+
+def last_observed(features_df: pd.DataFrame, location_columns=["Country/Region", "Province/State"]) -> pd.DataFrame:
+    """
+    last day with observed ConfirmedCases of every location (start of a recursive_forecast)
+    """
+    observed = features_df.dropna(subset=["ConfirmedCases"])
+    return observed.sort_values("Date").groupby(location_columns, as_index=False).tail(1)
+
+
+def lag_columns(features_df: pd.DataFrame, target: str) -> list:
+    """
+    {target}_prev_day_{k} columns ordered by k
+    """
+    prefix = f"{target}_prev_day_"
+    lags = [c for c in features_df.columns if c.startswith(prefix) and c[len(prefix):].isdigit()]
+    return sorted(lags, key=lambda c: int(c[len(prefix):]))
+
+
+def advance_features(features_df: pd.DataFrame, log_new: dict, neighbors=None) -> pd.DataFrame:
+    """
+    Features of the next day from this day's features and this day's LogNew* values:
+    lags shift by one, day counters move forward, static columns are unchanged.
+    neighbors: values of the rows -> their neighbor means (NeighborAggregator.for_rows), shifts the Neighbors_* lags
+    """
+    out = features_df.copy()
+    for target, values in log_new.items():
+        lags = lag_columns(out, target)
+        if lags:
+            lag_values = out[lags].to_numpy(dtype=float)
+            out[lags] = np.column_stack([np.asarray(values, dtype=float), lag_values[:, :-1]])
+        neighbor_lags = lag_columns(out, "Neighbors_" + target) if neighbors is not None else []
+        if neighbor_lags:
+            lag_values = out[neighbor_lags].to_numpy(dtype=float)
+            out[neighbor_lags] = np.column_stack([neighbors(values), lag_values[:, :-1]])
+
+    if "Day" in out.columns:
+        out["Day"] = out["Day"] + 1
+    if "WeekDay" in out.columns:
+        out["WeekDay"] = (out["WeekDay"] + 1) % 7
+    for c in out.columns:
+        if c.startswith("Days_since_"):
+            out[c] = np.where(out[c] >= 0, out[c] + 1, out[c])
+    return out
+
+
+def recursive_forecast(
+    models,
+    last_features_df, last_log_new, last_cumulative,
+    horizon,
+    cat_features,
+    neighbors=None
+):
+    """
+    Roll the recursive forecast `horizon` days ahead from the last observed day,
+    with one predict call per day and target for all rows of last_features_df.
+
+    last_log_new / last_cumulative: {'ConfirmedCases': array, 'Fatalities': array} of the last observed day
+    neighbors: NeighborAggregator.for_rows of the rows when the models use SpatialNeighborFeatures
+    (neighbors outside the rows count as missing)
+    returns {'LogNew*' / '*': array [horizon, n_rows]}
+    """
+    n_rows = len(last_features_df)
+    out = {}
+    for field in ['ConfirmedCases', 'Fatalities']:
+        out['LogNew' + field] = np.zeros((horizon, n_rows))
+        out[field] = np.zeros((horizon, n_rows))
+
+    log_new = {'LogNew' + field: np.asarray(last_log_new[field], dtype=float) for field in ['ConfirmedCases', 'Fatalities']}
+    cumulative = {field: np.asarray(last_cumulative[field], dtype=float) for field in ['ConfirmedCases', 'Fatalities']}
+    features_df = last_features_df
+    for h in range(horizon):
+        features_df = advance_features(features_df, log_new, neighbors)
+        pool = to_model_input(models, features_df, cat_features)
+        for field in ['ConfirmedCases', 'Fatalities']:
+            log_new['LogNew' + field] = np.maximum(models['LogNew' + field].predict(pool), 0.0)
+            cumulative[field] = cumulative[field] + np.rint(np.expm1(log_new['LogNew' + field]))
+            out['LogNew' + field][h] = log_new['LogNew' + field]
+            out[field][h] = cumulative[field]
+    return out
+
+
+def numeric_features(features_df: pd.DataFrame, cat_features) -> pd.DataFrame:
+    """
+    "" of a precomputed features CSV (fillna) -> NaN in the non-categorical columns, so advance_features can move them
+    """
+    out = features_df.copy()
+    numeric_columns = [c for c in out.columns if c not in cat_features]
+    out[numeric_columns] = out[numeric_columns].apply(pd.to_numeric, errors="coerce")
+    return out
+
+
+def forecast_from_origin(
+    df, origin_df, origin_features_df,
+    last_date,
+    models,
+    cat_features,
+    location_columns=["Country/Region", "Province/State"],
+    neighbors=None
+):
+    """
+    Predicted* columns (as predict_for_dataset) of the rows of df after the origin day up to last_date,
+    from a recursive_forecast of the origin rows: only the origin day's features are used, the features of later
+    days (lags, Day, WeekDay, Days_since_*) are advanced from the predictions, never taken from observed later days.
+
+    origin_df: rows of the origin day (location columns, Date, LogNew*, ConfirmedCases, Fatalities)
+    origin_features_df: their model input features
+    neighbors: NeighborAggregator when the models use SpatialNeighborFeatures
+    """
+    origin_date = pd.Timestamp(origin_df['Date'].max())
+    horizon = (pd.Timestamp(last_date) - origin_date).days
+    out = recursive_forecast(
+        models,
+        numeric_features(origin_features_df, cat_features),
+        {field: origin_df['LogNew' + field].to_numpy(dtype=float) for field in ['ConfirmedCases', 'Fatalities']},
+        {field: origin_df[field].to_numpy(dtype=float) for field in ['ConfirmedCases', 'Fatalities']},
+        horizon,
+        cat_features,
+        neighbors.for_rows(neighbors.codes(origin_df)) if neighbors is not None else None
+    )
 
-        prev_day_df = df.loc[day_df.index]
+    origin_dates = pd.to_datetime(origin_df['Date']).to_numpy(dtype='datetime64[ns]')
+    predictions = pd.DataFrame({
+        column: np.repeat(origin_df[column].to_numpy(), horizon) for column in location_columns
+    })
+    predictions['Date'] = (origin_dates[:, None] + np.arange(1, horizon + 1) * np.timedelta64(1, 'D')).ravel()
+    for column in ['LogNewConfirmedCases', 'LogNewFatalities', 'ConfirmedCases', 'Fatalities']:
+        # [horizon, row] -> rows ordered by origin row, date
+        predictions['Predicted' + column] = out[column].T.ravel()
 
+    merged = df[location_columns + ['Date']].merge(predictions, how='left', on=location_columns + ['Date'])
+    for column in predictions.columns.drop(location_columns + ['Date']):
+        df[column] = merged[column].to_numpy()
     return df
@@ -0,0 +1,384 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from src.data.data_processing import DataProcessor
+from src.features.spatial_neighbors import neighbor_aggregator
+from src.models.inference import TARGETS
+from src.models.registry import ModelRegistry, csv_feature_columns, load_configured_models
+from src.models.utils import last_observed, recursive_forecast
+from src.utils import load_config
+
+LOCATION_COLUMNS = ["Country/Region", "Province/State"]
+
+
+class LRUCache:
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class LatencyMetrics:
+    """
+    request latencies (recent window) and throughput
+    """
+    def __init__(self, window: int = 10000):
+        self.latencies = deque(maxlen=window)
+        self.timestamps = deque(maxlen=window)
+        self.started = time.time()
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_sec: float):
+        with self._lock:
+            self.latencies.append(latency_sec)
+            self.timestamps.append(time.time())
+            self.total += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = np.array(self.latencies)
+            timestamps = np.array(self.timestamps)
+            total = self.total
+        now = time.time()
+        recent = int((timestamps >= now - 60).sum()) if len(timestamps) else 0
+        return {
+            "requests_total": total,
+            "latency_p50_ms": float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+            "latency_p99_ms": float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+            "throughput_rps_1m": recent / min(60.0, max(now - self.started, 1e-9)),
+            "throughput_rps_total": total / max(now - self.started, 1e-9),
+        }
+
+
+class ForecastService:
+    """
+    Warm models and last observed state of every location, forecasting many locations per predict call.
+    With neighbor features (SpatialNeighborFeatures) every model version instead forecasts all locations
+    max_horizon days ahead once, in one stacked recursive forecast (neighbor lags from every location, as in training),
+    and requests are slices of it, so a forecast never depends on which requests are batched together.
+    Models, their version and the matching feature columns (or that forecast) are one tuple, swapped with a single
+    assignment, so a forecast always runs on one consistent version while another is loaded.
+    """
+    def __init__(self, cfg: dict, models: Dict[str, Any], features_df: pd.DataFrame, version: str, max_horizon: int = 60):
+        self.cat_features = cfg["test"].get("cat_features", [])
+        self.max_horizon = max_horizon
+
+        # last observed day of every location: lag features + static country features
+        last_rows = last_observed(features_df, LOCATION_COLUMNS).set_index(LOCATION_COLUMNS, drop=False)
+
+        self.all_features, _ = DataProcessor(cfg).preprocess_df(last_rows)
+        self.neighbors = neighbor_aggregator(cfg, last_rows)
+        self.last_rows = last_rows
+        self.last_date = last_rows["Date"].max()
+        self.batches = 0
+        self.batched_locations = 0
+        self.swap(models, version)
+
+    def _forecast_all(self, models: Dict[str, Any], features: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        {'ConfirmedCases' / 'Fatalities': [max_horizon, n_locations]} of every location
+        """
+        start = time.perf_counter()
+        out = recursive_forecast(
+            models,
+            features,
+            {field: self.last_rows["LogNew" + field].values for field in ["ConfirmedCases", "Fatalities"]},
+            {field: self.last_rows[field].values for field in ["ConfirmedCases", "Fatalities"]},
+            self.max_horizon,
+            self.cat_features,
+            self.neighbors.for_rows(self.neighbors.codes(self.last_rows))
+        )
+        logging.info(f"Forecast {len(self.last_rows)} locations x {self.max_horizon} days in {time.perf_counter() - start:.2f}s")
+        return out
+
+    def swap(self, models: Dict[str, Any], version: str):
+        features = self.all_features.reindex(columns=models[TARGETS[0]].feature_names_)
+        # neighbor lags need the forecasts of every location, so the whole forecast is made once per version
+        self._state = (models, version, self._forecast_all(models, features) if self.neighbors is not None else features)
+
+    @property
+    def models(self) -> Dict[str, Any]:
+        return self._state[0]
+
+    @property
+    def version(self) -> str:
+        return self._state[1]
+
+    def has_location(self, location: Tuple[str, str]) -> bool:
+        return location in self.last_rows.index
+
+    def forecast(self, locations: List[Tuple[str, str]], horizon: int) -> Tuple[str, Dict[Tuple[str, str], List[dict]]]:
+        """
+        (version the forecasts were made with, location -> daily forecasts)
+        """
+        models, version, state = self._state
+        if isinstance(state, dict):
+            if horizon > self.max_horizon:
+                raise ValueError(f"horizon {horizon} exceeds max_horizon {self.max_horizon}")
+            positions = self.last_rows.index.get_indexer(locations)
+            rows = self.last_rows.iloc[positions]
+            out = {field: values[:, positions] for field, values in state.items()}
+        else:
+            rows = self.last_rows.loc[locations]
+            out = recursive_forecast(
+                models,
+                state.loc[locations],
+                {field: rows["LogNew" + field].values for field in ["ConfirmedCases", "Fatalities"]},
+                {field: rows[field].values for field in ["ConfirmedCases", "Fatalities"]},
+                horizon,
+                self.cat_features
+            )
+        self.batches += 1
+        self.batched_locations += len(locations)
+
+        results = {}
+        for i, location in enumerate(locations):
+            last_date = rows["Date"].iloc[i]
+            results[location] = [
+                {
+                    "Date": str((last_date + pd.Timedelta(days=h + 1)).date()),
+                    "ConfirmedCases": float(out["ConfirmedCases"][h, i]),
+                    "Fatalities": float(out["Fatalities"][h, i]),
+                }
+                for h in range(horizon)
+            ]
+        return version, results
+
+
+class RegistryWatcher:
+    """
+    Follows a registry alias (e.g. latest, prod) and hot-swaps the service to the version it points to.
+    The new version is loaded and schema-checked in the background, requests keep using the old one until the swap.
+    """
+    def __init__(self, service: ForecastService, registry: ModelRegistry, model_key: str, alias: str,
+                 evaluator: str, feature_columns: List[str], poll_sec: float = 30):
+        self.service = service
+        self.registry = registry
+        self.model_key = model_key
+        self.alias = alias
+        self.evaluator = evaluator
+        self.feature_columns = feature_columns
+        self.poll_sec = poll_sec
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def check(self) -> bool:
+        version = self.registry.resolve(self.model_key, self.alias)
+        if version == self.service.version:
+            return False
+        version, models = self.registry.load(self.model_key, version, self.evaluator, self.feature_columns)
+        previous = self.service.version
+        self.service.swap(models, version)
+        logging.info(f"Swapped {self.model_key} {previous} -> {version} ({self.alias})")
+        return True
+
+    def _loop(self):
+        while True:
+            time.sleep(self.poll_sec)
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Model reload failed, still serving {self.service.version}: {e}")
+
+
+class MicroBatcher:
+    """
+    Collect requests arriving within batch_window_ms and answer them with a single forecast call
+    """
+    def __init__(self, service: ForecastService, batch_window_ms: float = 10, max_batch_size: int = 256):
+        self.service = service
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, location: Tuple[str, str], horizon: int) -> Future:
+        future: Future = Future()
+        self._queue.put((location, horizon, future))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        locations = list(dict.fromkeys(location for location, _, _ in batch))
+        horizon = max(h for _, h, _ in batch)
+        try:
+            version, results = self.service.forecast(locations, horizon)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for location, h, future in batch:
+            future.set_result((version, results[location][:h]))
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    """
+    GET /forecast?country=US&province=New York&days=14
+    GET /metrics
+    GET /health
+    """
+    server_version = "CovidForecast/1.0"
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        if url.path == "/health":
+            return self._send_json(200, {"status": "ok", "model_version": app["service"].version})
+        if url.path == "/metrics":
+            return self._send_json(200, {
+                **app["metrics"].summary(),
+                "cache_hits": app["cache"].hits,
+                "cache_misses": app["cache"].misses,
+                "batches": app["service"].batches,
+                "avg_batch_locations": app["service"].batched_locations / max(app["service"].batches, 1),
+                "model_version": app["service"].version,
+            })
+        if url.path != "/forecast":
+            return self._send_json(404, {"error": f"unknown path {url.path}"})
+
+        start = time.perf_counter()
+        query = parse_qs(url.query)
+        location = (query.get("country", [""])[0], query.get("province", [""])[0])
+        try:
+            horizon = int(query.get("days", ["1"])[0])
+        except ValueError:
+            return self._send_json(400, {"error": "days must be an integer"})
+        if not 1 <= horizon <= app["max_horizon"]:
+            return self._send_json(400, {"error": f"days must be in [1, {app['max_horizon']}]"})
+        if not app["service"].has_location(location):
+            return self._send_json(404, {"error": f"unknown location {location}"})
+
+        version = app["service"].version
+        forecast = app["cache"].get((location, horizon, version))
+        if forecast is None:
+            # cached under the version that made it, which differs from the one above if a swap happened meanwhile
+            version, forecast = app["batcher"].submit(location, horizon).result()
+            app["cache"].put((location, horizon, version), forecast)
+
+        app["metrics"].record(time.perf_counter() - start)
+        return self._send_json(200, {
+            "country": location[0], "province": location[1],
+            "model_version": version, "forecast": forecast,
+        })
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+def build_server(cfg: dict, host: str, port: int, features_path: Path) -> ThreadingHTTPServer:
+    serve_cfg = cfg.get("serve", {})
+    model_key = cfg["train"]["model"]
+
+    # schema checked against the features header before the features are loaded
+    feature_columns = csv_feature_columns(features_path)
+    version, models = load_configured_models(cfg, feature_columns)
+    features_df = pd.read_csv(features_path, parse_dates=["Date"])
+    features_df[LOCATION_COLUMNS] = features_df[LOCATION_COLUMNS].fillna("")
+    service = ForecastService(cfg, models, features_df, version, serve_cfg.get("max_horizon", 60))
+
+    registry = ModelRegistry((cfg.get("registry") or {}).get("dir", "models/registry"))
+    alias = cfg["test"].get("model_version")
+    watcher = None
+    if alias is not None and serve_cfg.get("reload_poll_sec") and registry.versions(model_key):
+        watcher = RegistryWatcher(
+            service, registry, model_key, alias, cfg["test"].get("evaluator", "catboost"),
+            feature_columns, serve_cfg["reload_poll_sec"]
+        )
+
+    server = ThreadingHTTPServer((host, port), ForecastHandler)
+    server.app = {
+        "service": service,
+        "batcher": MicroBatcher(service, serve_cfg.get("batch_window_ms", 10), serve_cfg.get("max_batch_size", 256)),
+        "cache": LRUCache(serve_cfg.get("cache_size", 4096)),
+        "metrics": LatencyMetrics(),
+        "max_horizon": serve_cfg.get("max_horizon", 60),
+        "watcher": watcher,
+    }
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default=None, help="Host to bind (default: from config)")
+    parser.add_argument("--port", type=int, default=None, help="Port to bind (default: from config)")
+    parser.add_argument("--features", type=str, default=None, help="Path to precomputed features CSV (default: from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    cfg = load_config()
+    serve_cfg = cfg.get("serve", {})
+
+    host = args.host if args.host is not None else serve_cfg.get("host", "127.0.0.1")
+    port = args.port if args.port is not None else serve_cfg.get("port", 8000)
+    if args.features is not None:
+        features_path = Path(args.features)
+    else:
+        features_path = Path(cfg["features"]["save_df_dir"]) / cfg["features"]["save_filename"]
+
+    server = build_server(cfg, host, port, features_path)
+    logging.info(f"Serving forecasts on http://{host}:{port} (model version {server.app['service'].version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.data.forecast_store import ForecastStore
+from src.utils import load_config
+
+TARGETS = ["ConfirmedCases", "Fatalities"]
+
+
+@st.cache_resource
+def get_store(root: str) -> ForecastStore:
+    # one store per session server, keeps the memory-mapped columns open between reruns
+    return ForecastStore(root)
+
+
+@st.cache_data
+def get_locations(root: str, run: str) -> pd.DataFrame:
+    return get_store(root).locations(run)
+
+
+@st.cache_data
+def get_series(root: str, run: str, level: str, country: str, province: str) -> pd.DataFrame:
+    return get_store(root).read_location(run, level, country, province)
+
+
+@st.cache_data
+def get_overview(root: str, run: str):
+    return get_store(root).overview(run)
+
+
+def series_chart(root: str, runs: list, level: str, country: str, province: str, target: str) -> pd.DataFrame:
+    """
+    Date x (actual, forecast of every run)
+    """
+    columns = {}
+    for run in runs:
+        series = get_series(root, run, level, country, province).set_index("Date")
+        columns.setdefault("actual", series[target])
+        columns[run] = series["Predicted" + target]
+    return pd.DataFrame(columns)
+
+
+def overview_chart(root: str, run: str, target: str, top_n: int) -> pd.DataFrame:
+    """
+    Date x country, the top_n countries by the latest forecast (or actual) value
+    """
+    nodes, matrices, dates = get_overview(root, run)
+    countries = (nodes["level"] == "country").to_numpy()
+    predicted, actual = matrices["Predicted" + target][countries], matrices[target][countries]
+    latest = np.where(np.isnan(predicted[:, -1]), actual[:, -1], predicted[:, -1])
+    top = np.argsort(-np.nan_to_num(latest, nan=-np.inf))[:top_n]
+    values = np.where(np.isnan(predicted), actual, predicted)[top]
+    return pd.DataFrame(values.T, index=dates, columns=nodes.loc[countries, "Country/Region"].to_numpy()[top])
+
+
+def main():
+    st.set_page_config(page_title="COVID-19 forecasts", layout="wide")
+    cfg = load_config()
+    root = (cfg.get("dashboard", {}) or {}).get("store_dir", "datasets/forecast_store")
+
+    runs = get_store(root).runs()
+    if not runs:
+        st.info(f"No forecast runs in {root}, train a model first (python -m src.cli train)")
+        return
+
+    selected = st.sidebar.multiselect("Runs", runs, default=runs[-1:])
+    if not selected:
+        return
+    level = st.sidebar.radio("Level", ["global", "country", "location"], index=1)
+    target = st.sidebar.selectbox("Target", TARGETS)
+    log_scale = st.sidebar.checkbox("Log scale", value=True)
+
+    locations = get_locations(root, selected[0])
+    country, province = "Global", ""
+    if level != "global":
+        country = st.sidebar.selectbox("Country/Region", sorted(locations.loc[locations["level"] == level, "Country/Region"].unique()))
+    if level == "location":
+        provinces = locations.loc[(locations["level"] == level) & (locations["Country/Region"] == country), "Province/State"]
+        province = st.sidebar.selectbox("Province/State", provinces.tolist())
+
+    meta = get_store(root).meta(selected[0])
+    st.title(f"{target}: {province + ', ' if province else ''}{country}")
+    st.caption(f"{meta['first_date']} - {meta['last_date']}, {meta['n_locations']} locations")
+
+    chart = series_chart(root, selected, level, country, province, target)
+    st.line_chart(np.log1p(chart) if log_scale else chart)
+
+    if level == "global":
+        top_n = st.sidebar.slider("Countries in overview", 5, 30, 10)
+        st.subheader(f"Top {top_n} countries ({selected[0]}, forecast where available)")
+        overview = overview_chart(root, selected[0], target, top_n)
+        st.line_chart(np.log1p(overview) if log_scale else overview)
+
+
+main()
@@ -0,0 +1,272 @@
+import atexit
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# TensorBoard event files (TFRecord framing of Event protos) written without tensorflow / tensorboard:
+# only scalar summaries are needed, their protobuf encoding is a few fields
+
+_CRC32C_TABLE = []
+for _i in range(256):
+    _crc = _i
+    for _ in range(8):
+        _crc = (_crc >> 1) ^ 0x82F63B78 if _crc & 1 else _crc >> 1
+    _CRC32C_TABLE.append(_crc)
+
+
+def crc32c(data: bytes) -> int:
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc = _CRC32C_TABLE[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+def _masked_crc(data: bytes) -> int:
+    crc = crc32c(data)
+    return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    # length-delimited field
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def encode_event(wall_time: float, step: int = 0, scalars: List[Tuple[str, float]] = (), file_version: str | None = None) -> bytes:
+    """
+    Event {wall_time: 1, step: 2, file_version: 3, summary: 5 {value: 1 {tag: 1, simple_value: 2}}}
+    """
+    event = b"\x09" + struct.pack("<d", wall_time)
+    if step:
+        event += b"\x10" + _varint(step)
+    if file_version is not None:
+        event += _field(3, file_version.encode())
+    if scalars:
+        summary = b"".join(
+            _field(1, _field(1, tag.encode()) + b"\x15" + struct.pack("<f", value)) for tag, value in scalars
+        )
+        event += _field(5, summary)
+    return event
+
+
+def tfrecord(data: bytes) -> bytes:
+    header = struct.pack("<Q", len(data))
+    return header + struct.pack("<I", _masked_crc(header)) + data + struct.pack("<I", _masked_crc(data))
+
+
+def read_events(path: Path) -> List[dict]:
+    """
+    scalars of an event file as [{"wall_time", "step", "tag", "value"}], checks record CRCs (for offline inspection)
+    """
+    data = Path(path).read_bytes()
+    events, i = [], 0
+    while i < len(data):
+        (length,) = struct.unpack_from("<Q", data, i)
+        record = data[i + 12:i + 12 + length]
+        if struct.unpack_from("<I", data, i + 12 + length)[0] != _masked_crc(record):
+            raise ValueError(f"Corrupt record at byte {i} of {path}")
+        i += 16 + length
+        events.extend(_decode_scalars(record))
+    return events
+
+
+def _read_varint(data: bytes, i: int) -> Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[i]
+        value |= (byte & 0x7F) << shift
+        i, shift = i + 1, shift + 7
+        if not byte & 0x80:
+            return value, i
+
+
+def _fields(data: bytes):
+    i = 0
+    while i < len(data):
+        key, i = _read_varint(data, i)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, i = _read_varint(data, i)
+        elif wire == 1:
+            value, i = data[i:i + 8], i + 8
+        elif wire == 5:
+            value, i = data[i:i + 4], i + 4
+        elif wire == 2:
+            length, i = _read_varint(data, i)
+            value, i = data[i:i + length], i + length
+        else:
+            raise ValueError(f"Unsupported wire type {wire}")
+        yield number, wire, value
+
+
+def _decode_scalars(record: bytes) -> List[dict]:
+    wall_time, step, values = 0.0, 0, []
+    for number, _, value in _fields(record):
+        if number == 1:
+            wall_time = struct.unpack("<d", value)[0]
+        elif number == 2:
+            step = value
+        elif number == 5:
+            for value_number, _, summary_value in _fields(value):
+                if value_number != 1:
+                    continue
+                fields = {n: v for n, _, v in _fields(summary_value)}
+                if 1 in fields and 2 in fields:
+                    values.append((fields[1].decode(), struct.unpack("<f", fields[2])[0]))
+    return [{"wall_time": wall_time, "step": step, "tag": tag, "value": value} for tag, value in values]
+
+
+def _rss_bytes() -> int:
+    """
+    current resident set size (Linux /proc), falls back to the peak reported by getrusage
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class EventWriter:
+    """
+    Asynchronous, buffered TensorBoard event writer: add_scalar only appends to a queue,
+    a background thread encodes and writes records in batches every flush_secs.
+    The same thread samples the process memory, so stages get their peak RSS.
+    """
+    def __init__(self, log_dir: Path, flush_secs: float = 2.0, sample_secs: float = 0.05):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(exist_ok=True, parents=True)
+        self.path = self.log_dir / f"events.out.tfevents.{int(time.time())}.{socket.gethostname()}"
+        self.flush_secs = flush_secs
+        self.sample_secs = sample_secs
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._file = open(self.path, "wb")
+        self._file.write(tfrecord(encode_event(time.time(), file_version="brain.Event:2")))
+        self._peaks: Dict[str, int] = {}
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def add_scalar(self, tag: str, value: float, step: int = 0, wall_time: float | None = None):
+        self._queue.put((tag, float(value), int(step), wall_time or time.time()))
+
+    def add_scalars(self, values: Dict[str, float], step: int = 0):
+        wall_time = time.time()
+        for tag, value in values.items():
+            self._queue.put((tag, float(value), int(step), wall_time))
+
+    def _drain(self) -> bytes:
+        records = []
+        while True:
+            try:
+                tag, value, step, wall_time = self._queue.get_nowait()
+            except queue.Empty:
+                return b"".join(records)
+            records.append(tfrecord(encode_event(wall_time, step, [(tag, value)])))
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        while not self._closed.wait(self.sample_secs):
+            if self._peaks:
+                rss = _rss_bytes()
+                for stage, peak in list(self._peaks.items()):
+                    self._peaks[stage] = max(peak, rss)
+            if time.monotonic() - last_flush >= self.flush_secs:
+                self._write(self._drain())
+                last_flush = time.monotonic()
+
+    def _write(self, data: bytes):
+        if data:
+            self._file.write(data)
+            self._file.flush()
+
+    @contextmanager
+    def stage(self, name: str, step: int = 0):
+        """
+        duration and peak / end RSS of a block, as stage/<name>/...
+        """
+        start, self._peaks[name] = time.perf_counter(), _rss_bytes()
+        try:
+            yield
+        finally:
+            rss = _rss_bytes()
+            peak = max(self._peaks.pop(name, rss), rss)
+            self.add_scalars({
+                f"stage/{name}/seconds": time.perf_counter() - start,
+                f"stage/{name}/peak_rss_mb": peak / 2 ** 20,
+                f"stage/{name}/end_rss_mb": rss / 2 ** 20,
+            }, step)
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        self._write(self._drain())
+        self._file.close()
+
+
+class _NullWriter:
+    def add_scalar(self, *args, **kwargs):
+        pass
+
+    def add_scalars(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def stage(self, name: str, step: int = 0):
+        yield
+
+    def close(self):
+        pass
+
+
+# process-wide writer, like logging: start() once per run, instrumented code calls writer()
+_WRITER = _NullWriter()
+
+
+def start(log_dir: Path, flush_secs: float = 2.0) -> EventWriter:
+    global _WRITER
+    _WRITER.close()
+    _WRITER = EventWriter(log_dir, flush_secs)
+    return _WRITER
+
+
+def stop():
+    global _WRITER
+    _WRITER.close()
+    _WRITER = _NullWriter()
+
+
+def writer():
+    return _WRITER
+
+
+# buffered records of a run that ends with an exception are still written
+atexit.register(stop)
+
+
+def start_from_config(cfg: dict, run: str):
+    """
+    writer under telemetry.log_dir/<run> if telemetry is enabled in config
+    """
+    telemetry_cfg = cfg.get("telemetry", {}) or {}
+    if telemetry_cfg.get("enabled", False):
+        return start(Path(telemetry_cfg.get("log_dir", "runs")) / run, telemetry_cfg.get("flush_secs", 2.0))
+    return writer()
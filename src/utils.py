@@ -0,0 +1,49 @@
+import copy
+import importlib
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import yaml
+
+CONFIG_PATH = "config/config.yaml"
+
+# (resolved path, mtime, size) -> parsed config
+_CONFIG_CACHE: Dict[Tuple[str, int, int], dict] = {}
+
+
+def load_config(path=None) -> dict:
+    """
+    parsed config, read once per process (and again only when the file changes)
+    """
+    path = Path(path or CONFIG_PATH)
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    if key not in _CONFIG_CACHE:
+        with open(path, "r") as f:
+            # C loader when libyaml is available, ~10x faster than the pure-python one
+            _CONFIG_CACHE[key] = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    # callers may edit their copy (e.g. feature params)
+    return copy.deepcopy(_CONFIG_CACHE[key])
+
+
+class LazyRegistry(Mapping):
+    """
+    name -> "module:attribute"; the module is imported the first time the name is looked up,
+    so unused backends (e.g. lightgbm, xgboost, geopy) never cost import time
+    """
+    def __init__(self, entries: Dict[str, str]):
+        self._entries = dict(entries)
+        self._loaded: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str):
+        if name not in self._loaded:
+            module_name, attribute = self._entries[name].split(":")
+            self._loaded[name] = getattr(importlib.import_module(module_name), attribute)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
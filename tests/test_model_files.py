@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.ensemble import save_member, load_member
+from src.models.inference import load_models
+from src.models.train_model import MODEL_REGISTRY, fit_model
+from src.models.utils import to_model_input
+
+TARGETS = ["LogNewConfirmedCases", "LogNewFatalities"]
+CAT_FEATURES = ["Country/Region", "Province/State"]
+MODEL_TYPES = {"CatBoost": "CatBoostRegressor", "LightGBM": "LGBMRegressor", "XGBoost": "XGBRegressor"}
+PARAMS = {
+    "CatBoostRegressor": {"iterations": 20, "depth": 3},
+    "LGBMRegressor": {"n_estimators": 20, "min_child_samples": 5},
+    "XGBRegressor": {"n_estimators": 20, "max_depth": 3},
+}
+
+
+def features(n: int = 300, seed: int = 0) -> pd.DataFrame:
+    """
+    model input frame as the forecasters build it: location columns as plain strings
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "LogNewConfirmedCases_prev_day_1": rng.random(n),
+        "Country/Region": rng.choice(["France", "Italy", "US"], n),
+        "Province/State": rng.choice(["", "New York"], n),
+        "Day": rng.integers(0, 60, n).astype(float),
+    })
+
+
+def fit(model_type: str, X: pd.DataFrame):
+    train_X = X.astype({c: "category" for c in CAT_FEATURES})
+    y = X["LogNewConfirmedCases_prev_day_1"] + (X["Country/Region"] == "Italy")
+    return fit_model(
+        MODEL_REGISTRY[model_type], model_type, PARAMS[model_type],
+        train_X, y, None, None, CAT_FEATURES, verbose=False, write_files=False
+    )
+
+
+@pytest.mark.parametrize("model_key", list(MODEL_TYPES))
+def test_save_load_predict(tmp_path, model_key):
+    pytest.importorskip({"CatBoost": "catboost", "LightGBM": "lightgbm", "XGBoost": "xgboost"}[model_key])
+    model_type = MODEL_TYPES[model_key]
+    X = features()
+    model = fit(model_type, X)
+    expected = np.asarray(model.predict(to_model_input({"model": model}, X.astype({c: "category" for c in CAT_FEATURES}), CAT_FEATURES)))
+
+    for target in TARGETS:
+        save_member(model, model_type, tmp_path / f"{model_key}_{target}")
+    models = load_models(tmp_path, model_key)
+    loaded = load_member(model_type, next(tmp_path.glob(f"{model_key}_{TARGETS[0]}.*")))
+
+    for m in [loaded, *models.values()]:
+        assert list(m.feature_names_) == list(X.columns)
+        # reordered columns, string locations: as the forecasters pass them after reindex(columns=feature_names_)
+        X_input = X[list(reversed(X.columns))].reindex(columns=m.feature_names_)
+        predicted = np.asarray(m.predict(to_model_input({"model": m}, X_input, CAT_FEATURES)), dtype=float)
+        np.testing.assert_allclose(predicted, expected, rtol=1e-5, atol=1e-6)